@@ -0,0 +1,77 @@
+"""长文本分块"""
+
+import re
+from typing import Callable, List, Tuple
+
+from app.infrastructure.llm.tokens import estimate_tokens
+
+# 段落之间的空行
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+# 中英文句末标点之后切分；英文句点需后跟空白，避免切开 "3.14"
+_SENTENCE_BREAK = re.compile(r"(?<=[。！？!?；;\n])|(?<=\.)(?=\s)")
+
+
+def split_text(
+    text: str,
+    max_tokens: int,
+    count_tokens: Callable[[str], int] = estimate_tokens
+) -> List[str]:
+    """按段落、句子边界把文本切成不超过 max_tokens 的块
+
+    段落优先整体保留；超长段落按句子切分，超长句子再按字符硬切。
+    相邻的小片段会合并到同一块中。
+    """
+    text = text.strip()
+    if not text:
+        return []
+    if count_tokens(text) <= max_tokens:
+        return [text]
+
+    # (片段, 与前一片段的连接符)
+    pieces: List[Tuple[str, str]] = []
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if count_tokens(paragraph) <= max_tokens:
+            pieces.append((paragraph, "\n\n"))
+            continue
+        separator = "\n\n"
+        for sentence in _SENTENCE_BREAK.split(paragraph):
+            if not sentence.strip():
+                continue
+            for part in _hard_split(sentence, max_tokens, count_tokens):
+                pieces.append((part, separator))
+                separator = ""
+
+    chunks: List[str] = []
+    current = ""
+    for piece, separator in pieces:
+        candidate = f"{current}{separator}{piece}" if current else piece.lstrip()
+        if current and count_tokens(candidate) > max_tokens:
+            chunks.append(current.strip())
+            current = piece.lstrip()
+        else:
+            current = candidate
+    if current.strip():
+        chunks.append(current.strip())
+
+    return chunks
+
+
+def _hard_split(text: str, max_tokens: int, count_tokens: Callable[[str], int]) -> List[str]:
+    """没有可用边界时按字符切分超长片段"""
+    if count_tokens(text) <= max_tokens:
+        return [text]
+
+    parts: List[str] = []
+    start = 0
+    while start < len(text):
+        # 按平均字符/token比例估算切点，再向回收缩到预算内
+        tokens = count_tokens(text[start:])
+        end = start + max(1, (len(text) - start) * max_tokens // max(tokens, 1))
+        while end - start > 1 and count_tokens(text[start:end]) > max_tokens:
+            end = start + (end - start) * 9 // 10
+        parts.append(text[start:end])
+        start = end
+    return parts
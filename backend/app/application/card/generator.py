@@ -1,10 +1,33 @@
 """卡片生成服务"""
 
-from typing import List, Dict, Any
+import asyncio
+import math
+import re
+import time
+from contextlib import aclosing
+from typing import List, Dict, Any, AsyncIterator, Awaitable, Callable, Optional, Sequence, Tuple, Union
+from app.infrastructure.llm.base import LLMProvider
 from app.infrastructure.llm.factory import LLMFactory
+from app.infrastructure.llm.router import llm_router
+from app.infrastructure.llm.tokens import estimate_tokens
+from app.application.card.chunking import split_text
+from app.application.card.parser import IncrementalCardParser, salvage_cards
+from app.application.card.prompts import get_mixed_prompt_template, get_prompt_template
+from app.application.card.schema import build_cards_schema
 from app.domain.card.entity import Card
 from app.domain.card.value_objects import CardType, CardContentFactory
 from app.shared.config import get_settings
+from app.shared.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# 输出token估算：JSON外层结构、每张卡片的标题/标签/结构、每个内容字段
+_RESPONSE_OVERHEAD_TOKENS = 30
+_CARD_OVERHEAD_TOKENS = 40
+_CARD_FIELD_TOKENS = 80
+
+# 进度回调：(已完成的文本块数, 文本块总数)
+ProgressCallback = Callable[[int, int], Awaitable[None]]
 
 
 class CardGenerator:
@@ -12,6 +35,14 @@ class CardGenerator:
 
     def __init__(self):
         self.settings = get_settings()
+        # 容错解析统计：修复后保留的卡片数、丢弃的卡片数、生成失败被跳过的文本块数
+        self.parse_stats: Dict[str, int] = {"salvaged": 0, "dropped": 0, "failed_chunks": 0}
+        # 各阶段的墙钟耗时（秒）：构建提示词、等待LLM、解析输出
+        self.stage_timings: Dict[str, float] = {"prompt": 0.0, "llm": 0.0, "parse": 0.0}
+        # 各阶段最早开始时间
+        self._stage_started: Dict[str, float] = {}
+        # 流式生成提前结束的统计：原因（max_cards 或 array_closed）、估算节省的输出token与秒数
+        self.stream_savings: Dict[str, Any] = {"reason": None, "tokens_saved": 0, "seconds_saved": 0.0}
 
     async def generate_cards_from_text(
         self,
@@ -19,204 +50,444 @@ class CardGenerator:
         user_id: str,
         card_type: CardType = CardType.BASIC,
         provider: str = "siliconflow",
-        max_cards: int = 5
+        max_cards: int = 5,
+        progress: Optional[ProgressCallback] = None,
+        card_types: Optional[Sequence[CardType]] = None
     ) -> List[Card]:
-        """从文本生成卡片"""
+        """从文本生成卡片
 
-        # 获取API密钥
-        api_key = self._get_api_key(provider)
+        长文本按段落/句子切块后并发生成（map），再合并去重并截取前
+        max_cards 张（reduce）。每完成一个文本块调用一次 progress。
+        指定多个 card_types 时在同一次调用中混合生成这些类型的卡片。
+        """
 
-        # 获取模型配置
-        model_config = LLMFactory.get_provider_models(provider)
-        model = model_config.get("default")
+        self._check_input_budget(text)
+        card_type, card_types = self._resolve_card_types(card_type, card_types)
 
         # 获取LLM提供商
-        llm_provider = LLMFactory.create_provider(provider, api_key=api_key, model=model)
+        llm_provider = self._get_llm_provider(provider)
+
+        chunks = split_text(text, self.settings.CARD_GENERATION_CHUNK_TOKENS)
+        if len(chunks) > 1:
+            return await self._generate_map_reduce(
+                llm_provider, chunks, user_id, card_type, max_cards, progress, card_types
+            )
+
+        cards = await self._generate_chunk(llm_provider, text, user_id, card_type, max_cards, card_types)
+        if progress:
+            await progress(1, 1)
+        return cards
+
+    async def generate_cards_batch(
+        self,
+        items: List[Dict[str, Any]],
+        user_id: str,
+        provider: str = "siliconflow"
+    ) -> List[Union[List[Card], Exception]]:
+        """并发生成多段文本的卡片
+
+        items 中每项包含 text、card_type、max_cards；并发数受
+        CARD_BATCH_CONCURRENCY 限制。返回与 items 顺序一致的结果，
+        失败的项返回对应的异常而不影响其他项。
+        """
+        semaphore = asyncio.Semaphore(self.settings.CARD_BATCH_CONCURRENCY)
+
+        async def generate(item: Dict[str, Any]) -> List[Card]:
+            async with semaphore:
+                return await self.generate_cards_from_text(
+                    text=item["text"],
+                    user_id=user_id,
+                    card_type=item.get("card_type", CardType.BASIC),
+                    provider=provider,
+                    max_cards=item.get("max_cards", 5),
+                    card_types=item.get("card_types")
+                )
+
+        results = await asyncio.gather(*(generate(item) for item in items), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException) and not isinstance(result, Exception):
+                raise result
+        return results
+
+    async def _generate_chunk(
+        self,
+        llm_provider: LLMProvider,
+        text: str,
+        user_id: str,
+        card_type: CardType,
+        max_cards: int,
+        card_types: Optional[Tuple[CardType, ...]] = None
+    ) -> List[Card]:
+        """对单段文本调用一次LLM生成卡片"""
 
         # 根据卡片类型生成提示词
-        prompt = self._build_generation_prompt(text, card_type, max_cards)
+        started = time.perf_counter()
+        prompt = self._build_generation_prompt(text, card_type, max_cards, card_types)
+        max_tokens = self._max_tokens_for(card_type, max_cards, card_types)
+        self._check_prompt_budget(prompt, max_tokens)
+        started = self._record_stage("prompt", started)
 
         # 调用LLM生成卡片内容
-        response_text = await llm_provider.generate_text(prompt)
+        try:
+            response_text = await llm_provider.generate_text(
+                prompt,
+                max_tokens=max_tokens,
+                **self._structured_output_options(card_type, card_types)
+            )
+        finally:
+            started = self._record_stage("llm", started)
 
         # 解析生成的卡片内容
-        generated_cards = self._parse_generated_cards(
-            response_text,
-            user_id,
-            card_type
-        )
-
-        return generated_cards
-
-    def _build_generation_prompt(self, text: str, card_type: CardType, max_cards: int) -> str:
-        """构建生成提示词"""
-
-        if card_type == CardType.BASIC:
-            prompt = f"""
-请根据以下文本，生成最多{max_cards}张学习卡片。每张卡片包含一个问题和一个答案。
-
-文本内容：
-{text}
-
-请按以下JSON格式返回：
-{{
-    "cards": [
-        {{
-            "title": "卡片标题",
-            "content": {{
-                "front": "问题",
-                "back": "答案"
-            }},
-            "tags": ["标签1", "标签2"]
-        }}
-    ]
-}}
-
-注意：
-1. 问题应该基于文本中的重要概念
-2. 答案要准确、简洁
-3. 标签要反映卡片的主要内容
-4. 严格按JSON格式返回
-"""
-        elif card_type == CardType.cloze:
-            prompt = f"""
-请根据以下文本，生成最多{max_cards}张填空题卡片。
-
-文本内容：
-{text}
-
-请按以下JSON格式返回：
-{{
-    "cards": [
-        {{
-            "title": "卡片标题",
-            "content": {{
-                "front": "填空题",
-                "back": "答案",
-                "cloze_text": "带{{空格}}的文本",
-                "cloze_answer": "空格的答案"
-            }},
-            "tags": ["标签1", "标签2"]
-        }}
-    ]
-}}
-
-注意：
-1. 选择文本中的关键信息作为空格
-2. 空格应该测试对重要概念的理解
-3. 严格按JSON格式返回
-"""
-        elif card_type == CardType.QNA:
-            prompt = f"""
-请根据以下文本，生成最多{max_cards}张问答对卡片。
-
-文本内容：
-{text}
-
-请按以下JSON格式返回：
-{{
-    "cards": [
-        {{
-            "title": "卡片标题",
-            "content": {{
-                "front": "问答对",
-                "back": "问答对",
-                "question": "问题",
-                "answer": "答案"
-            }},
-            "tags": ["标签1", "标签2"]
-        }}
-    ]
-}}
-
-注意：
-1. 问题应该覆盖文本的核心内容
-2. 答案要全面且准确
-3. 严格按JSON格式返回
-"""
-        elif card_type == CardType.CONCEPT:
-            prompt = f"""
-请根据以下文本，生成最多{max_cards}张概念卡片。
-
-文本内容：
-{text}
-
-请按以下JSON格式返回：
-{{
-    "cards": [
-        {{
-            "title": "卡片标题",
-            "content": {{
-                "front": "概念",
-                "back": "概念",
-                "concept": "概念名称",
-                "definition": "概念定义",
-                "examples": ["示例1", "示例2"]
-            }},
-            "tags": ["标签1", "标签2"]
-        }}
-    ]
-}}
-
-注意：
-1. 识别文本中的重要概念
-2. 提供清晰的定义和具体的例子
-3. 严格按JSON格式返回
-"""
-        else:
-            raise ValueError(f"Unsupported card type: {card_type}")
-
-        return prompt
-
-    def _parse_generated_cards(
+        try:
+            return self._parse_generated_cards(
+                response_text,
+                user_id,
+                card_type,
+                card_types
+            )
+        finally:
+            self._record_stage("parse", started)
+
+    def _record_stage(self, stage: str, started: float) -> float:
+        """记录一个阶段的耗时，返回下一阶段的起始时间
+
+        并发执行的文本块和批量项会重叠地经历同一阶段，因此阶段耗时取墙钟
+        跨度（最早开始到最晚结束）而非逐次累加，不会超过请求的总耗时。
+        """
+        now = time.perf_counter()
+        first = min(self._stage_started.get(stage, started), started)
+        self._stage_started[stage] = first
+        self.stage_timings[stage] = now - first
+        return now
+
+    async def _generate_map_reduce(
         self,
-        response_text: str,
+        llm_provider: LLMProvider,
+        chunks: List[str],
         user_id: str,
-        card_type: CardType
+        card_type: CardType,
+        max_cards: int,
+        progress: Optional[ProgressCallback] = None,
+        card_types: Optional[Tuple[CardType, ...]] = None
     ) -> List[Card]:
-        """解析生成的卡片内容"""
+        """并发生成各文本块的卡片并合并
 
-        import json
-        import re
+        单个文本块失败时跳过；全部失败时抛出第一个错误。
+        """
+        semaphore = asyncio.Semaphore(self.settings.CARD_GENERATION_CONCURRENCY)
+        cards_per_chunk = max(1, math.ceil(max_cards / len(chunks)))
+        completed = 0
 
-        try:
-            # 尝试提取JSON部分
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-                data = json.loads(json_str)
-            else:
-                data = json.loads(response_text)
-
-            cards = []
-            for card_data in data.get("cards", []):
+        async def generate(chunk: str) -> List[Card]:
+            nonlocal completed
+            async with semaphore:
                 try:
-                    # 创建内容对象
-                    content = CardContentFactory.create_content(
-                        card_type,
-                        **card_data["content"]
+                    return await self._generate_chunk(
+                        llm_provider, chunk, user_id, card_type, cards_per_chunk, card_types
                     )
+                finally:
+                    completed += 1
+                    if progress:
+                        await progress(completed, len(chunks))
+
+        results = await asyncio.gather(*(generate(chunk) for chunk in chunks), return_exceptions=True)
+
+        chunk_cards = [result for result in results if not isinstance(result, BaseException)]
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if not chunk_cards:
+            raise errors[0]
+        self.parse_stats["failed_chunks"] += len(errors)
+        for error in errors:
+            logger.warning("跳过生成失败的文本块: %s", error)
+
+        return self._merge_cards(chunk_cards, max_cards)
+
+    def _merge_cards(self, chunk_cards: List[List[Card]], max_cards: int) -> List[Card]:
+        """合并各文本块的卡片：去重后排序，取前 max_cards 张
+
+        多个文本块重复生成的卡片优先；其余按各块内的顺序轮流选取，
+        使卡片覆盖全文。
+        """
+        merged: Dict[str, Card] = {}
+        occurrences: Dict[str, int] = {}
+        positions: Dict[str, tuple] = {}
+
+        for chunk_index, cards in enumerate(chunk_cards):
+            for position, card in enumerate(cards):
+                key = self._card_key(card)
+                if key in merged:
+                    occurrences[key] += 1
+                    continue
+                merged[key] = card
+                occurrences[key] = 1
+                positions[key] = (position, chunk_index)
+
+        ranked = sorted(merged, key=lambda key: (-occurrences[key], positions[key]))
+        return [merged[key] for key in ranked[:max_cards]]
+
+    @staticmethod
+    def _card_key(card: Card) -> str:
+        """用于去重的卡片键：最能区分卡片的字段，忽略大小写、空白和标点"""
+        content = card.content
+        text = (
+            getattr(content, "question", None)
+            or getattr(content, "concept", None)
+            or getattr(content, "cloze_text", None)
+            or content.front
+        )
+        return re.sub(r"[\W_]+", "", text).lower()
 
-                    # 创建卡片实体
-                    card = Card(
-                        user_id=user_id,
-                        title=card_data["title"],
-                        card_type=card_type,
-                        content=content,
-                        tags=card_data.get("tags", [])
-                    )
+    async def generate_cards_stream(
+        self,
+        text: str,
+        user_id: str,
+        card_type: CardType = CardType.BASIC,
+        provider: str = "siliconflow",
+        max_cards: int = 5,
+        card_types: Optional[Sequence[CardType]] = None
+    ) -> AsyncIterator[Card]:
+        """从文本流式生成卡片，每解析出一张有效卡片立即返回
+
+        已得到 max_cards 张有效卡片或 "cards" 数组闭合后立即关闭上游流，
+        不再为多余的卡片或结尾说明文字等待和付费；节省量记录在 stream_savings。
+        """
+
+        self._check_input_budget(text)
+        card_type, card_types = self._resolve_card_types(card_type, card_types)
+        llm_provider = self._get_llm_provider(provider)
+        prompt = self._build_generation_prompt(text, card_type, max_cards, card_types)
+        max_tokens = self._max_tokens_for(card_type, max_cards, card_types)
+        self._check_prompt_budget(prompt, max_tokens)
+        parser = IncrementalCardParser()
+        generated = 0
+        stop_reason = None
+        first_token_at = None
+
+        stream = llm_provider.generate_stream(
+            prompt,
+            max_tokens=max_tokens,
+            **self._structured_output_options(card_type, card_types)
+        )
+        async with aclosing(stream):
+            async for chunk in stream:
+                if chunk.done:
+                    break
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+
+                for card_data in parser.feed(chunk.content):
+                    card = self._build_card(card_data, user_id, card_type, card_types)
+                    if card is None:
+                        self.parse_stats["dropped"] += 1
+                        continue
+                    generated += 1
+                    yield card
+                    if generated >= max_cards:
+                        stop_reason = "max_cards"
+                        break
+
+                if stop_reason is None and parser.finished:
+                    stop_reason = "array_closed"
+                if stop_reason is not None:
+                    # 退出 aclosing 时关闭上游流，释放连接
+                    break
+
+        if stop_reason is not None:
+            self._record_stream_savings(stop_reason, parser.text, max_tokens, first_token_at)
+        elif parser.has_partial:
+            # 被截断的卡片对象
+            self.parse_stats["dropped"] += 1
+        self.parse_stats["dropped"] += parser.invalid_count
+
+    def _record_stream_savings(
+        self,
+        reason: str,
+        received_text: str,
+        max_tokens: int,
+        first_token_at: Optional[float]
+    ) -> None:
+        """估算提前关闭流节省的输出token（剩余输出预算，为上限）及按已观测输出速度折算的秒数"""
+        received = estimate_tokens(received_text)
+        tokens_saved = max(max_tokens - received, 0)
+        seconds_saved = 0.0
+        if received and first_token_at is not None:
+            seconds_per_token = (time.perf_counter() - first_token_at) / received
+            seconds_saved = round(tokens_saved * seconds_per_token, 3)
+        self.stream_savings = {"reason": reason, "tokens_saved": tokens_saved, "seconds_saved": seconds_saved}
+
+    @staticmethod
+    def count_by_type(cards: List[Card]) -> Dict[str, int]:
+        """按卡片类型统计数量"""
+        counts: Dict[str, int] = {}
+        for card in cards:
+            counts[card.card_type.value] = counts.get(card.card_type.value, 0) + 1
+        return counts
+
+    @staticmethod
+    def _resolve_card_types(
+        card_type: CardType,
+        card_types: Optional[Sequence[CardType]]
+    ) -> Tuple[CardType, Optional[Tuple[CardType, ...]]]:
+        """规范化卡片类型：多种类型时返回类型元组，单一类型时返回 (类型, None)"""
+        if not card_types:
+            return card_type, None
+
+        unique = tuple(dict.fromkeys(CardType(value) for value in card_types))
+        if len(unique) == 1:
+            return unique[0], None
+        return unique[0], unique
+
+    def _max_tokens_for(
+        self,
+        card_type: CardType,
+        max_cards: int,
+        card_types: Optional[Tuple[CardType, ...]] = None
+    ) -> int:
+        """按卡片数量和卡片类型的必填字段估算输出所需的max_tokens
+
+        混合类型时按字段最多的类型估算。
+        """
+        fields = max(
+            sum(1 for field in CardContentFactory.content_class(kind).model_fields.values() if field.is_required())
+            for kind in (card_types or (card_type,))
+        )
+        if card_types:
+            # card_type 字段
+            fields += 1
+        per_card = _CARD_OVERHEAD_TOKENS + fields * _CARD_FIELD_TOKENS
+        return min(self.settings.LLM_MAX_OUTPUT_TOKENS, _RESPONSE_OVERHEAD_TOKENS + max_cards * per_card)
 
-                    cards.append(card)
+    def _structured_output_options(
+        self,
+        card_type: CardType,
+        card_types: Optional[Tuple[CardType, ...]] = None
+    ) -> Dict[str, Any]:
+        """结构化输出参数：由卡片内容类生成的 JSON Schema
+
+        提供商按自身能力选择 JSON Schema 模式或 JSON 模式。
+        """
+        if not self.settings.LLM_STRUCTURED_OUTPUT:
+            return {}
+        return {"json_schema": build_cards_schema(card_type, card_types)}
+
+    def _check_input_budget(self, text: str) -> None:
+        """输入文本超出总token预算时，在调用LLM之前拒绝"""
+        tokens = estimate_tokens(text)
+        if tokens > self.settings.CARD_GENERATION_MAX_INPUT_TOKENS:
+            raise ValueError(
+                f"输入文本过长：约{tokens}个token，"
+                f"超过上限{self.settings.CARD_GENERATION_MAX_INPUT_TOKENS}"
+            )
+
+    def _check_prompt_budget(self, prompt: str, max_tokens: int) -> None:
+        """提示词与输出预算之和超出模型上下文窗口时，在调用LLM之前拒绝"""
+        tokens = estimate_tokens(prompt)
+        if tokens + max_tokens > self.settings.LLM_CONTEXT_WINDOW:
+            raise ValueError(
+                f"提示词过长：约{tokens}个token，加上{max_tokens}个输出token"
+                f"超过上下文窗口{self.settings.LLM_CONTEXT_WINDOW}"
+            )
+
+    def _get_llm_provider(self, provider: str) -> LLMProvider:
+        """获取可复用的LLM提供商实例
+
+        provider 为 "auto" 时按健康评分路由，并在故障时自动切换提供商。
+        """
+        if provider == "auto":
+            return llm_router.get_provider()
 
-                except Exception as e:
-                    # 跳过无法解析的卡片
-                    print(f"跳过无效卡片: {e}")
-                    continue
+        # 获取API密钥
+        api_key = self._get_api_key(provider)
+
+        # 获取模型配置
+        model_config = LLMFactory.get_provider_models(provider)
+        model = model_config.get("default")
 
-            return cards
+        return LLMFactory.get_provider(
+            provider,
+            api_key=api_key,
+            model=model,
+            base_url=self.settings.llm_base_urls[provider],
+            timeout=self.settings.LLM_TIMEOUT,
+            max_retries=self.settings.LLM_MAX_RETRIES
+        )
+
+    def _build_generation_prompt(
+        self,
+        text: str,
+        card_type: CardType,
+        max_cards: int,
+        card_types: Optional[Tuple[CardType, ...]] = None
+    ) -> str:
+        """构建生成提示词：固定前缀在前，用户文本在后"""
+        if card_types:
+            return get_mixed_prompt_template(card_types).render(text, max_cards)
+        return get_prompt_template(card_type).render(text, max_cards)
+
+    def _parse_generated_cards(
+        self,
+        response_text: str,
+        user_id: str,
+        card_type: CardType,
+        card_types: Optional[Tuple[CardType, ...]] = None
+    ) -> List[Card]:
+        """解析生成的卡片内容
+
+        输出被截断或格式有误时尽量保留完整的卡片，并在 parse_stats 中记录
+        修复保留（salvaged）和丢弃（dropped）的卡片数。
+        """
+        salvage = salvage_cards(response_text)
+        if not salvage.found:
+            raise ValueError("解析生成内容失败: 未找到卡片数据")
+
+        cards = []
+        for card_data in salvage.cards:
+            card = self._build_card(card_data, user_id, card_type, card_types) if isinstance(card_data, dict) else None
+            if card is not None:
+                cards.append(card)
+
+        dropped = salvage.dropped + len(salvage.cards) - len(cards)
+        if salvage.repaired:
+            self.parse_stats["salvaged"] += len(cards)
+        self.parse_stats["dropped"] += dropped
+        return cards
+
+    def _build_card(
+        self,
+        card_data: Dict[str, Any],
+        user_id: str,
+        card_type: CardType,
+        card_types: Optional[Tuple[CardType, ...]] = None
+    ) -> Optional[Card]:
+        """校验单张卡片数据并创建卡片实体，无效时返回None
+
+        混合类型时按卡片的 card_type 字段选择内容类，不在请求类型中的卡片跳过。
+        """
+        try:
+            if card_types:
+                card_type = CardType(card_data.get("card_type"))
+                if card_type not in card_types:
+                    raise ValueError(f"未请求的卡片类型: {card_type.value}")
+
+            # 创建内容对象
+            content = CardContentFactory.create_content(
+                card_type,
+                **card_data["content"]
+            )
+
+            # 创建卡片实体
+            return Card(
+                user_id=user_id,
+                title=card_data["title"],
+                card_type=card_type,
+                content=content,
+                tags=card_data.get("tags", [])
+            )
 
         except Exception as e:
-            raise ValueError(f"解析生成内容失败: {e}")
+            # 跳过无法解析的卡片
+            print(f"跳过无效卡片: {e}")
+            return None
 
     def _get_api_key(self, provider: str) -> str:
         """获取LLM提供商的API密钥"""
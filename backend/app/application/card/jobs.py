@@ -0,0 +1,195 @@
+"""异步卡片生成任务"""
+
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from app.application.card.generator import CardGenerator
+from app.application.card.service import CardService
+from app.domain.card.value_objects import CardType
+from app.infrastructure.jobs.store import COMPLETED, FAILED, GenerationJobStore
+from app.infrastructure.repositories.card_repository import SQLAlchemyCardRepository
+from app.shared.database import SessionLocal
+from app.shared.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# 任务结束后推送的事件
+_FINAL_EVENTS = {"completed", "failed"}
+
+
+class GenerationWorkerPool:
+    """本地工作协程池：从SQLite任务表领取并执行卡片生成任务
+
+    任务进度会写回任务表供轮询，同时推送给本进程内的订阅者。
+    """
+
+    def __init__(self, store: Optional[GenerationJobStore] = None, workers: int = 2, poll_interval: float = 1.0):
+        self.store = store
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._tasks: List["asyncio.Task[None]"] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._subscribers: Dict[str, Set["asyncio.Queue[Dict[str, Any]]"]] = {}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self, store: Optional[GenerationJobStore] = None, workers: Optional[int] = None) -> None:
+        """启动工作协程，并把上次关闭时中断的任务重新排队"""
+        if store is not None:
+            self.store = store
+        if workers is not None:
+            self.workers = workers
+        if self.store is None:
+            raise RuntimeError("Generation job store is not configured")
+
+        requeued = await self.store.requeue_running()
+        if requeued:
+            logger.info("重新排队中断的生成任务: %s", requeued)
+
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(max(1, self.workers))]
+
+    async def stop(self) -> None:
+        """停止工作协程；执行中的任务保持 running 状态，下次启动时重新排队"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, user_id: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        """提交生成任务，立即返回任务记录"""
+        job = await self.store.create(user_id, request)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def subscribe(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """订阅任务事件，直到任务完成或失败
+
+        先推送任务当前状态，已结束的任务只推送最终事件。
+        """
+        queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        try:
+            job = await self.store.get(job_id)
+            if job is None:
+                return
+            if job["status"] in (COMPLETED, FAILED):
+                yield self._final_event(job)
+                return
+            yield {"event": "status", "data": {"status": job["status"], "progress": job["progress"]}}
+
+            while True:
+                event = await queue.get()
+                yield event
+                if event["event"] in _FINAL_EVENTS:
+                    return
+        finally:
+            subscribers = self._subscribers.get(job_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[job_id]
+
+    async def _work(self) -> None:
+        while True:
+            self._wakeup.clear()
+            job = await self.store.claim_next()
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = f"生成卡片失败: {str(e)}"
+                logger.warning("生成任务执行失败: %s: %s", job["id"], e)
+                # 记录失败状态出错时不能让工作协程退出，任务保持 running 状态待重启后重新排队
+                try:
+                    await self.store.fail(job["id"], error)
+                except Exception as store_error:
+                    logger.error("记录生成任务失败状态出错: %s: %s", job["id"], store_error)
+                self._publish(job["id"], {"event": "failed", "data": {"error": error}})
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        """执行单个任务：生成卡片、按需保存并记录结果"""
+        job_id = job["id"]
+        request = job["request"]
+        self._publish(job_id, {"event": "status", "data": {"status": job["status"], "progress": None}})
+
+        async def on_progress(completed: int, total: int) -> None:
+            progress = {"chunks_completed": completed, "chunks_total": total}
+            await self.store.update_progress(job_id, progress)
+            self._publish(job_id, {"event": "progress", "data": progress})
+
+        generator = CardGenerator()
+        cards = await generator.generate_cards_from_text(
+            text=request["text"],
+            user_id=job["user_id"],
+            card_type=CardType(request.get("card_type", CardType.BASIC)),
+            provider=request.get("provider", "siliconflow"),
+            max_cards=request.get("max_cards", 5),
+            progress=on_progress,
+            card_types=request.get("card_types")
+        )
+
+        card_dicts = [self._card_to_dict(card) for card in cards]
+        saved = False
+        save_error = None
+        if request.get("auto_save", True) and cards:
+            db = SessionLocal()
+            try:
+                card_service = CardService(SQLAlchemyCardRepository(db))
+                card_dicts = [response.dict() for response in await card_service.save_cards(cards)]
+                saved = True
+            except Exception as e:
+                save_error = f"保存卡片失败: {str(e)}"
+            finally:
+                db.close()
+
+        result = {
+            "cards": card_dicts,
+            "total_generated": len(cards),
+            "total_saved": len(cards) if saved else 0,
+            "type_counts": generator.count_by_type(cards),
+            "salvaged_count": generator.parse_stats["salvaged"],
+            "dropped_count": generator.parse_stats["dropped"],
+            "failed_chunk_count": generator.parse_stats["failed_chunks"],
+            "save_error": save_error,
+        }
+        await self.store.complete(job_id, result)
+        self._publish(job_id, {"event": "completed", "data": result})
+
+    def _publish(self, job_id: str, event: Dict[str, Any]) -> None:
+        for queue in self._subscribers.get(job_id, ()):
+            queue.put_nowait(event)
+
+    @staticmethod
+    def _final_event(job: Dict[str, Any]) -> Dict[str, Any]:
+        if job["status"] == COMPLETED:
+            return {"event": "completed", "data": job["result"]}
+        return {"event": "failed", "data": {"error": job["error"]}}
+
+    @staticmethod
+    def _card_to_dict(card) -> Dict[str, Any]:
+        return {
+            "id": card.id,
+            "user_id": card.user_id,
+            "title": card.title,
+            "card_type": card.card_type.value,
+            "content": card.content.dict(),
+            "tags": card.tags,
+            "created_at": card.created_at.isoformat(),
+            "updated_at": card.updated_at.isoformat(),
+        }
+
+
+# 进程内的生成任务工作池，在应用启动时启动
+generation_workers = GenerationWorkerPool()
@@ -0,0 +1,147 @@
+"""增量卡片解析器"""
+
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.application.card.repair import strip_code_fences, strip_trailing_commas
+
+# "cards" 数组的起始位置
+_CARDS_ARRAY_START = re.compile(r'"cards"\s*:\s*\[')
+
+
+class IncrementalCardParser:
+    """增量解析LLM输出中的 "cards" 数组
+
+    每当一个卡片对象的右花括号到达时立即返回该对象，无需等待完整响应。
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._array_found = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._object_start: Optional[int] = None
+        self.finished = False
+        self.invalid_count = 0
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """追加一段文本，返回新解析出的完整卡片对象"""
+        self._buffer += text
+        cards: List[Dict[str, Any]] = []
+
+        if self.finished:
+            return cards
+
+        if not self._array_found:
+            match = _CARDS_ARRAY_START.search(self._buffer)
+            if not match:
+                return cards
+            self._array_found = True
+            self._pos = match.end()
+
+        buffer = self._buffer
+        while self._pos < len(buffer):
+            char = buffer[self._pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if char == "{" and self._depth == 0:
+                    self._object_start = self._pos
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    if char == "]":
+                        # "cards" 数组结束
+                        self.finished = True
+                        self._pos += 1
+                        break
+                else:
+                    self._depth -= 1
+                    if self._depth == 0 and self._object_start is not None:
+                        card = self._decode(buffer[self._object_start:self._pos + 1])
+                        if card is not None:
+                            cards.append(card)
+                        self._object_start = None
+
+            self._pos += 1
+
+        return cards
+
+    def _decode(self, raw: str) -> Optional[Dict[str, Any]]:
+        """解码单个卡片对象，去掉多余逗号后仍无效的对象计数后跳过"""
+        try:
+            card = json.loads(raw)
+        except json.JSONDecodeError:
+            try:
+                card = json.loads(strip_trailing_commas(raw))
+            except json.JSONDecodeError:
+                self.invalid_count += 1
+                return None
+
+        if not isinstance(card, dict):
+            self.invalid_count += 1
+            return None
+        return card
+
+    @property
+    def text(self) -> str:
+        """目前收到的全部文本"""
+        return self._buffer
+
+    @property
+    def found(self) -> bool:
+        """是否已找到 "cards" 数组"""
+        return self._array_found
+
+    @property
+    def has_partial(self) -> bool:
+        """是否有尚未闭合（如被截断）的卡片对象"""
+        return self._object_start is not None and not self.finished
+
+
+@dataclass
+class CardSalvage:
+    """容错解析的结果"""
+    cards: List[Any] = field(default_factory=list)
+    found: bool = False
+    repaired: bool = False
+    dropped: int = 0
+
+
+def salvage_cards(text: str) -> CardSalvage:
+    """容错解析LLM输出中的卡片列表
+
+    依次尝试：去掉代码块围栏后整体解析；再去掉多余逗号后整体解析；
+    最后逐个提取完整的卡片对象，截断或无效的对象计入 dropped。
+    """
+    cleaned = strip_code_fences(text)
+
+    for candidate, repaired in ((cleaned, False), (strip_trailing_commas(cleaned), True)):
+        match = re.search(r"\{.*\}", candidate, re.DOTALL)
+        try:
+            data = json.loads(match.group(0) if match else candidate)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(data, dict) and isinstance(data.get("cards"), list):
+            return CardSalvage(cards=data["cards"], found=True, repaired=repaired)
+
+    parser = IncrementalCardParser()
+    cards = parser.feed(cleaned)
+    return CardSalvage(
+        cards=cards,
+        found=parser.found,
+        repaired=True,
+        dropped=parser.invalid_count + (1 if parser.has_partial else 0),
+    )
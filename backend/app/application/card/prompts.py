@@ -0,0 +1,168 @@
+"""卡片生成提示词模板"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Tuple
+
+from app.domain.card.value_objects import CardType
+from app.infrastructure.llm.tokens import estimate_tokens
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """编译后的提示词模板
+
+    静态的说明、JSON格式和注意事项组成逐字节不变的前缀，卡片数量和用户
+    文本放在末尾，使提供商的提示词前缀缓存可以命中。
+    """
+    card_types: Tuple[CardType, ...]
+    prefix: str
+    prefix_tokens: int = field(init=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "prefix_tokens", estimate_tokens(self.prefix))
+
+    def render(self, text: str, max_cards: int) -> str:
+        """生成完整提示词：固定前缀 + 卡片数量 + 用户文本"""
+        return f"{self.prefix}\n生成数量：最多{max_cards}张卡片\n\n文本内容：\n{text}\n"
+
+
+@dataclass(frozen=True)
+class _CardSpec:
+    """单一卡片类型的提示词片段"""
+    label: str
+    task: str
+    example_content: str
+    notes: Tuple[str, ...]
+
+
+_CARD_SPECS: Dict[CardType, _CardSpec] = {
+    CardType.BASIC: _CardSpec(
+        label="基础卡片",
+        task="每张卡片包含一个问题和一个答案。",
+        example_content="""{
+                "front": "问题",
+                "back": "答案"
+            }""",
+        notes=("问题应该基于文本中的重要概念", "答案要准确、简洁", "标签要反映卡片的主要内容"),
+    ),
+    CardType.cloze: _CardSpec(
+        label="填空题卡片",
+        task="",
+        example_content="""{
+                "front": "填空题",
+                "back": "答案",
+                "cloze_text": "带{空格}的文本",
+                "cloze_answer": "空格的答案"
+            }""",
+        notes=("选择文本中的关键信息作为空格", "空格应该测试对重要概念的理解"),
+    ),
+    CardType.QNA: _CardSpec(
+        label="问答对卡片",
+        task="",
+        example_content="""{
+                "front": "问答对",
+                "back": "问答对",
+                "question": "问题",
+                "answer": "答案"
+            }""",
+        notes=("问题应该覆盖文本的核心内容", "答案要全面且准确"),
+    ),
+    CardType.CONCEPT: _CardSpec(
+        label="概念卡片",
+        task="",
+        example_content="""{
+                "front": "概念",
+                "back": "概念",
+                "concept": "概念名称",
+                "definition": "概念定义",
+                "examples": ["示例1", "示例2"]
+            }""",
+        notes=("识别文本中的重要概念", "提供清晰的定义和具体的例子"),
+    ),
+}
+
+_CARD_EXAMPLE = """        {{
+            "title": "卡片标题",{type_field}
+            "content": {content},
+            "tags": ["标签1", "标签2"]
+        }}"""
+
+
+def _numbered(notes: Iterable[str]) -> str:
+    return "\n".join(f"{index}. {note}" for index, note in enumerate(notes, start=1))
+
+
+def _prefix(task: str, examples: List[str], notes: List[str]) -> str:
+    cards = ",\n".join(examples)
+    return f"""{task}
+
+请按以下JSON格式返回：
+{{
+    "cards": [
+{cards}
+    ]
+}}
+
+注意：
+{_numbered([*notes, "严格按JSON格式返回"])}
+"""
+
+
+def _compile(card_type: CardType) -> PromptTemplate:
+    spec = _CARD_SPECS[card_type]
+    task = f"请根据文末的文本生成{spec.label}。{spec.task}".rstrip()
+    example = _CARD_EXAMPLE.format(type_field="", content=spec.example_content)
+    return PromptTemplate(card_types=(card_type,), prefix=_prefix(task, [example], list(spec.notes)))
+
+
+def _compile_mixed(card_types: Tuple[CardType, ...]) -> PromptTemplate:
+    specs = [(card_type, _CARD_SPECS[card_type]) for card_type in card_types]
+    kinds = "、".join(f"{card_type.value}（{spec.label}）" for card_type, spec in specs)
+    task = (
+        f"请根据文末的文本生成多种类型的学习卡片，类型包括：{kinds}。"
+        "每张卡片用 card_type 字段标明类型，content 按该类型的格式填写。"
+    )
+    examples = [
+        _CARD_EXAMPLE.format(
+            type_field=f'\n            "card_type": "{card_type.value}",',
+            content=spec.example_content
+        )
+        for card_type, spec in specs
+    ]
+    notes = [note for _, spec in specs for note in spec.notes]
+    notes.append("每种类型至少生成1张卡片")
+    return PromptTemplate(card_types=card_types, prefix=_prefix(task, examples, notes))
+
+
+PROMPT_TEMPLATES: Dict[CardType, PromptTemplate] = {
+    card_type: _compile(card_type) for card_type in _CARD_SPECS
+}
+
+# 多类型模板按类型组合缓存，组合内按 CardType 定义顺序排列以保证前缀稳定
+_MIXED_TEMPLATES: Dict[Tuple[CardType, ...], PromptTemplate] = {}
+
+
+def get_prompt_template(card_type: CardType) -> PromptTemplate:
+    """获取卡片类型对应的提示词模板"""
+    template = PROMPT_TEMPLATES.get(card_type)
+    if template is None:
+        raise ValueError(f"Unsupported card type: {card_type}")
+    return template
+
+
+def get_mixed_prompt_template(card_types: Iterable[CardType]) -> PromptTemplate:
+    """获取多种卡片类型混合生成的提示词模板"""
+    requested = set(card_types)
+    unsupported = requested - set(_CARD_SPECS)
+    if unsupported:
+        raise ValueError(f"Unsupported card type: {unsupported.pop()}")
+
+    key = tuple(card_type for card_type in CardType if card_type in requested)
+    if len(key) == 1:
+        return get_prompt_template(key[0])
+
+    template = _MIXED_TEMPLATES.get(key)
+    if template is None:
+        template = _compile_mixed(key)
+        _MIXED_TEMPLATES[key] = template
+    return template
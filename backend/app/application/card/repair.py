@@ -0,0 +1,45 @@
+"""LLM输出的JSON修复工具"""
+
+import re
+
+# ```json ... ``` 代码块（结尾的围栏可能因截断缺失）
+_CODE_FENCE = re.compile(r"```[\w-]*[ \t]*\n?(.*?)(?:```|$)", re.DOTALL)
+
+
+def strip_code_fences(text: str) -> str:
+    """去掉包裹JSON的Markdown代码块围栏，取第一个包含JSON的代码块"""
+    if "```" not in text:
+        return text
+    for match in _CODE_FENCE.finditer(text):
+        body = match.group(1)
+        if "{" in body:
+            return body
+    return text
+
+
+def strip_trailing_commas(text: str) -> str:
+    """删除对象和数组结尾多余的逗号，字符串内的内容保持不变"""
+    result = []
+    in_string = False
+    escape = False
+    length = len(text)
+
+    for index, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == ",":
+            following = index + 1
+            while following < length and text[following].isspace():
+                following += 1
+            if following < length and text[following] in "}]":
+                continue
+        result.append(char)
+
+    return "".join(result)
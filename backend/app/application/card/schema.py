@@ -0,0 +1,50 @@
+"""卡片生成结果的JSON Schema"""
+
+from typing import Any, Dict, Optional, Sequence
+
+from app.domain.card.value_objects import CardContentFactory, CardType
+
+
+def content_schema(card_type: CardType) -> Dict[str, Any]:
+    """由卡片内容类（CardContent 子类）生成的内容 Schema"""
+    schema = CardContentFactory.content_class(card_type).model_json_schema()
+    schema.pop("title", None)
+    return schema
+
+
+def _card_schema(card_type: CardType, tagged: bool) -> Dict[str, Any]:
+    properties: Dict[str, Any] = {
+        "title": {"type": "string"},
+        "content": content_schema(card_type),
+        "tags": {"type": "array", "items": {"type": "string"}},
+    }
+    required = ["title", "content"]
+    if tagged:
+        properties["card_type"] = {"type": "string", "enum": [card_type.value]}
+        required.append("card_type")
+    return {"type": "object", "properties": properties, "required": required}
+
+
+def build_cards_schema(
+    card_type: CardType,
+    card_types: Optional[Sequence[CardType]] = None
+) -> Dict[str, Any]:
+    """生成 {"cards": [...]} 响应的 Schema，用于结构化输出
+
+    混合类型时每张卡片为各类型 Schema 之一，并以 card_type 区分。
+    """
+    if card_types:
+        items: Dict[str, Any] = {"anyOf": [_card_schema(kind, tagged=True) for kind in card_types]}
+        name = "cards_" + "_".join(kind.value for kind in card_types)
+    else:
+        items = _card_schema(card_type, tagged=False)
+        name = f"cards_{card_type.value}"
+
+    return {
+        "name": name,
+        "schema": {
+            "type": "object",
+            "properties": {"cards": {"type": "array", "items": items}},
+            "required": ["cards"],
+        },
+    }
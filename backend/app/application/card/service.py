@@ -31,6 +31,11 @@ class CardService:
         created_card = await self.card_repository.create(card)
         return self._entity_to_response(created_card)
 
+    async def save_cards(self, cards: List[Card]) -> List[CardResponse]:
+        """批量保存已生成的卡片实体（单个事务）"""
+        saved_cards = await self.card_repository.create_many(cards)
+        return [self._entity_to_response(card) for card in saved_cards]
+
     async def get_card(self, card_id: str, user_id: str) -> Optional[CardResponse]:
         """获取单个卡片"""
         card = await self.card_repository.get_by_id(card_id, user_id)
@@ -11,6 +11,11 @@ class CardRepository(ABC):
         """创建卡片"""
         pass
 
+    @abstractmethod
+    async def create_many(self, cards: List[Card]) -> List[Card]:
+        """在同一事务中批量创建卡片"""
+        pass
+
     @abstractmethod
     async def get_by_id(self, card_id: str, user_id: str) -> Optional[Card]:
         """根据ID获取卡片（确保用户隔离）"""
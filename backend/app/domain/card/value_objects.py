@@ -44,15 +44,20 @@ class CardContentFactory:
     """卡片内容工厂"""
 
     @staticmethod
-    def create_content(card_type: CardType, **kwargs) -> CardContent:
-        """根据卡片类型创建内容"""
+    def content_class(card_type: CardType) -> type:
+        """获取卡片类型对应的内容类"""
         if card_type == CardType.BASIC:
-            return CardContent(**kwargs)
+            return CardContent
         elif card_type == CardType.cloze:
-            return ClozeContent(**kwargs)
+            return ClozeContent
         elif card_type == CardType.QNA:
-            return QnAContent(**kwargs)
+            return QnAContent
         elif card_type == CardType.CONCEPT:
-            return ConceptContent(**kwargs)
+            return ConceptContent
         else:
-            raise ValueError(f"Unsupported card type: {card_type}")
\ No newline at end of file
+            raise ValueError(f"Unsupported card type: {card_type}")
+
+    @staticmethod
+    def create_content(card_type: CardType, **kwargs) -> CardContent:
+        """根据卡片类型创建内容"""
+        return CardContentFactory.content_class(card_type)(**kwargs)
\ No newline at end of file
@@ -0,0 +1,169 @@
+"""
+SQLite-backed store for asynchronous card generation jobs.
+
+Jobs live in a local SQLite file, so queued work survives restarts without
+an external broker. Every call runs the blocking sqlite3 work in a thread.
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+from uuid import uuid4
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+_COLUMNS = (
+    "id", "user_id", "status", "request", "progress", "result", "error",
+    "created_at", "started_at", "finished_at",
+)
+_JSON_COLUMNS = ("request", "progress", "result")
+
+
+class GenerationJobStore:
+    """Persistent queue and status table of generation jobs."""
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS generation_jobs ("
+            "id TEXT PRIMARY KEY, user_id TEXT NOT NULL, status TEXT NOT NULL, "
+            "request TEXT NOT NULL, progress TEXT, result TEXT, error TEXT, "
+            "created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS ix_generation_jobs_status_created_at "
+            "ON generation_jobs (status, created_at)"
+        )
+        self._db.commit()
+
+    async def create(self, user_id: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue a new job and return it."""
+        job = {
+            "id": str(uuid4()),
+            "user_id": user_id,
+            "status": PENDING,
+            "request": request,
+            "progress": None,
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        await asyncio.to_thread(self._insert, job)
+        return job
+
+    async def get(self, job_id: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Get a job, optionally only if it belongs to ``user_id``."""
+        return await asyncio.to_thread(self._get, job_id, user_id)
+
+    async def claim_next(self) -> Optional[Dict[str, Any]]:
+        """Mark the oldest pending job as running and return it."""
+        return await asyncio.to_thread(self._claim_next)
+
+    async def update_progress(self, job_id: str, progress: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self._update, job_id, progress=json.dumps(progress, ensure_ascii=False))
+
+    async def complete(self, job_id: str, result: Dict[str, Any]) -> None:
+        await asyncio.to_thread(
+            self._update, job_id,
+            status=COMPLETED,
+            result=json.dumps(result, ensure_ascii=False),
+            finished_at=time.time(),
+        )
+
+    async def fail(self, job_id: str, error: str) -> None:
+        await asyncio.to_thread(self._update, job_id, status=FAILED, error=error, finished_at=time.time())
+
+    async def requeue_running(self) -> int:
+        """Put jobs interrupted by a shutdown back in the queue."""
+        return await asyncio.to_thread(self._requeue_running)
+
+    async def count_by_status(self) -> Dict[str, int]:
+        return await asyncio.to_thread(self._count_by_status)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _insert(self, job: Dict[str, Any]) -> None:
+        row = [json.dumps(job[c], ensure_ascii=False) if c in _JSON_COLUMNS and job[c] is not None else job[c]
+               for c in _COLUMNS]
+        with self._lock:
+            self._db.execute(
+                f"INSERT INTO generation_jobs ({', '.join(_COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in _COLUMNS)})",
+                row,
+            )
+            self._db.commit()
+
+    def _get(self, job_id: str, user_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        query = f"SELECT {', '.join(_COLUMNS)} FROM generation_jobs WHERE id = ?"
+        params = [job_id]
+        if user_id is not None:
+            query += " AND user_id = ?"
+            params.append(user_id)
+        with self._lock:
+            row = self._db.execute(query, params).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def _claim_next(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM generation_jobs "
+                "WHERE status = ? ORDER BY created_at LIMIT 1",
+                (PENDING,),
+            ).fetchone()
+            if row is None:
+                return None
+            started_at = time.time()
+            self._db.execute(
+                "UPDATE generation_jobs SET status = ?, started_at = ? WHERE id = ?",
+                (RUNNING, started_at, row[0]),
+            )
+            self._db.commit()
+
+        job = self._row_to_job(row)
+        job["status"] = RUNNING
+        job["started_at"] = started_at
+        return job
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(
+                f"UPDATE generation_jobs SET {assignments} WHERE id = ?",
+                [*fields.values(), job_id],
+            )
+            self._db.commit()
+
+    def _requeue_running(self) -> int:
+        with self._lock:
+            count = self._db.execute(
+                "UPDATE generation_jobs SET status = ?, started_at = NULL WHERE status = ?",
+                (PENDING, RUNNING),
+            ).rowcount
+            self._db.commit()
+        return count
+
+    def _count_by_status(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT status, COUNT(*) FROM generation_jobs GROUP BY status"
+            ).fetchall()
+        return {status: count for status, count in rows}
+
+    @staticmethod
+    def _row_to_job(row: tuple) -> Dict[str, Any]:
+        job = dict(zip(_COLUMNS, row))
+        for column in _JSON_COLUMNS:
+            if job[column] is not None:
+                job[column] = json.loads(job[column])
+        return job
@@ -4,8 +4,12 @@ LLM Infrastructure Module.
 
 from app.infrastructure.llm.base import (
     LLMProvider,
+    LLMUsage,
+    LLMStreamChunk,
     LLMError,
     LLMConnectionError,
+    LLMRateLimitError,
+    LLMOverloadedError,
     LLMGenerationError,
     LLMConfigurationError
 )
@@ -16,12 +20,16 @@ from app.infrastructure.llm.siliconflow import SiliconFlowProvider
 
 __all__ = [
     "LLMProvider",
+    "LLMUsage",
+    "LLMStreamChunk",
     "LLMFactory",
     "OpenAIProvider",
     "DeepSeekProvider",
     "SiliconFlowProvider",
     "LLMError",
     "LLMConnectionError",
+    "LLMRateLimitError",
+    "LLMOverloadedError",
     "LLMGenerationError",
     "LLMConfigurationError"
 ]
\ No newline at end of file
@@ -2,18 +2,93 @@
 Base LLM provider interface.
 """
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any
+from contextlib import aclosing
+from dataclasses import asdict, dataclass
+from typing import Optional, Dict, Any, AsyncIterator
 import asyncio
+import hashlib
+import json
+import time
+
+import httpx
+
+from app.infrastructure.llm.bulkhead import Bulkhead, BulkheadFullError, llm_bulkheads
+from app.infrastructure.llm.cache import llm_response_cache
+from app.infrastructure.llm.http_client import llm_client_pool
+from app.infrastructure.llm.ratelimit import RateLimiter, llm_rate_limiters, parse_retry_after
+from app.infrastructure.llm.singleflight import llm_single_flight
+from app.infrastructure.llm.telemetry import llm_telemetry
+from app.infrastructure.llm.timeouts import RequestTimer, TimeoutDecision, TotalTimeout, llm_timeouts
+from app.infrastructure.llm.tokens import estimate_messages_tokens
+from app.infrastructure.llm.usage import llm_usage
+
+
+def api_key_fingerprint(api_key: str) -> str:
+    """Fingerprint an API key so the raw secret is never used as a key."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class LLMUsage:
+    """Token usage reported by an OpenAI-compatible API."""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    cached_tokens: int = 0
+
+    @classmethod
+    def from_dict(cls, usage: Dict[str, Any]) -> "LLMUsage":
+        """Build usage from a ``usage`` block.
+
+        Cached prompt tokens are reported as ``prompt_tokens_details.cached_tokens``
+        by OpenAI and as ``prompt_cache_hit_tokens`` by DeepSeek.
+        """
+        details = usage.get("prompt_tokens_details") or {}
+        cached = details.get("cached_tokens") or usage.get("prompt_cache_hit_tokens") or 0
+        return cls(
+            prompt_tokens=usage.get("prompt_tokens") or 0,
+            completion_tokens=usage.get("completion_tokens") or 0,
+            total_tokens=usage.get("total_tokens") or 0,
+            cached_tokens=cached,
+        )
+
+
+@dataclass
+class LLMStreamChunk:
+    """A piece of a streamed completion.
+
+    Content chunks carry ``content``. The last chunk of a stream has
+    ``done=True`` and carries the usage record and timings instead.
+    """
+    content: str = ""
+    done: bool = False
+    finish_reason: Optional[str] = None
+    usage: Optional[LLMUsage] = None
+    time_to_first_token: Optional[float] = None
+    latency: Optional[float] = None
 
 
 class LLMProvider(ABC):
     """Base class for LLM providers."""
 
+    # Human readable name used in error messages
+    display_name: str = "LLM"
+
+    # Whether the API accepts ``stream_options.include_usage``
+    supports_stream_usage: bool = True
+
+    # Structured output modes accepted in ``response_format``
+    supports_json_object: bool = False
+    supports_json_schema: bool = False
+
     def __init__(self, api_key: str, model: str, **kwargs):
         self.api_key = api_key
         self.model = model
         self.timeout = kwargs.get('timeout', 30)
         self.max_retries = kwargs.get('max_retries', 3)
+        self.base_url = kwargs.get('base_url', '')
+        self.max_tokens = kwargs.get('max_tokens', 1000)
+        self.temperature = kwargs.get('temperature', 0.7)
         self._config = kwargs
 
     @abstractmethod
@@ -32,13 +107,89 @@ class LLMProvider(ABC):
         """Get provider name."""
         pass
 
+    async def generate_stream(self, prompt: str, **kwargs) -> AsyncIterator[LLMStreamChunk]:
+        """Stream a completion token by token.
+
+        Yields content chunks as they arrive, followed by a final ``done``
+        chunk with the finish reason, token usage, time-to-first-token and
+        total latency (both in seconds). A cached completion is replayed as
+        a single content chunk; pass ``use_cache=False`` to bypass the cache.
+        """
+        payload = self._build_payload(prompt, **kwargs)
+        payload["stream"] = True
+        if self.supports_stream_usage:
+            payload["stream_options"] = {"include_usage": True}
+
+        started = time.perf_counter()
+        time_to_first_token = None
+        finish_reason = None
+        usage = None
+        parts: list[str] = []
+
+        cache_key = self._cache_key(payload, kwargs.get('use_cache', True))
+        cached = await llm_response_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            llm_telemetry.observe_call(self.provider_name, payload["model"], "cache_hit")
+            choice = cached["choices"][0]
+            yield LLMStreamChunk(content=choice["message"]["content"])
+            yield LLMStreamChunk(
+                done=True,
+                finish_reason=choice.get("finish_reason"),
+                usage=LLMUsage.from_dict(cached["usage"]) if cached.get("usage") else None,
+                time_to_first_token=time.perf_counter() - started,
+                latency=time.perf_counter() - started,
+            )
+            return
+
+        # Closing this generator early closes the upstream stream with it
+        events = self._stream_chat_completion(payload)
+        async with aclosing(events):
+            async for event in events:
+                if event.get("usage"):
+                    usage = LLMUsage.from_dict(event["usage"])
+
+                for choice in event.get("choices") or []:
+                    finish_reason = choice.get("finish_reason") or finish_reason
+                    content = (choice.get("delta") or {}).get("content")
+                    if content:
+                        if time_to_first_token is None:
+                            time_to_first_token = time.perf_counter() - started
+                        parts.append(content)
+                        yield LLMStreamChunk(content=content)
+
+        if cache_key and finish_reason:
+            # Only completed streams are cached, in the blocking response shape
+            await llm_response_cache.set(cache_key, {
+                "choices": [{
+                    "message": {"role": "assistant", "content": "".join(parts)},
+                    "finish_reason": finish_reason,
+                }],
+                "usage": asdict(usage) if usage else None,
+            })
+
+        yield LLMStreamChunk(
+            done=True,
+            finish_reason=finish_reason,
+            usage=usage,
+            time_to_first_token=time_to_first_token,
+            latency=time.perf_counter() - started,
+        )
+
     async def generate_with_retry(self, prompt: str, **kwargs) -> str:
         """Generate text with retry logic."""
         last_exception = None
 
         for attempt in range(self.max_retries + 1):
+            if attempt:
+                llm_telemetry.record_retry(self.provider_name, kwargs.get('model', self.model))
             try:
                 return await self.generate_text(prompt, **kwargs)
+            except LLMRateLimitError as e:
+                # The rate limiter already holds the next call back for
+                # Retry-After, so no extra backoff is added here
+                last_exception = e
+                if attempt >= self.max_retries:
+                    break
             except Exception as e:
                 last_exception = e
                 if attempt < self.max_retries:
@@ -50,6 +201,366 @@ class LLMProvider(ABC):
 
         raise last_exception
 
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get the pooled keep-alive HTTP client for this provider."""
+        return llm_client_pool.get_client(self.base_url)
+
+    def _build_headers(self) -> Dict[str, str]:
+        """Build request headers for an OpenAI-compatible API."""
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+    def _build_payload(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        """Build a chat completion request body.
+
+        ``json_schema`` (``{"name": ..., "schema": ...}``) requests structured
+        output in the strongest mode the provider supports; an explicit
+        ``response_format`` is passed through unchanged.
+        """
+        payload = {
+            "model": kwargs.get('model', self.model),
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": kwargs.get('max_tokens', self.max_tokens),
+            "temperature": kwargs.get('temperature', self.temperature)
+        }
+
+        response_format = kwargs.get('response_format') or self._response_format(kwargs.get('json_schema'))
+        if response_format:
+            payload["response_format"] = response_format
+        return payload
+
+    def _response_format(self, json_schema: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Pick the ``response_format`` for a requested JSON schema.
+
+        Falls back from JSON-schema mode to JSON-object mode, and to plain
+        text when the provider supports neither.
+        """
+        if not json_schema:
+            return None
+        if self.supports_json_schema:
+            return {
+                "type": "json_schema",
+                "json_schema": {"strict": False, **json_schema},
+            }
+        if self.supports_json_object:
+            return {"type": "json_object"}
+        return None
+
+    def _map_http_error(self, error: httpx.HTTPError) -> "LLMError":
+        """Translate an httpx error into the matching LLM error."""
+        name = self.display_name
+
+        if isinstance(error, httpx.HTTPStatusError):
+            if error.response.status_code == 401:
+                return LLMConnectionError(f"Invalid API key for {name}: {error}")
+            elif error.response.status_code == 429:
+                return LLMRateLimitError(
+                    f"Rate limit exceeded for {name}: {error}",
+                    retry_after=parse_retry_after(error.response.headers.get("retry-after"))
+                )
+            else:
+                return LLMGenerationError(f"{name} API error: {error}")
+        return LLMConnectionError(f"Connection error with {name}: {error}")
+
+    def _cache_key(self, payload: Dict[str, Any], use_cache: bool = True) -> Optional[str]:
+        """Get the response cache key for a request, or None when not cacheable."""
+        if not use_cache or not llm_response_cache.enabled:
+            return None
+        return self._request_key(payload)
+
+    def _request_key(self, payload: Dict[str, Any]) -> str:
+        """Key of a request for the response cache and single-flight.
+
+        Includes the API key fingerprint so tenants sharing an endpoint
+        never see each other's completions.
+        """
+        return llm_response_cache.make_key(
+            self.provider_name, self.base_url, api_key_fingerprint(self.api_key or ""), payload
+        )
+
+    async def _chat_completion(self, payload: Dict[str, Any], use_cache: bool = True) -> Dict[str, Any]:
+        """Run a chat completion.
+
+        Identical requests are served from the response cache, and identical
+        concurrent requests share a single upstream call.
+        """
+        cache_key = self._cache_key(payload, use_cache)
+        if cache_key:
+            cached = await llm_response_cache.get(cache_key)
+            if cached is not None:
+                llm_telemetry.observe_call(self.provider_name, payload["model"], "cache_hit")
+                return cached
+
+        async def fetch() -> Dict[str, Any]:
+            data = await self._send_chat_completion(payload)
+            if cache_key:
+                await llm_response_cache.set(cache_key, data)
+            return data
+
+        request_key = cache_key or self._request_key(payload)
+        return await llm_single_flight.do(request_key, fetch)
+
+    def _get_rate_limiter(self, payload: Dict[str, Any]) -> RateLimiter:
+        """Get the shared rate limiter for the requested model."""
+        return llm_rate_limiters.get(self.provider_name, payload.get("model") or self.model)
+
+    def _get_bulkhead(self, payload: Dict[str, Any]) -> Bulkhead:
+        """Get the shared concurrency bulkhead for the requested model."""
+        return llm_bulkheads.get(self.provider_name, payload.get("model") or self.model)
+
+    async def _acquire_slot(
+        self,
+        payload: Dict[str, Any],
+        bulkhead: Bulkhead,
+        limiter: RateLimiter,
+        estimated_tokens: int
+    ) -> None:
+        """Take a bulkhead call slot, failing fast when the queue is saturated."""
+        try:
+            await bulkhead.acquire()
+        except BulkheadFullError as e:
+            limiter.cancel(estimated_tokens)
+            llm_telemetry.observe_call(self.provider_name, payload.get("model") or self.model, "overloaded")
+            raise LLMOverloadedError(f"{self.display_name} is overloaded: {e}")
+
+    def _decide_timeouts(self, payload: Dict[str, Any], estimated_tokens: int, stream: bool) -> TimeoutDecision:
+        """Choose the connect, first-byte and total timeouts of a call."""
+        return llm_timeouts.decide(
+            self.provider_name,
+            payload.get("model") or self.model,
+            estimated_tokens,
+            stream=stream,
+            default=self.timeout,
+        )
+
+    @staticmethod
+    async def _within(awaitable, decision: TimeoutDecision, deadline: Optional[float]):
+        """Await ``awaitable``, raising ``TotalTimeout`` once ``deadline`` passes."""
+        if deadline is None:
+            return await awaitable
+        try:
+            return await asyncio.wait_for(awaitable, max(deadline - time.perf_counter(), 0))
+        except asyncio.TimeoutError:
+            raise TotalTimeout(f"Call exceeded its total timeout of {decision.total:.1f}s")
+
+    @staticmethod
+    def _call_outcome(error: BaseException) -> str:
+        """Telemetry outcome label of a failed call attempt."""
+        if isinstance(error, httpx.HTTPStatusError):
+            status = error.response.status_code
+            if status == 429:
+                return "rate_limited"
+            return "server_error" if status >= 500 else "client_error"
+        if isinstance(error, httpx.TimeoutException):
+            return "timeout"
+        if isinstance(error, httpx.RequestError):
+            return "connection_error"
+        if isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+            return "cancelled"
+        return "error"
+
+    @staticmethod
+    def _estimate_request_tokens(payload: Dict[str, Any]) -> int:
+        """Estimate the tokens a request may consume (prompt + completion)."""
+        return estimate_messages_tokens(payload.get("messages", [])) + (payload.get("max_tokens") or 0)
+
+    def _raise_mapped(self, error: httpx.HTTPError, limiter: RateLimiter) -> None:
+        """Raise the LLM error for an httpx error, recording rate limiting."""
+        mapped = self._map_http_error(error)
+        if isinstance(mapped, LLMRateLimitError):
+            limiter.record_rate_limited(mapped.retry_after)
+        raise mapped
+
+    def _record_usage(
+        self,
+        payload: Dict[str, Any],
+        usage: Dict[str, Any],
+        limiter: RateLimiter,
+        estimated_tokens: int
+    ) -> None:
+        """Account reported usage: correct the limiter, track cached prompt tokens and cost."""
+        reported = LLMUsage.from_dict(usage)
+        if reported.total_tokens:
+            limiter.reconcile(estimated_tokens, reported.total_tokens)
+        model = payload.get("model") or self.model
+        llm_usage.record(
+            self.provider_name,
+            model,
+            prompt_tokens=reported.prompt_tokens,
+            completion_tokens=reported.completion_tokens,
+            cached_tokens=reported.cached_tokens,
+        )
+        llm_telemetry.record_usage(
+            self.provider_name,
+            model,
+            prompt_tokens=reported.prompt_tokens,
+            completion_tokens=reported.completion_tokens,
+            cached_tokens=reported.cached_tokens,
+        )
+
+    async def _send_chat_completion(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST a chat completion request and return the decoded JSON body.
+
+        The call is paced by the provider/model rate limiter first, then
+        holds a bulkhead slot while the request is in flight. Timeouts come
+        from ``llm_timeouts`` and the observed latencies are fed back to it.
+        The attempt's outcome and latency are recorded in telemetry.
+        """
+        limiter = self._get_rate_limiter(payload)
+        estimated_tokens = self._estimate_request_tokens(payload)
+        await limiter.acquire(estimated_tokens)
+
+        bulkhead = self._get_bulkhead(payload)
+        await self._acquire_slot(payload, bulkhead, limiter, estimated_tokens)
+        decision = self._decide_timeouts(payload, estimated_tokens, stream=False)
+        timer = RequestTimer()
+        started = time.perf_counter()
+        deadline = started + decision.total if decision.total is not None else None
+        outcome = "success"
+        try:
+            client = self._get_client()
+            response = await self._within(
+                client.post(
+                    f"{self.base_url}/chat/completions",
+                    headers=self._build_headers(),
+                    json=payload,
+                    timeout=decision.httpx_timeout(),
+                    extensions={"trace": timer},
+                ),
+                decision,
+                deadline,
+            )
+            elapsed = time.perf_counter() - started
+            llm_timeouts.record(
+                decision,
+                connect=timer.connect,
+                first_byte=timer.headers if timer.headers is not None else elapsed,
+                total=elapsed,
+            )
+            limiter.update_from_headers(response.headers)
+            response.raise_for_status()
+            data = response.json()
+
+        except (httpx.HTTPStatusError, httpx.RequestError) as e:
+            outcome = self._call_outcome(e)
+            if isinstance(e, httpx.TimeoutException):
+                llm_timeouts.record_timeout(decision, e)
+            self._raise_mapped(e, limiter)
+        except BaseException as e:
+            outcome = self._call_outcome(e)
+            raise
+        finally:
+            bulkhead.release()
+            llm_telemetry.observe_call(
+                self.provider_name,
+                payload.get("model") or self.model,
+                outcome,
+                latency=time.perf_counter() - started,
+            )
+
+        usage = data.get("usage") if isinstance(data, dict) else None
+        if usage:
+            self._record_usage(payload, usage, limiter, estimated_tokens)
+        return data
+
+    async def _stream_chat_completion(self, payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """POST a streaming chat completion request and yield decoded SSE events.
+
+        The bulkhead slot is held until the stream is exhausted or closed.
+        The first-byte timeout bounds the wait for each chunk and the total
+        timeout the whole stream. The attempt's outcome, latency and
+        time-to-first-token are recorded in telemetry; a stream closed early
+        counts as ``cancelled``.
+        """
+        limiter = self._get_rate_limiter(payload)
+        estimated_tokens = self._estimate_request_tokens(payload)
+        await limiter.acquire(estimated_tokens)
+
+        bulkhead = self._get_bulkhead(payload)
+        await self._acquire_slot(payload, bulkhead, limiter, estimated_tokens)
+        decision = self._decide_timeouts(payload, estimated_tokens, stream=True)
+        timer = RequestTimer()
+        started = time.perf_counter()
+        deadline = started + decision.total if decision.total is not None else None
+        time_to_first_token = None
+        outcome = "success"
+        try:
+            client = self._get_client()
+            request = client.build_request(
+                "POST",
+                f"{self.base_url}/chat/completions",
+                headers=self._build_headers(),
+                json=payload,
+                timeout=decision.httpx_timeout(),
+                extensions={"trace": timer},
+            )
+            response = await self._within(client.send(request, stream=True), decision, deadline)
+            try:
+                limiter.update_from_headers(response.headers)
+                if response.is_error:
+                    await response.aread()
+                response.raise_for_status()
+
+                lines = response.aiter_lines()
+                while True:
+                    try:
+                        line = await self._within(lines.__anext__(), decision, deadline)
+                    except StopAsyncIteration:
+                        break
+                    line = line.strip()
+                    if not line.startswith("data:"):
+                        # Blank separators, comments and keep-alives
+                        continue
+
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+
+                    try:
+                        event = json.loads(data)
+                    except json.JSONDecodeError as e:
+                        raise LLMGenerationError(
+                            f"Invalid stream event from {self.display_name}: {e}"
+                        )
+
+                    usage = event.get("usage")
+                    if usage:
+                        self._record_usage(payload, usage, limiter, estimated_tokens)
+                    if time_to_first_token is None and any(
+                        (choice.get("delta") or {}).get("content") for choice in event.get("choices") or []
+                    ):
+                        time_to_first_token = time.perf_counter() - started
+                    yield event
+            finally:
+                await response.aclose()
+
+            llm_timeouts.record(
+                decision,
+                connect=timer.connect,
+                first_byte=time_to_first_token,
+                total=time.perf_counter() - started,
+            )
+
+        except (httpx.HTTPStatusError, httpx.RequestError) as e:
+            outcome = self._call_outcome(e)
+            if isinstance(e, httpx.TimeoutException):
+                llm_timeouts.record_timeout(decision, e)
+            self._raise_mapped(e, limiter)
+        except BaseException as e:
+            outcome = self._call_outcome(e)
+            raise
+        finally:
+            bulkhead.release()
+            llm_telemetry.observe_call(
+                self.provider_name,
+                payload.get("model") or self.model,
+                outcome,
+                latency=time.perf_counter() - started,
+                time_to_first_token=time_to_first_token,
+            )
+
     def get_config(self) -> Dict[str, Any]:
         """Get provider configuration."""
         return {
@@ -71,6 +582,19 @@ class LLMConnectionError(LLMError):
     pass
 
 
+class LLMRateLimitError(LLMConnectionError):
+    """Raised when the LLM provider rejects a call with HTTP 429."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMOverloadedError(LLMConnectionError):
+    """Raised when too many calls to one provider are already in flight or queued."""
+    pass
+
+
 class LLMGenerationError(LLMError):
     """Raised when text generation fails."""
     pass
@@ -0,0 +1,135 @@
+"""
+Concurrency bulkheads for LLM providers.
+
+Each provider/model pair gets a bounded number of concurrent calls and a
+bounded wait queue, so a burst against one vendor cannot open hundreds of
+sockets or starve calls to the others.
+"""
+import asyncio
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+class BulkheadFullError(Exception):
+    """Raised when no call slot could be obtained."""
+    pass
+
+
+class Bulkhead:
+    """Bounded semaphore with a bounded, timed wait queue."""
+
+    def __init__(self, max_concurrent: int = 16, max_queue: int = 64, queue_timeout: float = 10.0):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self.in_flight = 0
+        self.queued = 0
+        self.stats: Dict[str, float] = {
+            "acquired": 0,
+            "rejected": 0,
+            "timed_out": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    async def acquire(self) -> float:
+        """Wait for a call slot and return the time spent queued.
+
+        Raises ``BulkheadFullError`` when the queue is full or the wait
+        exceeds ``queue_timeout``. Every successful acquire must be paired
+        with ``release()``.
+        """
+        if self._semaphore.locked() and self.queued >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise BulkheadFullError(
+                f"{self.in_flight} calls in flight and {self.queued} queued"
+            )
+
+        started = time.perf_counter()
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.stats["timed_out"] += 1
+            raise BulkheadFullError(f"no call slot within {self.queue_timeout}s")
+        finally:
+            self.queued -= 1
+
+        waited = time.perf_counter() - started
+        self.in_flight += 1
+        self.stats["acquired"] += 1
+        self.stats["wait_seconds_total"] += waited
+        self.stats["wait_seconds_max"] = max(self.stats["wait_seconds_max"], waited)
+        return waited
+
+    def release(self) -> None:
+        """Give a call slot back."""
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get in-flight/queued gauges and wait-time counters."""
+        acquired = self.stats["acquired"]
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "wait_seconds_avg": round(self.stats["wait_seconds_total"] / acquired, 4) if acquired else 0.0,
+            **{k: round(v, 4) if isinstance(v, float) else v for k, v in self.stats.items()},
+        }
+
+
+class BulkheadRegistry:
+    """Process-wide bulkheads keyed by provider and model."""
+
+    def __init__(self):
+        self._bulkheads: Dict[Tuple[str, str], Bulkhead] = {}
+        self.configure()
+
+    def configure(
+        self,
+        max_concurrent: int = 16,
+        max_queue: int = 64,
+        queue_timeout: float = 10.0,
+        limits: Optional[Dict[str, Dict[str, float]]] = None,
+    ) -> None:
+        """Set defaults and per ``provider`` / ``provider:model`` overrides.
+
+        Override entries use the keys ``max_concurrent``, ``max_queue`` and
+        ``queue_timeout``.
+        """
+        self.defaults = {
+            "max_concurrent": max_concurrent,
+            "max_queue": max_queue,
+            "queue_timeout": queue_timeout,
+        }
+        self.limits = limits or {}
+        self._bulkheads.clear()
+
+    def get(self, provider_name: str, model: str) -> Bulkhead:
+        """Get (or create) the bulkhead for a provider/model pair."""
+        key = (provider_name, model)
+        bulkhead = self._bulkheads.get(key)
+        if bulkhead is None:
+            override = self.limits.get(f"{provider_name}:{model}") or self.limits.get(provider_name) or {}
+            options = {**self.defaults, **override}
+            bulkhead = Bulkhead(
+                max_concurrent=int(options["max_concurrent"]),
+                max_queue=int(options["max_queue"]),
+                queue_timeout=float(options["queue_timeout"]),
+            )
+            self._bulkheads[key] = bulkhead
+        return bulkhead
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get stats for every bulkhead."""
+        return {
+            f"{provider}:{model}": bulkhead.get_stats()
+            for (provider, model), bulkhead in self._bulkheads.items()
+        }
+
+
+# Process-wide bulkhead registry, configured at application startup
+llm_bulkheads = BulkheadRegistry()
@@ -0,0 +1,222 @@
+"""
+Content-addressed cache for LLM completions.
+
+Responses are keyed by a hash of provider, base URL, model, prompt and
+sampling parameters. An in-process LRU with TTL sits in front of an
+optional SQLite tier that survives restarts.
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Request fields that change the transport but not the completion
+_TRANSPORT_FIELDS = {"stream", "stream_options"}
+
+
+class LLMResponseCache:
+    """Two-tier (memory + SQLite) cache of chat completion responses."""
+
+    # Prune the disk tier every N writes
+    _PRUNE_INTERVAL = 100
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        ttl: float = 86400,
+        max_entries: int = 1024,
+        path: Optional[str] = None,
+        disk_max_entries: int = 100_000,
+    ):
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._writes = 0
+        self.stats: Dict[str, int] = {}
+        self.reset_stats()
+        self.configure(
+            enabled=enabled,
+            ttl=ttl,
+            max_entries=max_entries,
+            path=path,
+            disk_max_entries=disk_max_entries,
+        )
+
+    def configure(
+        self,
+        enabled: bool = False,
+        ttl: float = 86400,
+        max_entries: int = 1024,
+        path: Optional[str] = None,
+        disk_max_entries: int = 100_000,
+    ) -> None:
+        """(Re)configure the cache. An empty ``path`` keeps it memory-only."""
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.disk_max_entries = disk_max_entries
+        self.path = path or None
+
+        self.close()
+        if self.enabled and self.path:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS ix_llm_cache_created_at ON llm_cache (created_at)"
+            )
+            self._db.commit()
+            self._prune_disk()
+
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    @staticmethod
+    def make_key(provider_name: str, base_url: str, key_fingerprint: str, payload: Dict[str, Any]) -> str:
+        """Hash a request into a cache key.
+
+        ``key_fingerprint`` identifies the API key, so different credentials
+        on the same endpoint never share entries. Streaming flags are ignored
+        so streamed and blocking calls share entries.
+        """
+        request = {k: v for k, v in payload.items() if k not in _TRANSPORT_FIELDS}
+        raw = json.dumps(
+            [provider_name, base_url, key_fingerprint, request],
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look a response up in memory, then on disk."""
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return value
+            del self._memory[key]
+            self.stats["expired"] += 1
+
+        if self._db is not None:
+            row = await asyncio.to_thread(self._disk_get, key, now)
+            if row is not None:
+                expires_at, value = row
+                self._remember(key, value, expires_at)
+                self.stats["disk_hits"] += 1
+                return value
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Store a response in both tiers."""
+        if not self.enabled:
+            return
+
+        expires_at = time.time() + self.ttl
+        self._remember(key, value, expires_at)
+        self.stats["writes"] += 1
+
+        if self._db is not None:
+            await asyncio.to_thread(self._disk_set, key, value, expires_at)
+
+    def clear(self) -> None:
+        """Drop every cached response."""
+        self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def close(self) -> None:
+        """Close the disk tier."""
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+            self._db = None
+
+    def reset_stats(self) -> None:
+        """Reset hit/miss/eviction counters."""
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache counters and sizes."""
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            "enabled": self.enabled,
+            "memory_entries": len(self._memory),
+            "disk_enabled": self._db is not None,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            **self.stats,
+        }
+
+    def _remember(self, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        """Insert into the memory tier, evicting the least recently used entry."""
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[float, Dict[str, Any]]]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] <= now:
+            return None
+        return row[1], json.loads(row[0])
+
+    def _disk_set(self, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), time.time(), expires_at),
+            )
+            self._db.commit()
+        self._writes += 1
+        if self._writes % self._PRUNE_INTERVAL == 0:
+            self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        """Remove expired rows and keep the disk tier under its size bound."""
+        with self._db_lock:
+            expired = self._db.execute(
+                "DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),)
+            ).rowcount
+            overflow = self._db.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.disk_max_entries,),
+            ).rowcount
+            self._db.commit()
+        self.stats["expired"] += max(expired, 0)
+        self.stats["evictions"] += max(overflow, 0)
+
+
+# Process-wide response cache, configured at application startup
+llm_response_cache = LLMResponseCache()
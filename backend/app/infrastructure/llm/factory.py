@@ -1,9 +1,11 @@
 """
 LLM Provider Factory.
 """
-from typing import Dict, Any
+import json
+from collections import OrderedDict
+from typing import Dict, Any, Optional
 
-from app.infrastructure.llm.base import LLMProvider, LLMConfigurationError
+from app.infrastructure.llm.base import LLMProvider, LLMConfigurationError, api_key_fingerprint
 from app.infrastructure.llm.openai import OpenAIProvider
 from app.infrastructure.llm.deepseek import DeepSeekProvider
 from app.infrastructure.llm.siliconflow import SiliconFlowProvider
@@ -19,6 +21,10 @@ class LLMFactory:
         "siliconflow": SiliconFlowProvider,
     }
 
+    # Process-wide registry of warm provider instances (LRU ordered)
+    _instances: "OrderedDict[str, LLMProvider]" = OrderedDict()
+    _max_instances: int = 32
+
     @classmethod
     def create_provider(
         cls,
@@ -34,6 +40,89 @@ class LLMFactory:
         provider_class = cls._providers[provider_name]
         return provider_class(api_key=api_key, model=model, **kwargs)
 
+    @classmethod
+    def get_provider(
+        cls,
+        provider_name: str,
+        api_key: str,
+        model: str = None,
+        **kwargs
+    ) -> LLMProvider:
+        """Get a warm, reusable provider instance from the registry.
+
+        Instances are keyed by provider, model, API key fingerprint and
+        options, so callers sharing a configuration share connection pools
+        and per-instance state. The least recently used instance is evicted
+        once the registry is full.
+        """
+        if provider_name not in cls._providers:
+            raise LLMConfigurationError(f"Unknown LLM provider: {provider_name}")
+
+        model = model or cls.get_provider_models(provider_name).get("default")
+        key = cls._instance_key(provider_name, api_key, model, kwargs)
+
+        provider = cls._instances.get(key)
+        if provider is not None:
+            cls._instances.move_to_end(key)
+            return provider
+
+        provider = cls.create_provider(provider_name, api_key=api_key, model=model, **kwargs)
+        cls._instances[key] = provider
+        while len(cls._instances) > cls._max_instances:
+            cls._instances.popitem(last=False)
+        return provider
+
+    @classmethod
+    def invalidate(cls, provider_name: Optional[str] = None, api_key: Optional[str] = None) -> int:
+        """Drop registry instances, e.g. after an API key rotation.
+
+        With no arguments the whole registry is cleared. Returns the number
+        of instances removed.
+        """
+        fingerprint = cls._key_fingerprint(api_key) if api_key is not None else None
+        removed = 0
+        for key, provider in list(cls._instances.items()):
+            name, _, key_fingerprint, _ = json.loads(key)
+            if provider_name is not None and name != provider_name:
+                continue
+            if fingerprint is not None and key_fingerprint != fingerprint:
+                continue
+            del cls._instances[key]
+            removed += 1
+        return removed
+
+    @classmethod
+    def set_registry_size(cls, max_instances: int) -> None:
+        """Set the registry bound, evicting the oldest instances if needed."""
+        cls._max_instances = max(1, max_instances)
+        while len(cls._instances) > cls._max_instances:
+            cls._instances.popitem(last=False)
+
+    @classmethod
+    def get_registry_size(cls) -> int:
+        """Get the number of cached provider instances."""
+        return len(cls._instances)
+
+    @staticmethod
+    def _key_fingerprint(api_key: str) -> str:
+        """Fingerprint an API key so the raw secret is never used as a key."""
+        return api_key_fingerprint(api_key)
+
+    @classmethod
+    def _instance_key(
+        cls,
+        provider_name: str,
+        api_key: str,
+        model: Optional[str],
+        options: Dict[str, Any]
+    ) -> str:
+        """Build the registry key for a provider configuration."""
+        return json.dumps(
+            [provider_name, model, cls._key_fingerprint(api_key), options],
+            sort_keys=True,
+            default=str
+        )
+
     @classmethod
     def get_supported_providers(cls) -> list[str]:
         """Get list of supported LLM providers."""
@@ -65,6 +154,7 @@ class LLMFactory:
     def register_provider(cls, name: str, provider_class: type):
         """Register a new LLM provider."""
         cls._providers[name] = provider_class
+        cls.invalidate(name)
 
     @classmethod
     def create_provider_from_config(cls, config: Dict[str, Any]) -> LLMProvider:
@@ -0,0 +1,210 @@
+"""
+Hedged LLM requests.
+
+When the primary provider has not produced a first token within a
+percentile of its observed time-to-first-token, the same prompt is sent to
+a secondary provider or model. Whichever stream yields first wins and the
+loser is cancelled. A budget caps how many extra requests hedging may add.
+A primary that fails before anything was yielded is failed over to the
+secondary right away; that replaces the request rather than adding one,
+so it does not spend budget.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional, Tuple
+
+from app.infrastructure.llm.base import LLMConfigurationError, LLMProvider, LLMStreamChunk
+from app.infrastructure.llm.stats import percentile
+
+# Called with (provider, success, latency) for every finished attempt
+ResultCallback = Callable[[LLMProvider, bool, float], None]
+
+
+class HedgeBudget:
+    """Allow at most ``ratio`` extra requests per primary request.
+
+    Every primary request earns ``ratio`` credits (up to ``burst``); a
+    hedge spends one credit.
+    """
+
+    def __init__(self, ratio: float = 0.1, burst: float = 5.0):
+        self.ratio = ratio
+        self.burst = burst
+        self.credits = burst
+
+    def record_request(self) -> None:
+        self.credits = min(self.burst, self.credits + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.credits >= 1.0:
+            self.credits -= 1.0
+            return True
+        return False
+
+
+class LLMHedger:
+    """Race a delayed secondary stream against a slow primary stream."""
+
+    def __init__(self):
+        self._ttft: Dict[str, Deque[float]] = {}
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+            "budget_denied": 0,
+            "failovers": 0,
+        }
+        self.configure()
+
+    def configure(
+        self,
+        enabled: bool = False,
+        percentile: float = 0.95,
+        budget_ratio: float = 0.1,
+        budget_burst: float = 5.0,
+        default_delay: float = 2.0,
+        min_delay: float = 0.2,
+        max_delay: float = 10.0,
+        min_samples: int = 20,
+        window_size: int = 200,
+    ) -> None:
+        """Configure hedging; it is off unless ``enabled`` is set."""
+        self.enabled = enabled
+        self.percentile = percentile
+        self.budget = HedgeBudget(budget_ratio, budget_burst)
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.window_size = window_size
+        self._ttft.clear()
+
+    def record_ttft(self, provider: LLMProvider, ttft: float) -> None:
+        """Record an observed time-to-first-token for a provider/model."""
+        key = f"{provider.provider_name}:{provider.model}"
+        samples = self._ttft.get(key)
+        if samples is None:
+            samples = deque(maxlen=self.window_size)
+            self._ttft[key] = samples
+        samples.append(ttft)
+
+    def hedge_delay(self, provider: LLMProvider) -> float:
+        """How long to wait for the primary's first token before hedging."""
+        return self._delay_for_key(f"{provider.provider_name}:{provider.model}")
+
+    def _delay_for_key(self, key: str) -> float:
+        samples = self._ttft.get(key)
+        if not samples or len(samples) < self.min_samples:
+            return self.default_delay
+        delay = percentile(list(samples), self.percentile)
+        return min(self.max_delay, max(self.min_delay, delay))
+
+    async def stream(
+        self,
+        primary: LLMProvider,
+        secondary: LLMProvider,
+        prompt: str,
+        on_result: Optional[ResultCallback] = None,
+        **kwargs
+    ) -> AsyncIterator[Tuple[LLMProvider, LLMStreamChunk]]:
+        """Stream from whichever of ``primary``/``secondary`` yields first.
+
+        Yields ``(provider, chunk)`` pairs so callers know who answered.
+        ``on_result`` is called for every attempt that was started and
+        finished. Raises the last error when both attempts fail before
+        yielding.
+        """
+        self.stats["requests"] += 1
+        self.budget.record_request()
+
+        attempts: Dict["asyncio.Task[LLMStreamChunk]", Tuple[LLMProvider, AsyncIterator[LLMStreamChunk], float]] = {}
+
+        def start(provider: LLMProvider) -> "asyncio.Task[LLMStreamChunk]":
+            stream = provider.generate_stream(prompt, **kwargs)
+            task = asyncio.ensure_future(stream.__anext__())
+            attempts[task] = (provider, stream, time.perf_counter())
+            return task
+
+        start(primary)
+        winner: Optional[Tuple[LLMProvider, AsyncIterator[LLMStreamChunk], float, LLMStreamChunk]] = None
+        last_exception: Optional[BaseException] = None
+        hedged = False
+        secondary_started = False
+
+        try:
+            done, _ = await asyncio.wait(set(attempts), timeout=self.hedge_delay(primary))
+            if not done:
+                if self.budget.try_spend():
+                    hedged = secondary_started = True
+                    self.stats["hedged"] += 1
+                    start(secondary)
+                else:
+                    self.stats["budget_denied"] += 1
+
+            pending = set(attempts)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    provider, stream, started = attempts[task]
+                    error = task.exception()
+                    if error is None:
+                        winner = (provider, stream, started, task.result())
+                        break
+                    last_exception = error
+                    if on_result:
+                        on_result(provider, False, time.perf_counter() - started)
+                    if not secondary_started and not isinstance(error, (StopAsyncIteration, LLMConfigurationError)):
+                        # The primary failed before yielding: fail over instead of hedging
+                        secondary_started = True
+                        self.stats["failovers"] += 1
+                        pending.add(start(secondary))
+        finally:
+            # Cancel and close every attempt that did not win
+            for task, (provider, stream, _) in attempts.items():
+                if winner is not None and winner[1] is stream:
+                    continue
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                await stream.aclose()
+
+        if winner is None:
+            if isinstance(last_exception, StopAsyncIteration) or last_exception is None:
+                return
+            raise last_exception
+
+        provider, stream, started, chunk = winner
+        if hedged and provider is secondary:
+            self.stats["hedge_wins"] += 1
+
+        try:
+            while True:
+                if chunk.done:
+                    if chunk.time_to_first_token is not None:
+                        self.record_ttft(provider, chunk.time_to_first_token)
+                    if on_result:
+                        on_result(provider, True, time.perf_counter() - started)
+                yield provider, chunk
+                try:
+                    chunk = await stream.__anext__()
+                except StopAsyncIteration:
+                    break
+        except Exception:
+            if on_result:
+                on_result(provider, False, time.perf_counter() - started)
+            raise
+        finally:
+            await stream.aclose()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hedging counters and current hedge delays."""
+        return {
+            "enabled": self.enabled,
+            "budget_credits": round(self.budget.credits, 3),
+            "delays": {key: round(self._delay_for_key(key), 3) for key in self._ttft},
+            **self.stats,
+        }
+
+
+# Process-wide hedger, configured at application startup
+llm_hedger = LLMHedger()
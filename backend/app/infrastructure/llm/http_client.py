@@ -0,0 +1,100 @@
+"""
+Shared HTTP client pool for LLM providers.
+
+Every provider talks to an OpenAI-compatible HTTP API. Instead of opening a new
+``httpx.AsyncClient`` per call (and paying DNS, TCP and TLS setup every time),
+providers borrow a long-lived keep-alive client from this pool, keyed by the
+provider ``base_url``.
+"""
+import importlib.util
+from typing import Dict, Optional
+
+import httpx
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional ``h2`` package (``httpx[http2]``)."""
+    return importlib.util.find_spec("h2") is not None
+
+
+class LLMHTTPClientPool:
+    """Process-wide registry of pooled ``httpx.AsyncClient`` instances."""
+
+    def __init__(
+        self,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        http2: bool = True,
+    ):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self.configure(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+            http2=http2,
+        )
+
+    def configure(
+        self,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        http2: bool = True,
+    ) -> None:
+        """Set pool limits for clients created from now on."""
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2 and _http2_available()
+
+    def get_client(self, base_url: str) -> httpx.AsyncClient:
+        """Get (or lazily create) the shared client for a base URL."""
+        client = self._clients.get(base_url)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=self.limits,
+                http2=self.http2,
+            )
+            self._clients[base_url] = client
+        return client
+
+    async def install_transport(self, base_url: str, transport: httpx.AsyncBaseTransport) -> httpx.AsyncClient:
+        """Route a base URL through a custom transport instead of the network.
+
+        Used by tests and the load-test harness to plug in mock transports or
+        an in-process stand-in server. Any existing client is closed first.
+        """
+        await self.aclose(base_url)
+        client = httpx.AsyncClient(transport=transport, limits=self.limits)
+        self._clients[base_url] = client
+        return client
+
+    def open(self, base_urls: list[str]) -> None:
+        """Create clients up-front for the given base URLs."""
+        for base_url in base_urls:
+            self.get_client(base_url)
+
+    async def aclose(self, base_url: Optional[str] = None) -> None:
+        """Close one client, or all of them when ``base_url`` is omitted."""
+        if base_url is not None:
+            client = self._clients.pop(base_url, None)
+            if client is not None:
+                await client.aclose()
+            return
+
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+    @property
+    def base_urls(self) -> list[str]:
+        """Base URLs that currently have an open client."""
+        return [url for url, client in self._clients.items() if not client.is_closed]
+
+
+# Process-wide pool shared by all provider instances
+llm_client_pool = LLMHTTPClientPool()
@@ -0,0 +1,254 @@
+"""
+Client-side rate limiting for LLM providers.
+
+Each provider/model pair gets a requests-per-minute and a tokens-per-minute
+token bucket. Calls are paced before they are sent, and the buckets adapt to
+``Retry-After`` and ``x-ratelimit-*`` response headers so bursts do not turn
+into 429 storms.
+"""
+import asyncio
+import re
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+# "1s", "6m0s", "20ms", "1h2m3.5s"
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_SECONDS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """Parse a rate limit reset duration such as ``6m0s`` into seconds."""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_SECONDS[unit] for amount, unit in parts)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a ``Retry-After`` header (seconds or HTTP date) into seconds."""
+    if not value:
+        return None
+
+    seconds = parse_duration(value)
+    if seconds is not None:
+        return max(seconds, 0.0)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously over one minute.
+
+    A ``per_minute`` of 0 disables the bucket.
+    """
+
+    def __init__(self, per_minute: float = 0):
+        self.per_minute = per_minute
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    def set_rate(self, per_minute: float) -> None:
+        """Change the bucket size, keeping the current fill level."""
+        self._refill()
+        if self.per_minute <= 0:
+            self.tokens = float(per_minute)
+        self.per_minute = per_minute
+        self.tokens = min(self.tokens, float(per_minute))
+
+    def reserve(self, amount: float) -> float:
+        """Take ``amount`` tokens now and return how long to wait for them.
+
+        The bucket may go into debt, which keeps later callers queued
+        behind earlier ones.
+        """
+        if self.per_minute <= 0:
+            return 0.0
+
+        self._refill()
+        # A single request larger than the bucket can never fit otherwise
+        amount = min(amount, self.per_minute)
+        self.tokens -= amount
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / (self.per_minute / 60.0)
+
+    def refund(self, amount: float) -> None:
+        """Give back tokens that were reserved but not used."""
+        if self.per_minute <= 0:
+            return
+        self._refill()
+        self.tokens = min(self.tokens + amount, float(self.per_minute))
+
+    def clamp(self, remaining: float) -> None:
+        """Never believe we have more tokens than the server says remain."""
+        if self.per_minute <= 0:
+            return
+        self._refill()
+        self.tokens = min(self.tokens, remaining)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        if self.per_minute > 0:
+            self.tokens = min(
+                float(self.per_minute),
+                self.tokens + elapsed * self.per_minute / 60.0,
+            )
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limiter for one provider/model."""
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.blocked_until = 0.0
+        self.stats: Dict[str, float] = {
+            "acquired": 0,
+            "throttled": 0,
+            "wait_seconds": 0.0,
+            "rate_limited": 0,
+        }
+
+    async def acquire(self, estimated_tokens: int = 0) -> float:
+        """Wait until a request of ``estimated_tokens`` may be sent.
+
+        Returns the time spent waiting, in seconds.
+        """
+        wait = max(
+            self.blocked_until - time.monotonic(),
+            self.requests.reserve(1),
+            self.tokens.reserve(estimated_tokens),
+            0.0,
+        )
+
+        self.stats["acquired"] += 1
+        if wait > 0:
+            self.stats["throttled"] += 1
+            self.stats["wait_seconds"] += wait
+            await asyncio.sleep(wait)
+        return wait
+
+    def cancel(self, estimated_tokens: int = 0) -> None:
+        """Return the reservation of a request that was never sent."""
+        self.requests.refund(1)
+        self.tokens.refund(estimated_tokens)
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Correct the token bucket once the real usage is known."""
+        difference = estimated_tokens - actual_tokens
+        if difference > 0:
+            self.tokens.refund(difference)
+        elif difference < 0:
+            self.tokens.reserve(-difference)
+
+    def block_for(self, seconds: float) -> None:
+        """Hold back every call for ``seconds`` (e.g. after a 429)."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """Adapt the buckets to ``x-ratelimit-*`` and ``Retry-After`` headers."""
+        for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+            limit = _header_number(headers, f"x-ratelimit-limit-{kind}")
+            if limit is not None and limit > 0 and limit != bucket.per_minute:
+                bucket.set_rate(limit)
+
+            remaining = _header_number(headers, f"x-ratelimit-remaining-{kind}")
+            if remaining is not None:
+                bucket.clamp(remaining)
+                if remaining <= 0:
+                    reset = headers.get(f"x-ratelimit-reset-{kind}")
+                    reset_seconds = parse_duration(reset) if reset else None
+                    if reset_seconds:
+                        self.block_for(reset_seconds)
+
+        retry_after = parse_retry_after(headers.get("retry-after"))
+        if retry_after:
+            self.block_for(retry_after)
+
+    def record_rate_limited(self, retry_after: Optional[float]) -> None:
+        """Record a 429 response."""
+        self.stats["rate_limited"] += 1
+        # Without a hint, back off for a short, fixed window
+        self.block_for(retry_after if retry_after is not None else 1.0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get limiter state and counters."""
+        return {
+            "requests_per_minute": self.requests.per_minute,
+            "tokens_per_minute": self.tokens.per_minute,
+            "blocked_for": round(max(self.blocked_until - time.monotonic(), 0.0), 3),
+            **{k: round(v, 3) if isinstance(v, float) else v for k, v in self.stats.items()},
+        }
+
+
+def _header_number(headers: Mapping[str, str], name: str) -> Optional[float]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class RateLimiterRegistry:
+    """Process-wide rate limiters keyed by provider and model."""
+
+    def __init__(self):
+        self._limiters: Dict[Tuple[str, str], RateLimiter] = {}
+        self.default_rpm = 0
+        self.default_tpm = 0
+        self.limits: Dict[str, Dict[str, int]] = {}
+
+    def configure(
+        self,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+        limits: Optional[Dict[str, Dict[str, int]]] = None,
+    ) -> None:
+        """Set default limits and per ``provider`` / ``provider:model`` overrides.
+
+        Override entries use the keys ``rpm`` and ``tpm``. Existing limiters are
+        dropped so the new limits apply to the next call.
+        """
+        self.default_rpm = requests_per_minute
+        self.default_tpm = tokens_per_minute
+        self.limits = limits or {}
+        self._limiters.clear()
+
+    def get(self, provider_name: str, model: str) -> RateLimiter:
+        """Get (or create) the limiter for a provider/model pair."""
+        key = (provider_name, model)
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            override = self.limits.get(f"{provider_name}:{model}") or self.limits.get(provider_name) or {}
+            limiter = RateLimiter(
+                requests_per_minute=override.get("rpm", self.default_rpm),
+                tokens_per_minute=override.get("tpm", self.default_tpm),
+            )
+            self._limiters[key] = limiter
+        return limiter
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get stats for every limiter."""
+        return {
+            f"{provider}:{model}": limiter.get_stats()
+            for (provider, model), limiter in self._limiters.items()
+        }
+
+
+# Process-wide limiter registry, configured at application startup
+llm_rate_limiters = RateLimiterRegistry()
@@ -0,0 +1,368 @@
+"""
+Health-scored routing across LLM providers.
+
+The router keeps a rolling window of outcomes and latencies per
+provider/model, trips a circuit breaker on unhealthy targets and fails over
+to the next configured target. ``provider="auto"`` uses it.
+"""
+import time
+from collections import deque
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from app.infrastructure.llm.base import (
+    LLMConfigurationError,
+    LLMError,
+    LLMOverloadedError,
+    LLMProvider,
+    LLMStreamChunk,
+)
+from app.infrastructure.llm.factory import LLMFactory
+from app.infrastructure.llm.hedging import llm_hedger
+from app.infrastructure.llm.stats import percentile
+
+
+class CircuitBreaker:
+    """Closed → open after repeated failures → half-open probe → closed."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, cooldown: float = 30.0):
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def is_available(self) -> bool:
+        """Whether a call could be sent now, without claiming the probe slot."""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return time.monotonic() - self.opened_at >= self.cooldown
+        return not self._probe_in_flight
+
+    def allow_request(self) -> bool:
+        """Claim permission to send a call through this breaker."""
+        if not self.is_available():
+            return False
+        if self.state == self.OPEN:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            self._probe_in_flight = True
+        return True
+
+    def release(self) -> None:
+        """Give the probe slot back when a call ended without an outcome."""
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self._probe_in_flight = False
+
+    def trip(self) -> None:
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+
+class ProviderHealth:
+    """Rolling error rate and latency of one provider/model."""
+
+    def __init__(self, window_size: int = 50, window_seconds: float = 300.0, cooldown: float = 30.0):
+        self.window_seconds = window_seconds
+        self._samples: Deque[Tuple[float, bool, float]] = deque(maxlen=window_size)
+        self.consecutive_failures = 0
+        self.breaker = CircuitBreaker(cooldown)
+
+    def record(self, success: bool, latency: float) -> None:
+        self._samples.append((time.monotonic(), success, latency))
+        self.consecutive_failures = 0 if success else self.consecutive_failures + 1
+
+    def _recent(self) -> List[Tuple[float, bool, float]]:
+        horizon = time.monotonic() - self.window_seconds
+        return [sample for sample in self._samples if sample[0] >= horizon]
+
+    @property
+    def requests(self) -> int:
+        return len(self._recent())
+
+    @property
+    def error_rate(self) -> float:
+        samples = self._recent()
+        if not samples:
+            return 0.0
+        return sum(1 for _, success, _ in samples if not success) / len(samples)
+
+    def latency(self, fraction: float) -> Optional[float]:
+        """Latency percentile of successful calls."""
+        return percentile([latency for _, success, latency in self._recent() if success], fraction)
+
+
+class LLMRouter:
+    """Route calls to the healthiest configured provider, failing over on errors."""
+
+    def __init__(self):
+        self._health: Dict[str, ProviderHealth] = {}
+        self.targets: List[Tuple[str, str, Optional[str], Optional[str]]] = []
+        self.configure()
+
+    def configure(
+        self,
+        targets: Optional[List[Tuple[str, str, Optional[str], Optional[str]]]] = None,
+        timeout: int = 30,
+        max_retries: int = 3,
+        window_size: int = 50,
+        window_seconds: float = 300.0,
+        error_threshold: float = 0.5,
+        min_requests: int = 5,
+        max_consecutive_failures: int = 3,
+        cooldown: float = 30.0,
+        latency_target: float = 10.0,
+    ) -> None:
+        """Configure routing targets and health thresholds.
+
+        ``targets`` is an ordered list of ``(provider, api_key, model, base_url)``;
+        the order is the preference when targets are equally healthy.
+        ``timeout`` and ``max_retries`` are passed to every target provider.
+        """
+        self.targets = list(targets or [])
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.window_size = window_size
+        self.window_seconds = window_seconds
+        self.error_threshold = error_threshold
+        self.min_requests = min_requests
+        self.max_consecutive_failures = max_consecutive_failures
+        self.cooldown = cooldown
+        self.latency_target = latency_target
+        self._health.clear()
+
+    def get_provider(self) -> "RoutedLLMProvider":
+        """Get a provider that routes across the configured targets."""
+        if not self.targets:
+            raise LLMConfigurationError("No LLM providers configured for auto routing")
+
+        providers = [
+            LLMFactory.get_provider(
+                name,
+                api_key=api_key,
+                model=model,
+                base_url=base_url,
+                timeout=self.timeout,
+                max_retries=self.max_retries,
+            )
+            for name, api_key, model, base_url in self.targets
+        ]
+        return RoutedLLMProvider(self, providers)
+
+    def health(self, provider: LLMProvider) -> ProviderHealth:
+        key = self._key(provider)
+        health = self._health.get(key)
+        if health is None:
+            health = ProviderHealth(self.window_size, self.window_seconds, self.cooldown)
+            self._health[key] = health
+        return health
+
+    def score(self, provider: LLMProvider) -> float:
+        """Lower is healthier: error rate plus a capped latency penalty."""
+        health = self.health(provider)
+        p95 = health.latency(0.95) or 0.0
+        return health.error_rate + 0.5 * min(p95 / self.latency_target, 1.0)
+
+    def rank(self, providers: List[LLMProvider]) -> List[LLMProvider]:
+        """Order providers by health, keeping configuration order for ties.
+
+        Scores are bucketed to 0.1 so small fluctuations do not flap routes.
+        """
+        indexed = list(enumerate(providers))
+        indexed.sort(key=lambda item: (round(self.score(item[1]), 1), item[0]))
+        return [provider for _, provider in indexed]
+
+    def record(self, provider: LLMProvider, success: bool, latency: float) -> None:
+        """Record a call outcome and update the circuit breaker."""
+        health = self.health(provider)
+        health.record(success, latency)
+
+        if success:
+            health.breaker.record_success()
+            return
+
+        unhealthy = (
+            health.breaker.state == CircuitBreaker.HALF_OPEN
+            or health.consecutive_failures >= self.max_consecutive_failures
+            or (health.requests >= self.min_requests and health.error_rate >= self.error_threshold)
+        )
+        if unhealthy:
+            health.breaker.trip()
+
+    def available(self, providers: List[LLMProvider]) -> List[LLMProvider]:
+        """Ranked providers whose circuit breaker would let a call through."""
+        return [provider for provider in self.rank(providers) if self.health(provider).breaker.is_available()]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get health of every routed provider/model."""
+        return {
+            key: {
+                "state": health.breaker.state,
+                "requests": health.requests,
+                "error_rate": round(health.error_rate, 4),
+                "latency_p50": health.latency(0.5),
+                "latency_p95": health.latency(0.95),
+                "consecutive_failures": health.consecutive_failures,
+            }
+            for key, health in self._health.items()
+        }
+
+    @staticmethod
+    def _key(provider: LLMProvider) -> str:
+        return f"{provider.provider_name}:{provider.model}"
+
+
+class RoutedLLMProvider:
+    """Provider facade that fails over across routed providers.
+
+    Exposes the calls the application uses (``generate_text``,
+    ``generate_with_retry`` and ``generate_stream``); ``provider_name`` and
+    ``model`` report the provider that served the last call.
+    """
+
+    def __init__(self, router: LLMRouter, providers: List[LLMProvider]):
+        self.router = router
+        self.providers = providers
+        self._last = providers[0]
+
+    @property
+    def provider_name(self) -> str:
+        return self._last.provider_name
+
+    @property
+    def model(self) -> str:
+        return self._last.model
+
+    def _candidates(self) -> List[LLMProvider]:
+        candidates = self.router.available(self.providers)
+        if not candidates:
+            raise LLMError("All LLM providers are unavailable (circuit breakers open)")
+        return candidates
+
+    async def generate_text(self, prompt: str, **kwargs) -> str:
+        """Generate text on the healthiest provider, failing over on errors."""
+        if llm_hedger.enabled and len(self.providers) > 1:
+            # Hedging needs first-token timing, which only streams provide
+            return "".join([chunk.content async for chunk in self.generate_stream(prompt, **kwargs)])
+
+        last_exception: Optional[Exception] = None
+
+        for provider in self._candidates():
+            breaker = self.router.health(provider).breaker
+            if not breaker.allow_request():
+                continue
+
+            started = time.perf_counter()
+            recorded = False
+            try:
+                text = await provider.generate_text(prompt, **kwargs)
+                self.router.record(provider, True, time.perf_counter() - started)
+                recorded = True
+                self._last = provider
+                return text
+            except LLMConfigurationError:
+                raise
+            except LLMOverloadedError as e:
+                # Our own bulkhead is full: try the next provider without blaming this one
+                last_exception = e
+            except Exception as e:
+                self.router.record(provider, False, time.perf_counter() - started)
+                recorded = True
+                last_exception = e
+            finally:
+                if not recorded:
+                    # Cancelled: no verdict on the provider's health
+                    breaker.release()
+
+        raise last_exception or LLMError("All LLM providers are unavailable (circuit breakers open)")
+
+    async def generate_with_retry(self, prompt: str, **kwargs) -> str:
+        """Failover already retries on the next provider."""
+        return await self.generate_text(prompt, **kwargs)
+
+    async def generate_stream(self, prompt: str, **kwargs) -> AsyncIterator[LLMStreamChunk]:
+        """Stream from the healthiest provider.
+
+        A provider that fails before its first chunk is failed over; once
+        content has been sent, errors propagate to the caller. With hedging
+        enabled, the two healthiest targets are raced first.
+        """
+        last_exception: Optional[Exception] = None
+        candidates = self._candidates()
+
+        closed = [p for p in candidates if self.router.health(p).breaker.state == CircuitBreaker.CLOSED]
+        if llm_hedger.enabled and len(closed) >= 2 and closed[0] is candidates[0]:
+            pair = closed[:2]
+            attempted: List[LLMProvider] = []
+            emitted = False
+
+            def on_result(provider: LLMProvider, success: bool, latency: float) -> None:
+                attempted.append(provider)
+                self.router.record(provider, success, latency)
+
+            try:
+                hedged = llm_hedger.stream(pair[0], pair[1], prompt, on_result=on_result, **kwargs)
+                async with aclosing(hedged):
+                    async for provider, chunk in hedged:
+                        self._last = provider
+                        emitted = True
+                        yield chunk
+                return
+            except LLMConfigurationError:
+                raise
+            except Exception as e:
+                if emitted:
+                    raise
+                last_exception = e
+            # Only providers the hedger actually tried are skipped by the failover below
+            candidates = [p for p in candidates if p not in attempted]
+
+        for provider in candidates:
+            breaker = self.router.health(provider).breaker
+            if not breaker.allow_request():
+                continue
+
+            started = time.perf_counter()
+            emitted = False
+            recorded = False
+            try:
+                stream = provider.generate_stream(prompt, **kwargs)
+                async with aclosing(stream):
+                    async for chunk in stream:
+                        if not emitted:
+                            self._last = provider
+                        emitted = True
+                        if chunk.done:
+                            self.router.record(provider, True, time.perf_counter() - started)
+                            recorded = True
+                        yield chunk
+                return
+            except LLMConfigurationError:
+                raise
+            except LLMOverloadedError as e:
+                # Our own bulkhead is full: try the next provider without blaming this one
+                last_exception = e
+            except Exception as e:
+                self.router.record(provider, False, time.perf_counter() - started)
+                recorded = True
+                if emitted:
+                    raise
+                last_exception = e
+            finally:
+                if not recorded:
+                    # Cancelled or closed early: no verdict on the provider's health
+                    breaker.release()
+
+        raise last_exception or LLMError("All LLM providers are unavailable (circuit breakers open)")
+
+
+# Process-wide router, configured at application startup
+llm_router = LLMRouter()
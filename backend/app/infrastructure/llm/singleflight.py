@@ -0,0 +1,75 @@
+"""
+Single-flight de-duplication of identical in-flight LLM calls.
+
+Concurrent callers with the same request key await one upstream call and
+share its result. The upstream call is cancelled only once every waiter
+has gone away.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class _Flight:
+    """An upstream call and the number of callers waiting on it."""
+
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one call."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._flights: Dict[str, _Flight] = {}
+        self.stats: Dict[str, int] = {"calls": 0, "coalesced": 0, "cancelled": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run ``fn`` once per key, sharing the result with concurrent callers."""
+        if not self.enabled:
+            return await fn()
+
+        flight = self._flights.get(key)
+        if flight is None:
+            task = asyncio.ensure_future(fn())
+            flight = _Flight(task)
+            self._flights[key] = flight
+            task.add_done_callback(lambda _: self._forget(key, flight))
+            self.stats["calls"] += 1
+        else:
+            self.stats["coalesced"] += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done() and flight.waiters == 1:
+                # Last waiter left: nobody needs the upstream result any more
+                flight.task.cancel()
+                self.stats["cancelled"] += 1
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled():
+            # Mark the exception as retrieved when every waiter was cancelled
+            flight.task.exception()
+
+    @property
+    def in_flight(self) -> int:
+        """Number of distinct upstream calls currently running."""
+        return len(self._flights)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get single-flight counters."""
+        return {"enabled": self.enabled, "in_flight": self.in_flight, **self.stats}
+
+
+# Process-wide single-flight group for chat completions
+llm_single_flight = SingleFlight()
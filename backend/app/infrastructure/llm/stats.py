@@ -0,0 +1,13 @@
+"""
+Small statistics helpers shared by the LLM layer.
+"""
+from typing import List, Optional
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of ``values`` (``fraction`` in 0..1)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
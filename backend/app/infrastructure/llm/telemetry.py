@@ -0,0 +1,245 @@
+"""
+Per-call LLM telemetry exported in the Prometheus text format.
+
+Every HTTP attempt is recorded with its provider, model, outcome, latency
+and (for streams) time-to-first-token; reported token usage feeds token
+and cost counters; retries and cache hits are counted, as are the timeouts
+chosen for each call and the calls that hit them. Everything is aggregated
+in memory and rendered by ``render()`` for ``GET /metrics``.
+"""
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+TTFT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Label names of an adaptive timeout key
+_TIMEOUT_LABELS = ("provider", "model", "size", "mode")
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a sum and a count."""
+
+    def __init__(self, buckets: Iterable[float]):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """``(le, cumulative count)`` pairs including ``+Inf``."""
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            pairs.append(("+Inf" if bound == float("inf") else _format_number(bound), total))
+        return pairs
+
+
+class LLMTelemetry:
+    """In-memory counters and histograms of LLM calls."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.prices: Dict[str, Dict[str, float]] = {}
+        self.reset()
+
+    def configure(self, prices: Optional[Dict[str, Dict[str, float]]] = None) -> None:
+        """Set token prices in USD per million tokens.
+
+        Keys are ``provider`` or ``provider:model``; values use ``prompt``,
+        ``completion`` and optionally ``cached`` (defaults to ``prompt``).
+        """
+        self.prices = prices or {}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._requests: Dict[Labels, int] = {}
+            self._latency: Dict[Labels, Histogram] = {}
+            self._ttft: Dict[Labels, Histogram] = {}
+            self._tokens: Dict[Labels, int] = {}
+            self._cost: Dict[Labels, float] = {}
+            self._retries: Dict[Labels, int] = {}
+            self._timeout_seconds: Dict[Labels, float] = {}
+            self._timeout_decisions: Dict[Labels, int] = {}
+            self._timeouts: Dict[Labels, int] = {}
+
+    def observe_call(
+        self,
+        provider_name: str,
+        model: str,
+        outcome: str,
+        latency: Optional[float] = None,
+        time_to_first_token: Optional[float] = None,
+    ) -> None:
+        """Record one call attempt; calls rejected before sending have no latency."""
+        labels = (("provider", provider_name), ("model", model))
+        with self._lock:
+            key = labels + (("outcome", outcome),)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            if latency is not None:
+                self._histogram(self._latency, labels, LATENCY_BUCKETS).observe(latency)
+            if time_to_first_token is not None:
+                self._histogram(self._ttft, labels, TTFT_BUCKETS).observe(time_to_first_token)
+
+    def record_usage(
+        self,
+        provider_name: str,
+        model: str,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        cached_tokens: int = 0,
+    ) -> None:
+        """Add reported token usage and its cost."""
+        labels = (("provider", provider_name), ("model", model))
+        with self._lock:
+            for kind, tokens in (("prompt", prompt_tokens), ("completion", completion_tokens), ("cached", cached_tokens)):
+                key = labels + (("kind", kind),)
+                self._tokens[key] = self._tokens.get(key, 0) + tokens
+            self._cost[labels] = self._cost.get(labels, 0.0) + self.cost(
+                provider_name, model, prompt_tokens, completion_tokens, cached_tokens
+            )
+
+    def record_retry(self, provider_name: str, model: str) -> None:
+        labels = (("provider", provider_name), ("model", model))
+        with self._lock:
+            self._retries[labels] = self._retries.get(labels, 0) + 1
+
+    def observe_timeout_decision(self, key: Tuple[str, ...], timeouts: Dict[str, float], adaptive: bool) -> None:
+        """Record the timeouts chosen for a call (see ``AdaptiveTimeouts``)."""
+        labels = tuple(zip(_TIMEOUT_LABELS, key))
+        with self._lock:
+            for kind, seconds in timeouts.items():
+                self._timeout_seconds[labels + (("kind", kind),)] = seconds
+            decision = labels + (("source", "adaptive" if adaptive else "default"),)
+            self._timeout_decisions[decision] = self._timeout_decisions.get(decision, 0) + 1
+
+    def record_timeout(self, key: Tuple[str, ...], kind: str) -> None:
+        """Count a call that hit its connect, first-byte or total timeout."""
+        labels = tuple(zip(_TIMEOUT_LABELS, key)) + (("kind", kind),)
+        with self._lock:
+            self._timeouts[labels] = self._timeouts.get(labels, 0) + 1
+
+    def cost(
+        self,
+        provider_name: str,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached_tokens: int = 0,
+    ) -> float:
+        """Cost in USD of one call's usage; 0 when no price is configured."""
+        price = self.prices.get(f"{provider_name}:{model}") or self.prices.get(provider_name)
+        if not price:
+            return 0.0
+        prompt_price = price.get("prompt", 0.0)
+        cached_price = price.get("cached", prompt_price)
+        uncached = max(prompt_tokens - cached_tokens, 0)
+        return (
+            uncached * prompt_price
+            + cached_tokens * cached_price
+            + completion_tokens * price.get("completion", 0.0)
+        ) / 1_000_000
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            self._render_counter(
+                lines, "deepcard_llm_requests_total",
+                "LLM call attempts by outcome.", self._requests,
+            )
+            self._render_histogram(
+                lines, "deepcard_llm_request_duration_seconds",
+                "LLM call latency, from sending the request to the last byte.", self._latency,
+            )
+            self._render_histogram(
+                lines, "deepcard_llm_time_to_first_token_seconds",
+                "Time from sending a streamed LLM request to its first content token.", self._ttft,
+            )
+            self._render_counter(
+                lines, "deepcard_llm_tokens_total",
+                "Tokens reported by LLM providers.", self._tokens,
+            )
+            self._render_counter(
+                lines, "deepcard_llm_cost_usd_total",
+                "Estimated LLM cost from configured token prices.", self._cost,
+            )
+            self._render_counter(
+                lines, "deepcard_llm_retries_total",
+                "LLM calls retried after a failed attempt.", self._retries,
+            )
+            self._render_gauge(
+                lines, "deepcard_llm_timeout_seconds",
+                "Timeout most recently chosen per provider, model, size bucket and mode.", self._timeout_seconds,
+            )
+            self._render_counter(
+                lines, "deepcard_llm_timeout_decisions_total",
+                "Timeout decisions by source (adaptive percentiles or static default).", self._timeout_decisions,
+            )
+            self._render_counter(
+                lines, "deepcard_llm_timeouts_total",
+                "LLM calls that hit a connect, first-byte or total timeout.", self._timeouts,
+            )
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _histogram(histograms: Dict[Labels, Histogram], labels: Labels, buckets: Tuple[float, ...]) -> Histogram:
+        histogram = histograms.get(labels)
+        if histogram is None:
+            histogram = Histogram(buckets)
+            histograms[labels] = histogram
+        return histogram
+
+    @staticmethod
+    def _render_counter(lines: List[str], name: str, help_text: str, values: Dict[Labels, float]) -> None:
+        LLMTelemetry._render_values(lines, name, "counter", help_text, values)
+
+    @staticmethod
+    def _render_gauge(lines: List[str], name: str, help_text: str, values: Dict[Labels, float]) -> None:
+        LLMTelemetry._render_values(lines, name, "gauge", help_text, values)
+
+    @staticmethod
+    def _render_values(lines: List[str], name: str, metric_type: str, help_text: str, values: Dict[Labels, float]) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in sorted(values.items()):
+            lines.append(f"{name}{_format_labels(labels)} {_format_number(value)}")
+
+    @staticmethod
+    def _render_histogram(lines: List[str], name: str, help_text: str, histograms: Dict[Labels, Histogram]) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, histogram in sorted(histograms.items()):
+            for bound, count in histogram.cumulative():
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_number(histogram.sum)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+
+
+def _format_labels(labels: Labels) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _escape(value: str) -> str:
+    """Escape a label value: backslash, double quote and newline."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_number(value: float) -> str:
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# Process-wide telemetry, configured at application startup
+llm_telemetry = LLMTelemetry()
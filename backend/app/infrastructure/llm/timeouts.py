@@ -0,0 +1,205 @@
+"""
+Adaptive LLM call timeouts.
+
+Connect, first-byte and total timeouts are derived per provider, model,
+request size bucket and mode (blocking or streamed) from a rolling window
+of observed latencies: a high percentile times a safety multiplier,
+clamped to configured bounds. Until a key has enough samples, connect and
+first byte use the provider's static timeout, which callers take from
+``settings.LLM_TIMEOUT`` (clamped to each kind's bounds), and the total is
+its upper bound (``LLM_TIMEOUT_TOTAL_MAX``, 300s by default). Timed-out
+calls are recorded at their limit so a too-tight timeout loosens itself
+again.
+"""
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.infrastructure.llm.stats import percentile
+from app.infrastructure.llm.telemetry import llm_telemetry
+
+# (provider, model, size bucket, mode)
+TimeoutKey = Tuple[str, str, str, str]
+
+KINDS = ("connect", "first_byte", "total")
+
+
+class TotalTimeout(httpx.TimeoutException):
+    """Raised when a call exceeds its total timeout."""
+
+
+@dataclass(frozen=True)
+class TimeoutDecision:
+    """Timeouts chosen for one call, in seconds; ``total`` None means unbounded."""
+    key: TimeoutKey
+    connect: float
+    first_byte: float
+    total: Optional[float]
+    adaptive: bool
+
+    def httpx_timeout(self) -> httpx.Timeout:
+        """Connect timeout plus a per-read timeout bounding the wait for each byte."""
+        return httpx.Timeout(
+            connect=self.connect,
+            read=self.first_byte,
+            write=self.first_byte,
+            pool=self.first_byte,
+        )
+
+
+class RequestTimer:
+    """httpcore ``trace`` extension timing connection setup and response headers.
+
+    Pooled keep-alive connections skip connection setup, so ``connect`` is
+    only measured for new connections.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.connect: Optional[float] = None
+        self.headers: Optional[float] = None
+        self._connect_started: Optional[float] = None
+
+    async def __call__(self, event_name: str, info: Dict[str, Any]) -> None:
+        now = time.perf_counter()
+        if event_name == "connection.connect_tcp.started":
+            self._connect_started = now
+        elif event_name in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            if self._connect_started is not None:
+                self.connect = now - self._connect_started
+        elif event_name.endswith("receive_response_headers.complete"):
+            self.headers = now - self.started
+
+
+class AdaptiveTimeouts:
+    """Rolling latency windows and the timeouts derived from them."""
+
+    def __init__(self):
+        self._samples: Dict[TimeoutKey, Dict[str, Deque[float]]] = {}
+        self.configure()
+
+    def configure(
+        self,
+        enabled: bool = False,
+        percentile: float = 0.99,
+        multiplier: float = 1.5,
+        min_samples: int = 20,
+        window_size: int = 200,
+        size_buckets: Optional[List[int]] = None,
+        connect_bounds: Tuple[float, float] = (1.0, 10.0),
+        first_byte_bounds: Tuple[float, float] = (2.0, 60.0),
+        total_bounds: Tuple[float, float] = (5.0, 300.0),
+    ) -> None:
+        """Configure adaptation; when disabled the static provider timeout applies."""
+        self.enabled = enabled
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self.window_size = window_size
+        self.size_buckets = sorted(size_buckets or [1000, 4000, 16000])
+        self.bounds = {
+            "connect": connect_bounds,
+            "first_byte": first_byte_bounds,
+            "total": total_bounds,
+        }
+        self._samples.clear()
+
+    def size_bucket(self, estimated_tokens: int) -> str:
+        """Label of the smallest bucket holding ``estimated_tokens``."""
+        for limit in self.size_buckets:
+            if estimated_tokens <= limit:
+                return f"le{limit}"
+        return f"gt{self.size_buckets[-1]}"
+
+    def decide(
+        self,
+        provider_name: str,
+        model: str,
+        estimated_tokens: int,
+        stream: bool,
+        default: float,
+    ) -> TimeoutDecision:
+        """Pick the timeouts for a call and report them to telemetry."""
+        key = (provider_name, model, self.size_bucket(estimated_tokens), "stream" if stream else "blocking")
+        if not self.enabled:
+            return TimeoutDecision(key, default, default, None, adaptive=False)
+
+        adaptive = False
+        values = {}
+        for kind in KINDS:
+            low, high = self.bounds[kind]
+            derived = self._derive(key, kind)
+            if derived is None:
+                # Cold start: the static timeout (LLM_TIMEOUT), and the loosest total
+                derived = high if kind == "total" else default
+            else:
+                adaptive = True
+            values[kind] = min(high, max(low, derived))
+
+        decision = TimeoutDecision(key, values["connect"], values["first_byte"], values["total"], adaptive)
+        llm_telemetry.observe_timeout_decision(key, values, adaptive)
+        return decision
+
+    def record(
+        self,
+        decision: TimeoutDecision,
+        connect: Optional[float] = None,
+        first_byte: Optional[float] = None,
+        total: Optional[float] = None,
+    ) -> None:
+        """Add the observed latencies of a finished call."""
+        if not self.enabled:
+            return
+        for kind, value in (("connect", connect), ("first_byte", first_byte), ("total", total)):
+            if value is not None:
+                self._window(decision.key, kind).append(value)
+
+    def record_timeout(self, decision: TimeoutDecision, error: httpx.TimeoutException) -> None:
+        """Record a timed-out call at the limit it hit."""
+        kind = self.timeout_kind(error)
+        llm_telemetry.record_timeout(decision.key, kind)
+        limit = getattr(decision, kind)
+        if self.enabled and limit is not None:
+            self._window(decision.key, kind).append(limit)
+
+    @staticmethod
+    def timeout_kind(error: httpx.TimeoutException) -> str:
+        if isinstance(error, TotalTimeout):
+            return "total"
+        if isinstance(error, httpx.ConnectTimeout):
+            return "connect"
+        return "first_byte"
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the sample counts and current derived timeouts per key."""
+        stats = {}
+        for key, windows in self._samples.items():
+            stats[":".join(key)] = {}
+            for kind in KINDS:
+                derived = self._derive(key, kind)
+                low, high = self.bounds[kind]
+                stats[":".join(key)][kind] = {
+                    "samples": len(windows[kind]),
+                    "timeout": round(min(high, max(low, derived)), 3) if derived is not None else None,
+                }
+        return {"enabled": self.enabled, "keys": stats}
+
+    def _derive(self, key: TimeoutKey, kind: str) -> Optional[float]:
+        samples = self._samples.get(key, {}).get(kind)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        return percentile(list(samples), self.percentile) * self.multiplier
+
+    def _window(self, key: TimeoutKey, kind: str) -> Deque[float]:
+        windows = self._samples.get(key)
+        if windows is None:
+            windows = {name: deque(maxlen=self.window_size) for name in KINDS}
+            self._samples[key] = windows
+        return windows[kind]
+
+
+# Process-wide adaptive timeouts, configured at application startup
+llm_timeouts = AdaptiveTimeouts()
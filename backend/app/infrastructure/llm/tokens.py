@@ -0,0 +1,54 @@
+"""
+Local token estimation for mixed Chinese/English text.
+
+No tokenizer is bundled, so counts are estimated from character classes:
+one token per CJK character (cl100k averages a little above, DeepSeek and
+Qwen tokenizers a little below), one token per short English word plus one
+per further six letters, one per three digits and one per other symbol.
+Estimates are meant for budgeting, not billing.
+"""
+import re
+from typing import Any, Dict, Iterable
+
+CJK_TOKENS_PER_CHAR = 1.0
+LETTERS_PER_TOKEN = 6
+DIGITS_PER_TOKEN = 3
+# Chat format framing per message and for priming the reply
+MESSAGE_OVERHEAD_TOKENS = 4
+REPLY_OVERHEAD_TOKENS = 3
+
+_PIECES = re.compile(
+    r"(?P<cjk>[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿])"
+    r"|(?P<word>[A-Za-z]+)"
+    r"|(?P<number>\d+)"
+    r"|(?P<other>\S)"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate how many tokens ``text`` encodes to."""
+    if not text:
+        return 0
+
+    cjk = 0
+    tokens = 0
+    for match in _PIECES.finditer(text):
+        kind = match.lastgroup
+        if kind == "cjk":
+            cjk += 1
+        elif kind == "word":
+            tokens += -(-len(match.group()) // LETTERS_PER_TOKEN)
+        elif kind == "number":
+            tokens += -(-len(match.group()) // DIGITS_PER_TOKEN)
+        else:
+            tokens += 1
+    return tokens + round(cjk * CJK_TOKENS_PER_CHAR)
+
+
+def estimate_messages_tokens(messages: Iterable[Dict[str, Any]]) -> int:
+    """Estimate the prompt tokens of a chat completion ``messages`` list."""
+    total = REPLY_OVERHEAD_TOKENS
+    for message in messages:
+        content = message.get("content") or ""
+        total += MESSAGE_OVERHEAD_TOKENS + estimate_tokens(content if isinstance(content, str) else str(content))
+    return total
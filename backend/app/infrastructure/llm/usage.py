@@ -0,0 +1,55 @@
+"""
+Token usage accounting per provider/model.
+
+Tracks prompt, completion and provider-reported cached prompt tokens so the
+effect of prompt-prefix caching is visible.
+"""
+from typing import Any, Dict, Tuple
+
+
+class UsageTracker:
+    """Process-wide token counters keyed by provider and model."""
+
+    def __init__(self):
+        self._usage: Dict[Tuple[str, str], Dict[str, int]] = {}
+
+    def record(
+        self,
+        provider_name: str,
+        model: str,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        cached_tokens: int = 0,
+    ) -> None:
+        """Add the usage of one completed call."""
+        usage = self._usage.setdefault((provider_name, model), {
+            "requests": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "cached_tokens": 0,
+            "cache_hit_requests": 0,
+        })
+        usage["requests"] += 1
+        usage["prompt_tokens"] += prompt_tokens
+        usage["completion_tokens"] += completion_tokens
+        usage["cached_tokens"] += cached_tokens
+        if cached_tokens:
+            usage["cache_hit_requests"] += 1
+
+    def reset(self) -> None:
+        self._usage.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get token counters and the cached share of prompt tokens."""
+        return {
+            f"{provider}:{model}": {
+                **usage,
+                "cached_ratio": round(usage["cached_tokens"] / usage["prompt_tokens"], 4)
+                if usage["prompt_tokens"] else 0.0,
+            }
+            for (provider, model), usage in self._usage.items()
+        }
+
+
+# Process-wide usage tracker
+llm_usage = UsageTracker()
@@ -0,0 +1,112 @@
+"""
+Connection pre-warming for LLM providers.
+
+Right after startup every provider's pooled client is empty, so the first
+calls pay DNS resolution, TCP and TLS setup. The warmer resolves each
+configured ``base_url`` and opens a number of keep-alive connections to it
+by sending concurrent ``GET /models`` requests (any HTTP status counts: the
+connection is what matters; over HTTP/2 they share one connection).
+``ready`` stays False until warm-up finishes so a readiness probe can hold
+traffic back until then. Warmed connections are dropped after
+``LLM_KEEPALIVE_EXPIRY`` seconds idle, like any pooled connection.
+"""
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.infrastructure.llm.http_client import LLMHTTPClientPool, llm_client_pool
+
+
+class LLMConnectionWarmer:
+    """Warms the pooled connections of every configured provider."""
+
+    def __init__(self, pool: LLMHTTPClientPool = llm_client_pool):
+        self.pool = pool
+        self._task: Optional["asyncio.Task[None]"] = None
+        self.configure()
+
+    def configure(self, enabled: bool = False, connections: int = 2, timeout: float = 10.0) -> None:
+        """Configure warm-up; when disabled the warmer reports ready at once."""
+        self.enabled = enabled
+        self.connections = connections
+        self.timeout = timeout
+        self.state = "pending" if enabled else "disabled"
+        self.duration: Optional[float] = None
+        self.targets: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.state in ("disabled", "ready")
+
+    def start(self, base_urls: List[str]) -> None:
+        """Warm up in the background; ``ready`` flips once it completes."""
+        if self.enabled:
+            self._task = asyncio.create_task(self.warm(base_urls))
+
+    async def stop(self) -> None:
+        """Cancel a warm-up still in progress."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def warm(self, base_urls: List[str]) -> None:
+        """Resolve and open keep-alive connections to every base URL.
+
+        Failures are recorded per target and never block readiness: a
+        target that cannot be warmed is simply connected on first use.
+        """
+        self.state = "warming"
+        started = time.perf_counter()
+        await asyncio.gather(*(self._warm_target(base_url) for base_url in base_urls))
+        self.duration = round(time.perf_counter() - started, 3)
+        self.state = "ready"
+
+    async def _warm_target(self, base_url: str) -> None:
+        target: Dict[str, Any] = {"dns_seconds": None, "connections": 0, "errors": []}
+        self.targets[base_url] = target
+        try:
+            await asyncio.wait_for(self._open_connections(base_url, target), self.timeout)
+        except asyncio.TimeoutError:
+            target["errors"].append(f"warm-up timed out after {self.timeout}s")
+
+    async def _open_connections(self, base_url: str, target: Dict[str, Any]) -> None:
+        url = urlsplit(base_url)
+        started = time.perf_counter()
+        try:
+            await asyncio.get_running_loop().getaddrinfo(
+                url.hostname, url.port or (443 if url.scheme == "https" else 80)
+            )
+            target["dns_seconds"] = round(time.perf_counter() - started, 3)
+        except OSError as e:
+            target["errors"].append(f"DNS resolution failed: {e}")
+            return
+
+        # Never open more connections than the pool keeps alive
+        count = min(self.connections, self.pool.limits.max_keepalive_connections or self.connections)
+        client = self.pool.get_client(base_url)
+        results = await asyncio.gather(
+            *(client.get(f"{base_url.rstrip('/')}/models") for _ in range(count)),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, httpx.Response):
+                target["connections"] += 1
+            else:
+                target["errors"].append(f"{type(result).__name__}: {result}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the warm-up state and per-target results."""
+        return {
+            "state": self.state,
+            "ready": self.ready,
+            "duration": self.duration,
+            "targets": self.targets,
+        }
+
+
+# Process-wide warmer, configured at application startup
+llm_warmer = LLMConnectionWarmer()
@@ -16,16 +16,7 @@ class SQLAlchemyCardRepository(CardRepository):
 
     async def create(self, card: Card) -> Card:
         """创建卡片"""
-        db_card = CardModel(
-            id=card.id,
-            user_id=card.user_id,
-            title=card.title,
-            card_type=card.card_type.value,
-            content=card.content.dict(),
-            tags=card.tags,
-            created_at=card.created_at,
-            updated_at=card.updated_at,
-        )
+        db_card = self._entity_to_model(card)
 
         self.db.add(db_card)
         self.db.commit()
@@ -33,6 +24,21 @@ class SQLAlchemyCardRepository(CardRepository):
 
         return self._model_to_entity(db_card)
 
+    async def create_many(self, cards: List[Card]) -> List[Card]:
+        """在同一事务中批量创建卡片，任一失败则全部回滚"""
+        if not cards:
+            return []
+
+        try:
+            self.db.add_all([self._entity_to_model(card) for card in cards])
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        # 实体已包含全部字段，无需逐行refresh
+        return list(cards)
+
     async def get_by_id(self, card_id: str, user_id: str) -> Optional[Card]:
         """根据ID获取卡片（确保用户隔离）"""
         db_card = self.db.query(CardModel).filter(
@@ -98,8 +104,8 @@ class SQLAlchemyCardRepository(CardRepository):
                 CardModel.user_id == user_id,
                 or_(
                     CardModel.title.contains(query),
-                    CardModel.content["front"].astext.contains(query),
-                    CardModel.content["back"].astext.contains(query)
+                    CardModel.content["front"].as_string().contains(query),
+                    CardModel.content["back"].as_string().contains(query)
                 )
             )
         ).offset(skip).limit(limit).all()
@@ -117,6 +123,19 @@ class SQLAlchemyCardRepository(CardRepository):
 
         return [self._model_to_entity(card) for card in db_cards]
 
+    def _entity_to_model(self, card: Card) -> CardModel:
+        """将领域实体转换为数据库模型"""
+        return CardModel(
+            id=card.id,
+            user_id=card.user_id,
+            title=card.title,
+            card_type=card.card_type.value,
+            content=card.content.dict(),
+            tags=card.tags,
+            created_at=card.created_at,
+            updated_at=card.updated_at,
+        )
+
     def _model_to_entity(self, db_card: CardModel) -> Card:
         """将数据库模型转换为领域实体"""
         content = CardContentFactory.create_content(
@@ -1,13 +1,19 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Query
+import time
+from datetime import datetime
+from typing import Any, Dict, List, AsyncIterator, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.shared.database import get_db
 from app.application.card.dto import CreateCardRequest, UpdateCardRequest, CardResponse, CardListResponse
 from app.application.card.service import CardService
 from app.application.card.generator import CardGenerator
+from app.application.card.jobs import generation_workers
 from app.infrastructure.repositories.card_repository import SQLAlchemyCardRepository
+from app.domain.card.entity import Card
 from app.domain.card.value_objects import CardType
+from app.interfaces.api.v1.streaming import STREAMING_HEADERS, sse_event
 from pydantic import BaseModel, Field
 
 router = APIRouter()
@@ -17,7 +23,8 @@ class GenerateCardsRequest(BaseModel):
     """生成卡片请求DTO"""
     text: str = Field(..., description="输入文本")
     card_type: CardType = Field(CardType.BASIC, description="卡片类型")
-    provider: str = Field("siliconflow", description="LLM提供商")
+    card_types: Optional[List[CardType]] = Field(None, description="在一次调用中混合生成的卡片类型，指定后忽略 card_type")
+    provider: str = Field("siliconflow", description="LLM提供商，auto 表示按健康状况自动路由")
     max_cards: int = Field(5, ge=1, le=20, description="最大生成卡片数")
     auto_save: bool = Field(True, description="是否自动保存生成的卡片")
 
@@ -31,17 +38,113 @@ class GenerateCardsResponse(BaseModel):
     saved_cards: List[CardResponse]
     total_generated: int
     total_saved: int
+    type_counts: Dict[str, int] = Field(default_factory=dict, description="按卡片类型统计的生成数量")
+    salvaged_count: int = Field(0, description="从截断或格式有误的输出中修复保留的卡片数")
+    dropped_count: int = Field(0, description="因截断或无效而丢弃的卡片数")
+    failed_chunk_count: int = Field(0, description="生成失败而被跳过的文本块数")
 
     class Config:
         extra = "ignore"
 
 
+class GenerateCardsBatchItem(BaseModel):
+    """批量生成中的单项文本"""
+    text: str = Field(..., description="输入文本")
+    card_type: CardType = Field(CardType.BASIC, description="卡片类型")
+    card_types: Optional[List[CardType]] = Field(None, description="在一次调用中混合生成的卡片类型，指定后忽略 card_type")
+    max_cards: int = Field(5, ge=1, le=20, description="最大生成卡片数")
+
+    class Config:
+        extra = "ignore"
+
+
+class GenerateCardsBatchRequest(BaseModel):
+    """批量生成卡片请求DTO"""
+    items: List[GenerateCardsBatchItem] = Field(..., min_length=1, max_length=50, description="待生成的文本列表")
+    provider: str = Field("siliconflow", description="LLM提供商，auto 表示按健康状况自动路由")
+    auto_save: bool = Field(True, description="是否自动保存生成的卡片")
+
+    class Config:
+        extra = "ignore"
+
+
+class GenerateCardsBatchItemResult(BaseModel):
+    """批量生成中单项的结果"""
+    index: int
+    cards: List[CardResponse]
+    total_generated: int
+    type_counts: Dict[str, int] = Field(default_factory=dict)
+    saved: bool
+    error: Optional[str] = None
+
+
+class GenerateCardsBatchResponse(BaseModel):
+    """批量生成卡片响应DTO"""
+    results: List[GenerateCardsBatchItemResult]
+    total_generated: int
+    total_saved: int
+    total_failed: int
+    salvaged_count: int = 0
+    dropped_count: int = 0
+    failed_chunk_count: int = 0
+    save_error: Optional[str] = None
+
+
+class GenerationJobResponse(BaseModel):
+    """生成任务状态DTO"""
+    job_id: str
+    status: str = Field(..., description="pending / running / completed / failed")
+    progress: Optional[Dict[str, Any]] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+
+def _job_to_response(job: Dict[str, Any]) -> GenerationJobResponse:
+    """将任务记录转换为响应DTO"""
+
+    def timestamp(value: Optional[float]) -> Optional[str]:
+        return datetime.utcfromtimestamp(value).isoformat() if value is not None else None
+
+    return GenerationJobResponse(
+        job_id=job["id"],
+        status=job["status"],
+        progress=job["progress"],
+        result=job["result"],
+        error=job["error"],
+        created_at=timestamp(job["created_at"]),
+        started_at=timestamp(job["started_at"]),
+        finished_at=timestamp(job["finished_at"])
+    )
+
+
 def get_card_service(db: Session = Depends(get_db)) -> CardService:
     """获取卡片服务实例"""
     repository = SQLAlchemyCardRepository(db)
     return CardService(repository)
 
 
+def _server_timing(timings: Dict[str, float]) -> str:
+    """各阶段耗时（秒）格式化为 Server-Timing 响应头（毫秒）"""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
+
+
+def _card_to_response(card: Card) -> CardResponse:
+    """将未保存的卡片实体转换为响应DTO"""
+    return CardResponse(
+        id=card.id,
+        user_id=card.user_id,
+        title=card.title,
+        card_type=card.card_type,
+        content=card.content.dict(),
+        tags=card.tags,
+        created_at=card.created_at.isoformat(),
+        updated_at=card.updated_at.isoformat()
+    )
+
+
 @router.post("/cards", response_model=CardResponse)
 async def create_card(
     request: CreateCardRequest,
@@ -55,6 +158,32 @@ async def create_card(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+# 固定路径需在 /cards/{card_id} 之前注册，否则会被当作卡片ID匹配
+@router.get("/cards/search", response_model=CardListResponse)
+async def search_cards(
+    user_id: str = Query(..., description="用户ID"),
+    q: str = Query(..., description="搜索关键词"),
+    skip: int = Query(0, ge=0, description="跳过的卡片数量"),
+    limit: int = Query(100, ge=1, le=1000, description="返回的卡片数量"),
+    card_service: CardService = Depends(get_card_service)
+):
+    """搜索卡片"""
+    return await card_service.search_cards(user_id, q, skip, limit)
+
+
+@router.get("/cards/by-tags", response_model=CardListResponse)
+async def get_cards_by_tags(
+    user_id: str = Query(..., description="用户ID"),
+    tags: str = Query(..., description="标签列表，用逗号分隔"),
+    skip: int = Query(0, ge=0, description="跳过的卡片数量"),
+    limit: int = Query(100, ge=1, le=1000, description="返回的卡片数量"),
+    card_service: CardService = Depends(get_card_service)
+):
+    """根据标签获取卡片"""
+    tag_list = [tag.strip() for tag in tags.split(",") if tag.strip()]
+    return await card_service.get_cards_by_tags(user_id, tag_list, skip, limit)
+
+
 @router.get("/cards/{card_id}", response_model=CardResponse)
 async def get_card(
     card_id: str,
@@ -109,38 +238,17 @@ async def delete_card(
     return {"message": "Card deleted successfully"}
 
 
-@router.get("/cards/search", response_model=CardListResponse)
-async def search_cards(
-    user_id: str = Query(..., description="用户ID"),
-    q: str = Query(..., description="搜索关键词"),
-    skip: int = Query(0, ge=0, description="跳过的卡片数量"),
-    limit: int = Query(100, ge=1, le=1000, description="返回的卡片数量"),
-    card_service: CardService = Depends(get_card_service)
-):
-    """搜索卡片"""
-    return await card_service.search_cards(user_id, q, skip, limit)
-
-
-@router.get("/cards/by-tags", response_model=CardListResponse)
-async def get_cards_by_tags(
-    user_id: str = Query(..., description="用户ID"),
-    tags: str = Query(..., description="标签列表，用逗号分隔"),
-    skip: int = Query(0, ge=0, description="跳过的卡片数量"),
-    limit: int = Query(100, ge=1, le=1000, description="返回的卡片数量"),
-    card_service: CardService = Depends(get_card_service)
-):
-    """根据标签获取卡片"""
-    tag_list = [tag.strip() for tag in tags.split(",") if tag.strip()]
-    return await card_service.get_cards_by_tags(user_id, tag_list, skip, limit)
-
-
 @router.post("/cards/generate", response_model=GenerateCardsResponse)
 async def generate_cards(
     request: GenerateCardsRequest,
+    response: Response,
     user_id: str = Query(..., description="用户ID"),
     db: Session = Depends(get_db)
 ):
-    """从文本生成卡片"""
+    """从文本生成卡片
+
+    Server-Timing 响应头返回各阶段耗时：prompt、llm、parse、persist。
+    """
     try:
         # 创建卡片生成器
         generator = CardGenerator()
@@ -151,7 +259,8 @@ async def generate_cards(
             user_id=user_id,
             card_type=request.card_type,
             provider=request.provider,
-            max_cards=request.max_cards
+            max_cards=request.max_cards,
+            card_types=request.card_types
         )
 
         # 转换为响应格式
@@ -159,6 +268,7 @@ async def generate_cards(
         saved_responses = []
 
         # 如果需要自动保存
+        persist_started = time.perf_counter()
         if request.auto_save:
             card_service = get_card_service(db)
 
@@ -177,23 +287,228 @@ async def generate_cards(
         else:
             # 不自动保存，只返回生成的卡片
             for card in generated_cards:
-                generated_responses.append(CardResponse(
-                    id=card.id,
-                    user_id=card.user_id,
-                    title=card.title,
-                    card_type=card.card_type,
-                    content=card.content.dict(),
-                    tags=card.tags,
-                    created_at=card.created_at.isoformat(),
-                    updated_at=card.updated_at.isoformat()
-                ))
+                generated_responses.append(_card_to_response(card))
+
+        response.headers["Server-Timing"] = _server_timing({
+            **generator.stage_timings,
+            "persist": time.perf_counter() - persist_started
+        })
 
         return GenerateCardsResponse(
             generated_cards=generated_responses if not request.auto_save else saved_responses,
             saved_cards=saved_responses,
             total_generated=len(generated_cards),
-            total_saved=len(saved_responses)
+            total_saved=len(saved_responses),
+            type_counts=generator.count_by_type(generated_cards),
+            salvaged_count=generator.parse_stats["salvaged"],
+            dropped_count=generator.parse_stats["dropped"],
+            failed_chunk_count=generator.parse_stats["failed_chunks"]
         )
 
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"生成卡片失败: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=f"生成卡片失败: {str(e)}")
+
+
+@router.post("/cards/generate/batch", response_model=GenerateCardsBatchResponse)
+async def generate_cards_batch(
+    request: GenerateCardsBatchRequest,
+    response: Response,
+    user_id: str = Query(..., description="用户ID"),
+    db: Session = Depends(get_db)
+):
+    """批量从多段文本生成卡片
+
+    各项并发生成，成功生成的卡片在同一事务中批量保存。单项失败只在该项的
+    ``error`` 中返回，不影响其他项。Server-Timing 响应头返回各阶段耗时，
+    prompt、llm、parse 为各项累计值。
+    """
+    generator = CardGenerator()
+    results = await generator.generate_cards_batch(
+        [item.dict() for item in request.items],
+        user_id=user_id,
+        provider=request.provider
+    )
+
+    generated_cards = [card for result in results if not isinstance(result, Exception) for card in result]
+    responses = {card.id: _card_to_response(card) for card in generated_cards}
+    saved = False
+    save_error = None
+
+    persist_started = time.perf_counter()
+    if request.auto_save and generated_cards:
+        try:
+            card_service = get_card_service(db)
+            saved_responses = await card_service.save_cards(generated_cards)
+            responses = {card_response.id: card_response for card_response in saved_responses}
+            saved = True
+        except Exception as e:
+            save_error = f"保存卡片失败: {str(e)}"
+
+    response.headers["Server-Timing"] = _server_timing({
+        **generator.stage_timings,
+        "persist": time.perf_counter() - persist_started
+    })
+
+    item_results = []
+    for index, result in enumerate(results):
+        if isinstance(result, Exception):
+            item_results.append(GenerateCardsBatchItemResult(
+                index=index,
+                cards=[],
+                total_generated=0,
+                saved=False,
+                error=f"生成卡片失败: {str(result)}"
+            ))
+        else:
+            item_results.append(GenerateCardsBatchItemResult(
+                index=index,
+                cards=[responses[card.id] for card in result],
+                total_generated=len(result),
+                type_counts=generator.count_by_type(result),
+                saved=saved
+            ))
+
+    return GenerateCardsBatchResponse(
+        results=item_results,
+        total_generated=len(generated_cards),
+        total_saved=len(generated_cards) if saved else 0,
+        total_failed=sum(1 for result in results if isinstance(result, Exception)),
+        salvaged_count=generator.parse_stats["salvaged"],
+        dropped_count=generator.parse_stats["dropped"],
+        failed_chunk_count=generator.parse_stats["failed_chunks"],
+        save_error=save_error
+    )
+
+
+async def _stream_generated_cards(
+    request: GenerateCardsRequest,
+    user_id: str,
+    db: Session
+) -> AsyncIterator[str]:
+    """逐张推送生成的卡片，最后推送汇总帧"""
+    generator = CardGenerator()
+    card_service = get_card_service(db)
+    total_generated = 0
+    total_saved = 0
+    type_counts: Dict[str, int] = {}
+
+    try:
+        async for card in generator.generate_cards_stream(
+            text=request.text,
+            user_id=user_id,
+            card_type=request.card_type,
+            provider=request.provider,
+            max_cards=request.max_cards,
+            card_types=request.card_types
+        ):
+            total_generated += 1
+            type_counts[card.card_type.value] = type_counts.get(card.card_type.value, 0) + 1
+            response = _card_to_response(card)
+            saved = False
+
+            if request.auto_save:
+                try:
+                    response = await card_service.create_card(user_id, CreateCardRequest(
+                        title=card.title,
+                        card_type=card.card_type,
+                        content=card.content.dict(),
+                        tags=card.tags
+                    ))
+                    saved = True
+                    total_saved += 1
+                except Exception as e:
+                    print(f"保存卡片失败: {e}")
+
+            yield sse_event("card", {"card": response.dict(), "saved": saved})
+
+        yield sse_event("done", {
+            "total_generated": total_generated,
+            "total_saved": total_saved,
+            "type_counts": type_counts,
+            "dropped_count": generator.parse_stats["dropped"],
+            "stopped_early": generator.stream_savings["reason"],
+            "tokens_saved": generator.stream_savings["tokens_saved"],
+            "seconds_saved": generator.stream_savings["seconds_saved"]
+        })
+
+    except Exception as e:
+        # 响应头已发送，错误通过事件帧返回
+        yield sse_event("error", {"detail": f"生成卡片失败: {str(e)}"})
+
+
+@router.post("/cards/generate/stream")
+async def generate_cards_stream(
+    request: GenerateCardsRequest,
+    user_id: str = Query(..., description="用户ID"),
+    db: Session = Depends(get_db)
+):
+    """从文本流式生成卡片（Server-Sent Events）
+
+    每解析出一张有效卡片即推送一个 ``card`` 事件，结束时推送 ``done`` 汇总事件。
+    已得到 max_cards 张卡片或卡片数组闭合时提前结束LLM输出，``done`` 中的
+    stopped_early、tokens_saved、seconds_saved 报告提前结束的原因和估算节省量。
+    """
+    return StreamingResponse(
+        _stream_generated_cards(request, user_id, db),
+        media_type="text/event-stream",
+        headers=STREAMING_HEADERS
+    )
+
+
+def _require_job_store():
+    """任务队列未启动时返回503"""
+    if generation_workers.store is None:
+        raise HTTPException(status_code=503, detail="Generation job queue is not running")
+    return generation_workers.store
+
+
+@router.post("/cards/generate/jobs", response_model=GenerationJobResponse, status_code=202)
+async def create_generation_job(
+    request: GenerateCardsRequest,
+    user_id: str = Query(..., description="用户ID")
+):
+    """提交异步生成任务，立即返回任务ID
+
+    通过 ``GET /cards/jobs/{job_id}`` 轮询，或 ``GET /cards/jobs/{job_id}/events`` 订阅进度。
+    """
+    _require_job_store()
+    job = await generation_workers.submit(user_id, request.model_dump(mode="json"))
+    return _job_to_response(job)
+
+
+@router.get("/cards/jobs/{job_id}", response_model=GenerationJobResponse)
+async def get_generation_job(
+    job_id: str,
+    user_id: str = Query(..., description="用户ID")
+):
+    """查询生成任务状态与结果"""
+    job = await _require_job_store().get(job_id, user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_to_response(job)
+
+
+async def _stream_job_events(job_id: str) -> AsyncIterator[str]:
+    """推送任务事件直到任务结束"""
+    async for event in generation_workers.subscribe(job_id):
+        yield sse_event(event["event"], event["data"])
+
+
+@router.get("/cards/jobs/{job_id}/events")
+async def stream_generation_job_events(
+    job_id: str,
+    user_id: str = Query(..., description="用户ID")
+):
+    """订阅生成任务进度（Server-Sent Events）
+
+    推送 ``status``、``progress`` 事件，任务结束时推送 ``completed`` 或 ``failed``。
+    """
+    job = await _require_job_store().get(job_id, user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return StreamingResponse(
+        _stream_job_events(job_id),
+        media_type="text/event-stream",
+        headers=STREAMING_HEADERS
+    )
@@ -1,14 +1,28 @@
 """
 LLM-related API endpoints.
 """
-from typing import Dict, Any, List
+from dataclasses import asdict
+from typing import Dict, Any, List, AsyncIterator
 from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
 
 from app.shared.config import get_settings
-from app.infrastructure.llm import LLMFactory, LLMConfigurationError, LLMConnectionError
+from app.shared.logging_config import get_logger
+from app.infrastructure.llm import LLMFactory, LLMProvider, LLMConfigurationError, LLMConnectionError
+from app.infrastructure.llm.bulkhead import llm_bulkheads
+from app.infrastructure.llm.cache import llm_response_cache
+from app.infrastructure.llm.hedging import llm_hedger
+from app.infrastructure.llm.ratelimit import llm_rate_limiters
+from app.infrastructure.llm.router import llm_router
+from app.infrastructure.llm.singleflight import llm_single_flight
+from app.infrastructure.llm.timeouts import llm_timeouts
+from app.infrastructure.llm.usage import llm_usage
+from app.infrastructure.llm.warmup import llm_warmer
+from app.interfaces.api.v1.streaming import STREAMING_HEADERS, sse_event
 
 router = APIRouter()
 settings = get_settings()
+logger = get_logger(__name__)
 
 
 @router.get("/providers", response_model=Dict[str, Any])
@@ -33,6 +47,23 @@ async def get_llm_providers():
         )
 
 
+@router.get("/stats", response_model=Dict[str, Any])
+async def get_llm_stats():
+    """Get runtime statistics of the LLM layer."""
+    return {
+        "cache": llm_response_cache.get_stats(),
+        "single_flight": llm_single_flight.get_stats(),
+        "rate_limits": llm_rate_limiters.get_stats(),
+        "bulkheads": llm_bulkheads.get_stats(),
+        "router": llm_router.get_stats(),
+        "hedging": llm_hedger.get_stats(),
+        "timeouts": llm_timeouts.get_stats(),
+        "warmup": llm_warmer.get_stats(),
+        "usage": llm_usage.get_stats(),
+        "provider_instances": LLMFactory.get_registry_size()
+    }
+
+
 @router.post("/test", response_model=Dict[str, Any])
 async def test_llm_connection(request_data: Dict[str, Any]):
     """Test connection to an LLM provider."""
@@ -68,10 +99,11 @@ async def test_llm_connection(request_data: Dict[str, Any]):
             )
 
         # Create provider and test connection
-        provider = LLMFactory.create_provider(
+        provider = LLMFactory.get_provider(
             provider_name=provider_name,
             api_key=api_key,
             model=model,
+            base_url=settings.llm_provider_base_urls.get(provider_name),
             timeout=settings.LLM_TIMEOUT,
             max_retries=settings.LLM_MAX_RETRIES
         )
@@ -91,9 +123,42 @@ async def test_llm_connection(request_data: Dict[str, Any]):
         )
 
 
+async def _stream_generation(
+    provider: LLMProvider,
+    provider_name: str,
+    prompt: str,
+    generation_params: Dict[str, Any]
+) -> AsyncIterator[str]:
+    """Forward streamed tokens as SSE frames, ending with a summary frame."""
+    try:
+        async for chunk in provider.generate_stream(prompt, **generation_params):
+            if not chunk.done:
+                yield sse_event("token", {"text": chunk.content})
+                continue
+
+            yield sse_event("done", {
+                "provider": provider.provider_name,
+                "model": provider.model,
+                "parameters": generation_params,
+                "finish_reason": chunk.finish_reason,
+                "usage": asdict(chunk.usage) if chunk.usage else None,
+                "time_to_first_token": chunk.time_to_first_token,
+                "latency": chunk.latency
+            })
+    except Exception as e:
+        # Headers are already sent, so errors are reported in-band
+        logger.error("LLM流式生成失败: provider=%s, error=%s", provider_name, e)
+        yield sse_event("error", {"detail": f"Text generation failed: {str(e)}"})
+
+
 @router.post("/generate", response_model=Dict[str, Any])
 async def generate_text(request_data: Dict[str, Any]):
-    """Generate text using an LLM provider."""
+    """Generate text using an LLM provider.
+
+    Set ``"stream": true`` to receive a ``text/event-stream`` response with
+    ``token`` frames as they arrive and a final ``done`` frame holding the
+    model, parameters and token usage.
+    """
     try:
         provider_name = request_data.get("provider", settings.DEFAULT_LLM_PROVIDER)
         prompt = request_data.get("prompt")
@@ -107,7 +172,7 @@ async def generate_text(request_data: Dict[str, Any]):
             )
 
         # Get API key from request or settings
-        if not api_key:
+        if not api_key and provider_name != "auto":
             if provider_name == "openai":
                 api_key = settings.OPENAI_API_KEY
                 model = model or settings.OPENAI_MODEL
@@ -123,32 +188,43 @@ async def generate_text(request_data: Dict[str, Any]):
                     detail="API key is required for this provider"
                 )
 
-        if not api_key:
+        if provider_name == "auto":
+            # Route to the healthiest configured provider with failover
+            provider = llm_router.get_provider()
+        elif not api_key:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="API key is required"
             )
-
-        # Create provider and generate text
-        provider = LLMFactory.create_provider(
-            provider_name=provider_name,
-            api_key=api_key,
-            model=model,
-            timeout=settings.LLM_TIMEOUT,
-            max_retries=settings.LLM_MAX_RETRIES
-        )
+        else:
+            # Create provider and generate text
+            provider = LLMFactory.get_provider(
+                provider_name=provider_name,
+                api_key=api_key,
+                model=model,
+                base_url=settings.llm_provider_base_urls.get(provider_name),
+                timeout=settings.LLM_TIMEOUT,
+                max_retries=settings.LLM_MAX_RETRIES
+            )
 
         # Extract generation parameters
         generation_params = {
             k: v for k, v in request_data.items()
-            if k in ["max_tokens", "temperature"] and v is not None
+            if k in ["max_tokens", "temperature", "response_format", "json_schema"] and v is not None
         }
 
+        if request_data.get("stream"):
+            return StreamingResponse(
+                _stream_generation(provider, provider_name, prompt, generation_params),
+                media_type="text/event-stream",
+                headers=STREAMING_HEADERS
+            )
+
         generated_text = await provider.generate_with_retry(prompt, **generation_params)
 
         return {
             "text": generated_text,
-            "provider": provider_name,
+            "provider": provider.provider_name,
             "model": provider.model,
             "prompt": prompt,
             "parameters": generation_params
@@ -0,0 +1,17 @@
+"""
+Helpers for streaming API responses.
+"""
+import json
+from typing import Any, Dict
+
+# Headers that stop proxies from buffering a streamed response
+STREAMING_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event frame."""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
@@ -6,10 +6,24 @@ from typing import AsyncGenerator
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from app.shared.config import get_settings
 from app.shared.logging_config import setup_logging, get_logger
 from app.interfaces.api.v1 import api_router
+from app.application.card.jobs import generation_workers
+from app.infrastructure.jobs.store import GenerationJobStore
+from app.infrastructure.llm.bulkhead import llm_bulkheads
+from app.infrastructure.llm.cache import llm_response_cache
+from app.infrastructure.llm.factory import LLMFactory
+from app.infrastructure.llm.hedging import llm_hedger
+from app.infrastructure.llm.http_client import llm_client_pool
+from app.infrastructure.llm.ratelimit import llm_rate_limiters
+from app.infrastructure.llm.router import llm_router
+from app.infrastructure.llm.singleflight import llm_single_flight
+from app.infrastructure.llm.telemetry import llm_telemetry
+from app.infrastructure.llm.timeouts import llm_timeouts
+from app.infrastructure.llm.warmup import llm_warmer
 
 
 # 设置日志
@@ -24,12 +38,109 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     """Application lifespan events."""
     logger.info("应用启动开始")
 
-    # Startup tasks will be added here
+    # 创建LLM提供商共享的长连接HTTP客户端
+    llm_client_pool.configure(
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+        http2=settings.LLM_HTTP2,
+    )
+    llm_client_pool.open(list(settings.llm_base_urls.values()))
+    logger.info("LLM连接池已创建: http2=%s, base_urls=%s", llm_client_pool.http2, llm_client_pool.base_urls)
+
+    # 后台预热DNS和长连接，完成前 GET /ready 返回503
+    llm_warmer.configure(
+        enabled=settings.LLM_WARMUP_ENABLED,
+        connections=settings.LLM_WARMUP_CONNECTIONS,
+        timeout=settings.LLM_WARMUP_TIMEOUT,
+    )
+    llm_warmer.start(llm_client_pool.base_urls)
+
+    # 复用LLM提供商实例（连接池、限流状态、延迟统计）
+    LLMFactory.set_registry_size(settings.LLM_PROVIDER_REGISTRY_SIZE)
+
+    # LLM响应缓存（内存LRU + SQLite持久层）
+    llm_response_cache.configure(
+        enabled=settings.LLM_CACHE_ENABLED,
+        ttl=settings.LLM_CACHE_TTL,
+        max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+        path=settings.LLM_CACHE_PATH,
+        disk_max_entries=settings.LLM_CACHE_DISK_MAX_ENTRIES,
+    )
+    llm_single_flight.enabled = settings.LLM_SINGLE_FLIGHT_ENABLED
+
+    # 按提供商/模型的客户端限流
+    llm_rate_limiters.configure(
+        requests_per_minute=settings.LLM_RATE_LIMIT_RPM,
+        tokens_per_minute=settings.LLM_RATE_LIMIT_TPM,
+        limits=settings.LLM_RATE_LIMITS,
+    )
+
+    # 按提供商/模型的并发隔离舱
+    llm_bulkheads.configure(
+        max_concurrent=settings.LLM_BULKHEAD_MAX_CONCURRENT,
+        max_queue=settings.LLM_BULKHEAD_MAX_QUEUE,
+        queue_timeout=settings.LLM_BULKHEAD_QUEUE_TIMEOUT,
+        limits=settings.LLM_BULKHEADS,
+    )
+
+    # provider="auto" 的健康评分路由与熔断
+    llm_router.configure(
+        targets=settings.llm_router_targets,
+        timeout=settings.LLM_TIMEOUT,
+        max_retries=settings.LLM_MAX_RETRIES,
+        window_seconds=settings.LLM_ROUTER_WINDOW_SECONDS,
+        error_threshold=settings.LLM_ROUTER_ERROR_THRESHOLD,
+        min_requests=settings.LLM_ROUTER_MIN_REQUESTS,
+        max_consecutive_failures=settings.LLM_ROUTER_MAX_CONSECUTIVE_FAILURES,
+        cooldown=settings.LLM_ROUTER_COOLDOWN,
+        latency_target=settings.LLM_ROUTER_LATENCY_TARGET,
+    )
+    llm_hedger.configure(
+        enabled=settings.LLM_HEDGE_ENABLED,
+        percentile=settings.LLM_HEDGE_PERCENTILE,
+        budget_ratio=settings.LLM_HEDGE_BUDGET_RATIO,
+        default_delay=settings.LLM_HEDGE_DEFAULT_DELAY,
+        min_delay=settings.LLM_HEDGE_MIN_DELAY,
+        max_delay=settings.LLM_HEDGE_MAX_DELAY,
+    )
+
+    # LLM调用遥测（GET /metrics），按配置的单价估算费用
+    llm_telemetry.configure(prices=settings.LLM_PRICES)
+
+    # 按观测到的延迟自适应调整各提供商/模型/请求规模的超时
+    llm_timeouts.configure(
+        enabled=settings.LLM_ADAPTIVE_TIMEOUTS,
+        percentile=settings.LLM_TIMEOUT_PERCENTILE,
+        multiplier=settings.LLM_TIMEOUT_MULTIPLIER,
+        min_samples=settings.LLM_TIMEOUT_MIN_SAMPLES,
+        window_size=settings.LLM_TIMEOUT_WINDOW_SIZE,
+        size_buckets=settings.LLM_TIMEOUT_SIZE_BUCKETS,
+        connect_bounds=(settings.LLM_TIMEOUT_CONNECT_MIN, settings.LLM_TIMEOUT_CONNECT_MAX),
+        first_byte_bounds=(settings.LLM_TIMEOUT_FIRST_BYTE_MIN, settings.LLM_TIMEOUT_FIRST_BYTE_MAX),
+        total_bounds=(settings.LLM_TIMEOUT_TOTAL_MIN, settings.LLM_TIMEOUT_TOTAL_MAX),
+    )
+
+    # 异步生成任务队列（SQLite任务表 + 本地工作协程）
+    await generation_workers.start(
+        store=GenerationJobStore(settings.GENERATION_JOB_DB_PATH),
+        workers=settings.GENERATION_JOB_WORKERS,
+    )
+    logger.info("生成任务工作池已启动: workers=%s", settings.GENERATION_JOB_WORKERS)
+
     logger.info("应用启动完成")
 
     yield
 
-    # Shutdown tasks (if needed)
+    # 停止生成任务工作池，执行中的任务在下次启动时重新排队
+    await generation_workers.stop()
+    generation_workers.store.close()
+
+    # 清空提供商实例并关闭LLM连接池
+    await llm_warmer.stop()
+    LLMFactory.invalidate()
+    await llm_client_pool.aclose()
+    llm_response_cache.close()
     logger.info("应用关闭")
 
 
@@ -67,6 +178,19 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check: 503 until LLM connections are warmed up."""
+    body = {"status": "ready" if llm_warmer.ready else "warming", "warmup": llm_warmer.get_stats()}
+    return JSONResponse(body, status_code=200 if llm_warmer.ready else 503)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics of LLM calls."""
+    return PlainTextResponse(llm_telemetry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/")
 async def root():
     """Root endpoint."""
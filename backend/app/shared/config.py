@@ -2,7 +2,7 @@
 Application configuration settings.
 """
 from functools import lru_cache
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -33,6 +33,7 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str
     OPENAI_MODEL: str = "gpt-3.5-turbo"
     OPENAI_MAX_TOKENS: int = 1000
+    OPENAI_BASE_URL: str = "https://api.openai.com/v1"
 
     # DeepSeek Settings
     DEEPSEEK_API_KEY: str = ""
@@ -49,6 +50,77 @@ class Settings(BaseSettings):
     LLM_TIMEOUT: int = 30
     LLM_MAX_RETRIES: int = 3
 
+    # LLM HTTP Connection Pool
+    LLM_HTTP2: bool = True
+    LLM_MAX_CONNECTIONS: int = 20
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    LLM_KEEPALIVE_EXPIRY: float = 30.0
+    LLM_PROVIDER_REGISTRY_SIZE: int = 32
+    # Pre-warm DNS and keep-alive connections to each provider at startup; GET /ready
+    # reports 503 until warm-up completes (capped by LLM_MAX_KEEPALIVE_CONNECTIONS)
+    LLM_WARMUP_ENABLED: bool = False
+    LLM_WARMUP_CONNECTIONS: int = 2
+    LLM_WARMUP_TIMEOUT: float = 10.0
+
+    # LLM Response Cache
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL: int = 86400
+    LLM_CACHE_MAX_ENTRIES: int = 1024
+    LLM_CACHE_PATH: str = "./llm_cache.db"
+    LLM_CACHE_DISK_MAX_ENTRIES: int = 100_000
+
+    # Coalesce identical in-flight LLM calls
+    LLM_SINGLE_FLIGHT_ENABLED: bool = True
+
+    # LLM Client-side Rate Limits (0 = learn from x-ratelimit-* headers only)
+    LLM_RATE_LIMIT_RPM: int = 0
+    LLM_RATE_LIMIT_TPM: int = 0
+    # Per "provider" or "provider:model" overrides, e.g. {"openai": {"rpm": 500, "tpm": 200000}}
+    LLM_RATE_LIMITS: Dict[str, Dict[str, int]] = {}
+
+    # LLM Concurrency Bulkheads (per provider/model)
+    LLM_BULKHEAD_MAX_CONCURRENT: int = 16
+    LLM_BULKHEAD_MAX_QUEUE: int = 64
+    LLM_BULKHEAD_QUEUE_TIMEOUT: float = 10.0
+    # Per "provider" or "provider:model" overrides, e.g. {"openai": {"max_concurrent": 32}}
+    LLM_BULKHEADS: Dict[str, Dict[str, float]] = {}
+
+    # LLM Routing (provider="auto"): "provider" or "provider:model", in preference order
+    LLM_ROUTER_PROVIDERS: List[str] = ["siliconflow", "deepseek", "openai"]
+    LLM_ROUTER_ERROR_THRESHOLD: float = 0.5
+    LLM_ROUTER_MIN_REQUESTS: int = 5
+    LLM_ROUTER_MAX_CONSECUTIVE_FAILURES: int = 3
+    LLM_ROUTER_COOLDOWN: float = 30.0
+    LLM_ROUTER_WINDOW_SECONDS: float = 300.0
+    LLM_ROUTER_LATENCY_TARGET: float = 10.0
+
+    # LLM Hedged Requests (provider="auto" only, opt-in)
+    LLM_HEDGE_ENABLED: bool = False
+    LLM_HEDGE_PERCENTILE: float = 0.95
+    LLM_HEDGE_BUDGET_RATIO: float = 0.1
+    LLM_HEDGE_DEFAULT_DELAY: float = 2.0
+    LLM_HEDGE_MIN_DELAY: float = 0.2
+    LLM_HEDGE_MAX_DELAY: float = 10.0
+
+    # LLM Telemetry (GET /metrics): USD per million tokens, by "provider" or "provider:model",
+    # e.g. {"deepseek": {"prompt": 0.27, "completion": 1.1, "cached": 0.07}}
+    LLM_PRICES: Dict[str, Dict[str, float]] = {}
+
+    # LLM Adaptive Timeouts: percentile x multiplier of observed latency per
+    # provider, model and request size bucket (estimated tokens), clamped to bounds
+    LLM_ADAPTIVE_TIMEOUTS: bool = True
+    LLM_TIMEOUT_PERCENTILE: float = 0.99
+    LLM_TIMEOUT_MULTIPLIER: float = 1.5
+    LLM_TIMEOUT_MIN_SAMPLES: int = 20
+    LLM_TIMEOUT_WINDOW_SIZE: int = 200
+    LLM_TIMEOUT_SIZE_BUCKETS: List[int] = [1000, 4000, 16000]
+    LLM_TIMEOUT_CONNECT_MIN: float = 1.0
+    LLM_TIMEOUT_CONNECT_MAX: float = 10.0
+    LLM_TIMEOUT_FIRST_BYTE_MIN: float = 2.0
+    LLM_TIMEOUT_FIRST_BYTE_MAX: float = 60.0
+    LLM_TIMEOUT_TOTAL_MIN: float = 5.0
+    LLM_TIMEOUT_TOTAL_MAX: float = 300.0
+
     # Security
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     ALGORITHM: str = "HS256"
@@ -70,6 +142,23 @@ class Settings(BaseSettings):
     MAX_CONTENT_LENGTH: int = 100_000
     DEFAULT_CARD_DIFFICULTY: int = 1
     MAX_CARDS_PER_GENERATION: int = 20
+    # Long texts are split into chunks of this many tokens and generated in parallel
+    CARD_GENERATION_CHUNK_TOKENS: int = 3000
+    CARD_GENERATION_CONCURRENCY: int = 4
+    # Texts generated in parallel by POST /cards/generate/batch
+    CARD_BATCH_CONCURRENCY: int = 4
+    # Asynchronous generation jobs (SQLite job table + local workers)
+    GENERATION_JOB_DB_PATH: str = "./generation_jobs.db"
+    GENERATION_JOB_WORKERS: int = 2
+    # Inputs estimated above this many tokens are rejected before any LLM call
+    CARD_GENERATION_MAX_INPUT_TOKENS: int = 100_000
+
+    # Ask providers for JSON / JSON-schema output (response_format) when supported
+    LLM_STRUCTURED_OUTPUT: bool = True
+
+    # LLM token budgets (estimated locally, see app/infrastructure/llm/tokens.py)
+    LLM_CONTEXT_WINDOW: int = 32768
+    LLM_MAX_OUTPUT_TOKENS: int = 4096
 
     @property
     def is_development(self) -> bool:
@@ -81,6 +170,43 @@ class Settings(BaseSettings):
         """Check if running in production mode."""
         return not self.DEBUG
 
+    @property
+    def llm_api_keys(self) -> dict[str, str]:
+        """API keys of the LLM providers that have one configured."""
+        keys = {
+            "openai": self.OPENAI_API_KEY,
+            "deepseek": self.DEEPSEEK_API_KEY,
+            "siliconflow": self.SILICONFLOW_API_KEY,
+        }
+        return {name: key for name, key in keys.items() if key}
+
+    @property
+    def llm_provider_base_urls(self) -> dict[str, str]:
+        """Configured base URLs of every LLM provider, with or without an API key."""
+        return {
+            "openai": self.OPENAI_BASE_URL,
+            "deepseek": self.DEEPSEEK_BASE_URL,
+            "siliconflow": self.SILICONFLOW_BASE_URL,
+        }
+
+    @property
+    def llm_base_urls(self) -> dict[str, str]:
+        """Base URLs of the LLM providers that have an API key configured."""
+        urls = self.llm_provider_base_urls
+        return {name: url for name, url in urls.items() if name in self.llm_api_keys}
+
+    @property
+    def llm_router_targets(self) -> List[Tuple[str, str, Optional[str], str]]:
+        """Routing targets as (provider, api_key, model, base_url) for configured providers."""
+        targets = []
+        base_urls = self.llm_base_urls
+        for entry in self.LLM_ROUTER_PROVIDERS:
+            name, _, model = entry.partition(":")
+            api_key = self.llm_api_keys.get(name)
+            if api_key:
+                targets.append((name, api_key, model or None, base_urls[name]))
+        return targets
+
     @property
     def database_url_sync(self) -> str:
         """Get synchronous database URL."""
@@ -0,0 +1,421 @@
+"""
+Offline stand-in for an OpenAI-compatible LLM API.
+
+Providers can target it through ``base_url`` so concurrency, pooling and
+timeout behaviour can be exercised without calling a vendor. Responses are
+replayed from a JSON-lines recording (optionally recorded from a real
+upstream first), streamed as SSE when asked, and shaped by a latency
+profile plus injected 429s, 5xx errors and truncation.
+
+Run it with::
+
+    python -m scripts.llm_standin --port 8900 --profile typical
+
+and point a provider at it, e.g. ``OPENAI_BASE_URL=http://127.0.0.1:8900/v1``.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.infrastructure.llm.tokens import estimate_messages_tokens, estimate_tokens
+
+# Request fields that identify a recorded completion
+_KEY_FIELDS = ("model", "messages", "response_format")
+
+
+@dataclass(frozen=True)
+class LatencyProfile:
+    """Simulated latency: a log-normal time-to-first-token plus a per-token delay.
+
+    ``ttft_sigma`` of 0 makes the first-token delay fixed; larger values give
+    a heavier tail.
+    """
+    ttft_median: float = 0.0
+    ttft_sigma: float = 0.0
+    per_token: float = 0.0
+
+    def sample_ttft(self, rng: random.Random) -> float:
+        if self.ttft_median <= 0:
+            return 0.0
+        if self.ttft_sigma <= 0:
+            return self.ttft_median
+        return rng.lognormvariate(math.log(self.ttft_median), self.ttft_sigma)
+
+
+LATENCY_PROFILES: Dict[str, LatencyProfile] = {
+    "none": LatencyProfile(),
+    "fast": LatencyProfile(ttft_median=0.15, ttft_sigma=0.3, per_token=0.005),
+    "typical": LatencyProfile(ttft_median=0.8, ttft_sigma=0.5, per_token=0.02),
+    "slow": LatencyProfile(ttft_median=3.0, ttft_sigma=0.6, per_token=0.05),
+    "tail": LatencyProfile(ttft_median=0.8, ttft_sigma=1.2, per_token=0.02),
+}
+
+
+@dataclass(frozen=True)
+class FaultProfile:
+    """Probabilities of injected failures, each rolled once per request."""
+    rate_limit_rate: float = 0.0
+    retry_after: float = 1.0
+    server_error_rate: float = 0.0
+    truncate_rate: float = 0.0
+
+
+def request_key(payload: Dict[str, Any]) -> str:
+    """Hash the fields of a request that determine its completion."""
+    request = {field: payload.get(field) for field in _KEY_FIELDS}
+    raw = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class StandInServer:
+    """Serve chat completions from recordings with simulated latency and faults.
+
+    ``mode`` is ``"replay"`` (recordings only) or ``"record"`` (forward
+    misses to ``upstream_url`` and append them to ``recordings_path``).
+    Unrecorded requests get ``fallback`` as content, or a 404 without one.
+    """
+
+    def __init__(
+        self,
+        recordings_path: Optional[str] = None,
+        mode: str = "replay",
+        latency: LatencyProfile = LatencyProfile(),
+        faults: FaultProfile = FaultProfile(),
+        fallback: Optional[str] = None,
+        upstream_url: Optional[str] = None,
+        upstream_api_key: str = "",
+        stream_chunk_chars: int = 8,
+        seed: Optional[int] = None,
+    ):
+        if mode not in ("replay", "record"):
+            raise ValueError(f"Unknown stand-in mode: {mode}")
+        if mode == "record" and not (upstream_url and recordings_path):
+            raise ValueError("Record mode needs an upstream URL and a recordings path")
+
+        self.recordings_path = recordings_path
+        self.mode = mode
+        self.latency = latency
+        self.faults = faults
+        self.fallback = fallback
+        self.upstream_url = upstream_url.rstrip("/") if upstream_url else None
+        self.upstream_api_key = upstream_api_key
+        self.stream_chunk_chars = max(1, stream_chunk_chars)
+        self.rng = random.Random(seed)
+        self.recordings: Dict[str, Dict[str, Any]] = {}
+        self._upstream: Optional[httpx.AsyncClient] = None
+        self._write_lock = asyncio.Lock()
+        self.in_flight = 0
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "streamed": 0,
+            "replayed": 0,
+            "recorded": 0,
+            "fallback": 0,
+            "misses": 0,
+            "rate_limited": 0,
+            "server_errors": 0,
+            "truncated": 0,
+            "max_in_flight": 0,
+        }
+        self.load()
+
+    def load(self) -> None:
+        """Load recordings from ``recordings_path`` if it exists."""
+        if not self.recordings_path or not os.path.exists(self.recordings_path):
+            return
+        with open(self.recordings_path, encoding="utf-8") as file:
+            for line in file:
+                line = line.strip()
+                if line:
+                    entry = json.loads(line)
+                    self.recordings[entry["key"]] = entry["response"]
+
+    async def aclose(self) -> None:
+        if self._upstream is not None:
+            await self._upstream.aclose()
+            self._upstream = None
+
+    async def handle(self, payload: Dict[str, Any]):
+        """Answer one ``/chat/completions`` request."""
+        self.stats["requests"] += 1
+        self._enter()
+        try:
+            fault = self._roll_fault()
+            if fault is not None:
+                return fault
+
+            completion = await self._resolve(payload)
+            if completion is None:
+                self.stats["misses"] += 1
+                return self._error(404, "not_found", "No recorded response for this request")
+
+            completion = self._shape(payload, completion)
+            ttft = self.latency.sample_ttft(self.rng)
+            if not payload.get("stream"):
+                await asyncio.sleep(ttft + self.latency.per_token * completion["usage"]["completion_tokens"])
+                return JSONResponse(self._completion_body(payload, completion))
+
+            self.stats["streamed"] += 1
+            include_usage = bool((payload.get("stream_options") or {}).get("include_usage"))
+            return StreamingResponse(
+                self._stream(payload, completion, ttft, include_usage),
+                media_type="text/event-stream",
+            )
+        finally:
+            self.in_flight -= 1
+
+    def _enter(self) -> None:
+        self.in_flight += 1
+        self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.in_flight)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "recordings": len(self.recordings), "in_flight": self.in_flight, **self.stats}
+
+    def _roll_fault(self) -> Optional[JSONResponse]:
+        roll = self.rng.random()
+        if roll < self.faults.rate_limit_rate:
+            self.stats["rate_limited"] += 1
+            return self._error(
+                429, "rate_limit_exceeded", "Rate limit reached (stand-in)",
+                headers={"retry-after": str(self.faults.retry_after)},
+            )
+        if roll < self.faults.rate_limit_rate + self.faults.server_error_rate:
+            self.stats["server_errors"] += 1
+            status = self.rng.choice((500, 502, 503))
+            return self._error(status, "server_error", "Upstream failure (stand-in)")
+        return None
+
+    async def _resolve(self, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Find the completion for a request: recording, upstream or fallback."""
+        key = request_key(payload)
+        recorded = self.recordings.get(key)
+        if recorded is not None:
+            self.stats["replayed"] += 1
+            return recorded
+
+        if self.mode == "record":
+            completion = await self._fetch_upstream(payload)
+            await self._save(key, completion)
+            self.stats["recorded"] += 1
+            return completion
+
+        if self.fallback is not None:
+            self.stats["fallback"] += 1
+            return {"content": self.fallback, "finish_reason": "stop"}
+        return None
+
+    async def _fetch_upstream(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if self._upstream is None:
+            self._upstream = httpx.AsyncClient(timeout=120)
+        body = {k: v for k, v in payload.items() if k not in ("stream", "stream_options")}
+        response = await self._upstream.post(
+            f"{self.upstream_url}/chat/completions",
+            headers={"Authorization": f"Bearer {self.upstream_api_key}"},
+            json=body,
+        )
+        response.raise_for_status()
+        data = response.json()
+        choice = data["choices"][0]
+        return {
+            "content": choice["message"]["content"],
+            "finish_reason": choice.get("finish_reason") or "stop",
+            "usage": data.get("usage"),
+        }
+
+    async def _save(self, key: str, completion: Dict[str, Any]) -> None:
+        self.recordings[key] = completion
+        line = json.dumps({"key": key, "response": completion}, ensure_ascii=False) + "\n"
+        async with self._write_lock:
+            await asyncio.to_thread(self._append, line)
+
+    def _append(self, line: str) -> None:
+        with open(self.recordings_path, "a", encoding="utf-8") as file:
+            file.write(line)
+
+    def _shape(self, payload: Dict[str, Any], completion: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply ``max_tokens`` and injected truncation, and fill in usage."""
+        content = completion["content"]
+        finish_reason = completion.get("finish_reason") or "stop"
+        completion_tokens = estimate_tokens(content)
+
+        max_tokens = payload.get("max_tokens")
+        if max_tokens and completion_tokens > max_tokens:
+            content = content[:int(len(content) * max_tokens / completion_tokens)]
+            finish_reason = "length"
+
+        if self.faults.truncate_rate and self.rng.random() < self.faults.truncate_rate:
+            self.stats["truncated"] += 1
+            content = content[:int(len(content) * self.rng.uniform(0.3, 0.9))]
+            finish_reason = "length"
+
+        usage = completion.get("usage")
+        if finish_reason == "length" or not usage:
+            prompt_tokens = estimate_messages_tokens(payload.get("messages", []))
+            completion_tokens = estimate_tokens(content)
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            }
+        return {"content": content, "finish_reason": finish_reason, "usage": usage}
+
+    @staticmethod
+    def _completion_body(payload: Dict[str, Any], completion: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": completion["content"]},
+                "finish_reason": completion["finish_reason"],
+            }],
+            "usage": completion["usage"],
+        }
+
+    async def _stream(
+        self,
+        payload: Dict[str, Any],
+        completion: Dict[str, Any],
+        ttft: float,
+        include_usage: bool,
+    ) -> AsyncIterator[str]:
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        def event(choices: list, **extra: Any) -> str:
+            body = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": payload.get("model"),
+                "choices": choices,
+                **extra,
+            }
+            return f"data: {json.dumps(body, ensure_ascii=False)}\n\n"
+
+        # A stream is in flight again while its body is sent; a body that is
+        # never iterated never enters, so the counter cannot leak
+        self._enter()
+        try:
+            await asyncio.sleep(ttft)
+            yield event([{"index": 0, "delta": {"role": "assistant"}, "finish_reason": None}])
+
+            content = completion["content"]
+            for start in range(0, len(content), self.stream_chunk_chars):
+                piece = content[start:start + self.stream_chunk_chars]
+                if start:
+                    await asyncio.sleep(self.latency.per_token * estimate_tokens(piece))
+                yield event([{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+
+            yield event([{"index": 0, "delta": {}, "finish_reason": completion["finish_reason"]}])
+            if include_usage:
+                yield event([], usage=completion["usage"])
+            yield "data: [DONE]\n\n"
+        finally:
+            self.in_flight -= 1
+
+    @staticmethod
+    def _error(status: int, code: str, message: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+        return JSONResponse(
+            {"error": {"message": message, "type": code, "code": code}},
+            status_code=status,
+            headers=headers,
+        )
+
+
+def create_standin_app(server: StandInServer) -> FastAPI:
+    """Build the ASGI app serving ``server`` under ``/v1`` (and the bare paths)."""
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        yield
+        await server.aclose()
+
+    app = FastAPI(title="LLM stand-in", lifespan=lifespan)
+
+    async def chat_completions(request: Request):
+        return await server.handle(await request.json())
+
+    async def models():
+        return {"object": "list", "data": [{"id": "stand-in", "object": "model", "owned_by": "stand-in"}]}
+
+    async def stats():
+        return server.get_stats()
+
+    for prefix in ("/v1", ""):
+        app.add_api_route(f"{prefix}/chat/completions", chat_completions, methods=["POST"])
+        app.add_api_route(f"{prefix}/models", models, methods=["GET"])
+    app.add_api_route("/stats", stats, methods=["GET"])
+
+    app.state.standin = server
+    return app
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Offline OpenAI-compatible LLM stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--mode", choices=("replay", "record"), default="replay")
+    parser.add_argument("--recordings", help="JSON-lines file of recorded completions")
+    parser.add_argument("--upstream-url", help="Real API base URL used in record mode")
+    parser.add_argument("--upstream-api-key", default=os.getenv("STANDIN_UPSTREAM_API_KEY", ""))
+    parser.add_argument("--fallback-file", help="Content returned for unrecorded requests")
+    parser.add_argument("--profile", choices=sorted(LATENCY_PROFILES), default="none")
+    parser.add_argument("--ttft", type=float, help="Override the profile's median time-to-first-token")
+    parser.add_argument("--per-token", type=float, help="Override the profile's per-token delay")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--server-error-rate", type=float, default=0.0)
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    latency = LATENCY_PROFILES[args.profile]
+    latency = LatencyProfile(
+        ttft_median=args.ttft if args.ttft is not None else latency.ttft_median,
+        ttft_sigma=latency.ttft_sigma,
+        per_token=args.per_token if args.per_token is not None else latency.per_token,
+    )
+    fallback = None
+    if args.fallback_file:
+        with open(args.fallback_file, encoding="utf-8") as file:
+            fallback = file.read()
+
+    server = StandInServer(
+        recordings_path=args.recordings,
+        mode=args.mode,
+        latency=latency,
+        faults=FaultProfile(
+            rate_limit_rate=args.rate_limit_rate,
+            retry_after=args.retry_after,
+            server_error_rate=args.server_error_rate,
+            truncate_rate=args.truncate_rate,
+        ),
+        fallback=fallback,
+        upstream_url=args.upstream_url,
+        upstream_api_key=args.upstream_api_key,
+        seed=args.seed,
+    )
+
+    import uvicorn
+
+    uvicorn.run(create_standin_app(server), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
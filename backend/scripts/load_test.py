@@ -0,0 +1,353 @@
+"""
+End-to-end load test of the card API.
+
+Ramps concurrent virtual users through the generate, list, search and CRUD
+endpoints and writes a JSON report with throughput, error rates and
+p50/p95/p99 latencies per operation and per generation stage (prompt
+build, LLM wait, parse, persist — read from the ``Server-Timing`` header;
+each stage is its wall-clock span, so overlapping chunks are not summed).
+
+By default the app runs in-process against a temporary SQLite database,
+with LLM calls answered by the offline stand-in server, so no vendor is
+called::
+
+    cd backend
+    python -m scripts.load_test --users 1,5,10,20 --step-seconds 20 --profile typical
+
+With ``--target`` it drives an already running instance instead (point
+that instance's ``*_BASE_URL`` at a stand-in started separately).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import AsyncExitStack
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from app.infrastructure.llm.factory import LLMFactory
+from app.infrastructure.llm.stats import percentile
+
+# Operation mix when --mix is not given (relative weights)
+DEFAULT_MIX = {"generate": 2, "list": 3, "search": 2, "crud": 3}
+
+# Stages reported by the generation endpoints
+STAGES = ("prompt", "llm", "parse", "persist")
+
+SAMPLE_TEXT = (
+    "光合作用是绿色植物利用光能，把二氧化碳和水转化为储存能量的有机物，并释放氧气的过程。"
+    "它分为光反应和暗反应两个阶段：光反应在类囊体膜上进行，产生ATP和NADPH；"
+    "暗反应在叶绿体基质中进行，利用ATP和NADPH固定二氧化碳，生成糖类。"
+)
+
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """Parse ``name;dur=12.3, ...`` into seconds per name."""
+    timings: Dict[str, float] = {}
+    for metric in (header or "").split(","):
+        name, _, params = metric.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur" and name:
+                try:
+                    timings[name] = float(value) / 1000.0
+                except ValueError:
+                    pass
+    return timings
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    """Count, mean and p50/p95/p99/max of latencies, in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 2),
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 2),
+        "max_ms": round(max(samples) * 1000, 2),
+    }
+
+
+def fallback_cards(count: int) -> str:
+    """A card generation response the stand-in returns for every prompt."""
+    cards = [
+        {
+            "title": f"光合作用 {index + 1}",
+            "content": {"front": f"关于光合作用的问题 {index + 1}？", "back": "光反应产生ATP和NADPH，暗反应固定二氧化碳。"},
+            "tags": ["生物", "光合作用"],
+        }
+        for index in range(count)
+    ]
+    return json.dumps({"cards": cards}, ensure_ascii=False)
+
+
+class StepRecorder:
+    """Latencies, errors and stage timings collected during one ramp step."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.error_samples: Dict[str, str] = {}
+        self.stages: Dict[str, List[float]] = defaultdict(list)
+
+    async def call(
+        self,
+        operation: str,
+        send: Callable[[], Awaitable[httpx.Response]],
+        expected: int = 200,
+    ) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await send()
+        except httpx.HTTPError as e:
+            self.latencies[operation].append(time.perf_counter() - started)
+            self._error(operation, f"{type(e).__name__}: {e}")
+            return None
+
+        self.latencies[operation].append(time.perf_counter() - started)
+        if response.status_code != expected:
+            self._error(operation, f"HTTP {response.status_code}: {response.text[:200]}")
+            return None
+        return response
+
+    def _error(self, operation: str, message: str) -> None:
+        self.errors[operation] += 1
+        self.error_samples.setdefault(operation, message)
+
+    def report(self, users: int, elapsed: float) -> Dict[str, Any]:
+        requests = sum(len(samples) for samples in self.latencies.values())
+        errors = sum(self.errors.values())
+        return {
+            "users": users,
+            "duration_seconds": round(elapsed, 3),
+            "requests": requests,
+            "errors": errors,
+            "error_rate": round(errors / requests, 4) if requests else 0.0,
+            "throughput_rps": round(requests / elapsed, 2) if elapsed else 0.0,
+            "operations": {
+                operation: {
+                    **summarize(samples),
+                    "errors": self.errors.get(operation, 0),
+                    "error_rate": round(self.errors.get(operation, 0) / len(samples), 4),
+                }
+                for operation, samples in sorted(self.latencies.items())
+            },
+            "stages": {stage: summarize(self.stages.get(stage, [])) for stage in STAGES},
+            "error_samples": dict(self.error_samples),
+        }
+
+
+class LoadTest:
+    """Drive virtual users against the card API."""
+
+    def __init__(self, client: httpx.AsyncClient, mix: Dict[str, float], provider: str, max_cards: int, seed: int):
+        self.client = client
+        self.mix = mix
+        self.provider = provider
+        self.max_cards = max_cards
+        self.seed = seed
+
+    async def run_step(self, users: int, duration: float) -> Dict[str, Any]:
+        recorder = StepRecorder()
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            self._user(f"load-user-{index}", random.Random(self.seed * 1000 + index), recorder, deadline)
+            for index in range(users)
+        ))
+        return recorder.report(users, time.perf_counter() - started)
+
+    async def _user(self, user_id: str, rng: random.Random, recorder: StepRecorder, deadline: float) -> None:
+        operations = list(self.mix)
+        weights = [self.mix[name] for name in operations]
+        while time.perf_counter() < deadline:
+            operation = rng.choices(operations, weights)[0]
+            await getattr(self, f"_{operation}")(user_id, rng, recorder)
+
+    async def _generate(self, user_id: str, rng: random.Random, recorder: StepRecorder) -> None:
+        response = await recorder.call("generate", lambda: self.client.post(
+            "/api/v1/cards/generate",
+            params={"user_id": user_id},
+            # A distinct text per request so the LLM response cache does not answer it
+            json={"text": f"{SAMPLE_TEXT}（样本 {rng.getrandbits(64):x}）", "provider": self.provider, "max_cards": self.max_cards, "auto_save": True},
+        ))
+        if response is not None:
+            for stage, seconds in parse_server_timing(response.headers.get("server-timing")).items():
+                recorder.stages[stage].append(seconds)
+
+    async def _list(self, user_id: str, rng: random.Random, recorder: StepRecorder) -> None:
+        await recorder.call("list", lambda: self.client.get(
+            "/api/v1/cards", params={"user_id": user_id, "limit": 50}
+        ))
+
+    async def _search(self, user_id: str, rng: random.Random, recorder: StepRecorder) -> None:
+        await recorder.call("search", lambda: self.client.get(
+            "/api/v1/cards/search", params={"user_id": user_id, "q": rng.choice(["光合作用", "ATP", "问题"])}
+        ))
+
+    async def _crud(self, user_id: str, rng: random.Random, recorder: StepRecorder) -> None:
+        created = await recorder.call("create", lambda: self.client.post(
+            "/api/v1/cards",
+            params={"user_id": user_id},
+            json={
+                "title": "压测卡片",
+                "card_type": "basic",
+                "content": {"front": "问题？", "back": "答案"},
+                "tags": ["load-test"],
+            },
+        ))
+        if created is None:
+            return
+
+        card_id = created.json()["id"]
+        path = f"/api/v1/cards/{card_id}"
+        await recorder.call("read", lambda: self.client.get(path, params={"user_id": user_id}))
+        await recorder.call("update", lambda: self.client.put(
+            path, params={"user_id": user_id}, json={"title": "压测卡片（已更新）"}
+        ))
+        await recorder.call("delete", lambda: self.client.delete(path, params={"user_id": user_id}))
+
+
+def parse_mix(value: Optional[str]) -> Dict[str, float]:
+    if not value:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown operation in mix: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run every ramp step and return the report."""
+    async with AsyncExitStack() as stack:
+        standin = None
+        if args.target:
+            client = httpx.AsyncClient(base_url=args.target, timeout=args.timeout)
+        else:
+            client, standin = await _start_in_process(args, stack)
+        await stack.enter_async_context(client)
+
+        load_test = LoadTest(client, args.mix, args.provider, args.max_cards, args.seed)
+        steps = []
+        for users in args.users:
+            step = await load_test.run_step(users, args.step_seconds)
+            steps.append(step)
+            print(
+                f"users={users:<4} rps={step['throughput_rps']:<8} errors={step['error_rate']:.2%} "
+                f"generate_p95={step['operations'].get('generate', {}).get('p95_ms', '-')}ms",
+                file=sys.stderr,
+            )
+
+        return {
+            "config": {
+                "target": args.target or "in-process",
+                "users": args.users,
+                "step_seconds": args.step_seconds,
+                "mix": args.mix,
+                "provider": args.provider,
+                "max_cards": args.max_cards,
+                "profile": None if args.target else args.profile,
+                "seed": args.seed,
+            },
+            "steps": steps,
+            "standin": standin.get_stats() if standin else None,
+        }
+
+
+async def _start_in_process(args: argparse.Namespace, stack: AsyncExitStack):
+    """Start the app in-process with LLM calls served by the stand-in."""
+    workdir = tempfile.mkdtemp(prefix="deepcard-load-")
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{workdir}/load.db"
+    os.environ["GENERATION_JOB_DB_PATH"] = os.path.join(workdir, "generation_jobs.db")
+    # A warm response cache would answer repeated prompts without the stand-in
+    os.environ["LLM_CACHE_ENABLED"] = "false"
+    os.environ["LLM_CACHE_PATH"] = os.path.join(workdir, "llm_cache.db")
+    os.environ.setdefault("SECRET_KEY", "load-test")
+    os.environ.setdefault("OPENAI_API_KEY", "load-test")
+
+    from app.infrastructure.llm.http_client import llm_client_pool
+    from scripts.llm_standin import FaultProfile, LATENCY_PROFILES, StandInServer, create_standin_app
+    from app.main import app
+    from app.shared.config import get_settings
+    from app.shared.database_init import create_tables
+
+    settings = get_settings()
+    api_key_field = f"{args.provider.upper()}_API_KEY"
+    if not getattr(settings, api_key_field):
+        setattr(settings, api_key_field, "load-test")
+    create_tables()
+
+    await stack.enter_async_context(app.router.lifespan_context(app))
+
+    standin = StandInServer(
+        latency=LATENCY_PROFILES[args.profile],
+        faults=FaultProfile(
+            rate_limit_rate=args.rate_limit_rate,
+            server_error_rate=args.server_error_rate,
+            truncate_rate=args.truncate_rate,
+        ),
+        fallback=fallback_cards(args.max_cards),
+        seed=args.seed,
+    )
+    # The provider's pooled client talks to the stand-in instead of the vendor
+    base_url = settings.llm_base_urls[args.provider]
+    await llm_client_pool.install_transport(
+        base_url, httpx.ASGITransport(app=create_standin_app(standin), raise_app_exceptions=False)
+    )
+
+    # Unhandled app errors are reported as 500s rather than raised into the driver
+    client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app, raise_app_exceptions=False),
+        base_url="http://load-test",
+        timeout=args.timeout,
+    )
+    return client, standin
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Load test the card generation API")
+    parser.add_argument("--target", help="Base URL of a running instance; omit to run in-process")
+    parser.add_argument(
+        "--users", type=lambda value: [int(v) for v in value.split(",")], default=[1, 5, 10, 20],
+        help="Comma-separated concurrent users per ramp step",
+    )
+    parser.add_argument("--step-seconds", type=float, default=20.0)
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX), help="e.g. generate=2,list=3,search=2,crud=3")
+    parser.add_argument("--provider", default="siliconflow", choices=LLMFactory.get_supported_providers())
+    parser.add_argument("--max-cards", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    in_process = parser.add_argument_group("in-process stand-in")
+    in_process.add_argument("--database-url", help="Defaults to a temporary SQLite database")
+    in_process.add_argument("--profile", default="typical", help="Stand-in latency profile")
+    in_process.add_argument("--rate-limit-rate", type=float, default=0.0)
+    in_process.add_argument("--server-error-rate", type=float, default=0.0)
+    in_process.add_argument("--truncate-rate", type=float, default=0.0)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    report = json.dumps(asyncio.run(run(args)), ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,17 @@ from fastapi.testclient import TestClient
 from typing import Generator
 
 from app.main import app
+from app.infrastructure.llm.bulkhead import llm_bulkheads
+from app.infrastructure.llm.cache import llm_response_cache
+from app.infrastructure.llm.factory import LLMFactory
+from app.infrastructure.llm.hedging import llm_hedger
+from app.infrastructure.llm.http_client import llm_client_pool
+from app.infrastructure.llm.ratelimit import llm_rate_limiters
+from app.infrastructure.llm.router import llm_router
+from app.infrastructure.llm.telemetry import llm_telemetry
+from app.infrastructure.llm.timeouts import llm_timeouts
+from app.infrastructure.llm.usage import llm_usage
+from app.infrastructure.llm.warmup import llm_warmer
 from app.shared.config import get_settings
 from app.shared.testing_config import get_testing_config
 
@@ -27,6 +38,31 @@ def event_loop():
 pytest_plugins = ('pytest_asyncio',)
 
 
+@pytest.fixture(autouse=True)
+async def reset_llm_state():
+    """每个测试结束后重置LLM基础设施的进程级单例
+
+    关闭连接池中的客户端（包括 install_transport 安装的替身），并恢复缓存、
+    限流、舱壁、路由、对冲、用量、遥测、超时和预热的默认配置。
+    """
+    yield
+    await llm_client_pool.aclose()
+    llm_client_pool.configure()
+    llm_response_cache.clear()
+    llm_response_cache.configure()
+    llm_rate_limiters.configure()
+    llm_bulkheads.configure()
+    llm_router.configure()
+    llm_hedger.configure()
+    llm_usage.reset()
+    llm_telemetry.reset()
+    llm_telemetry.configure()
+    llm_timeouts.configure()
+    llm_warmer.configure()
+    LLMFactory.invalidate()
+    LLMFactory.set_registry_size(32)
+
+
 @pytest.fixture
 def client():
     """Create a test client."""
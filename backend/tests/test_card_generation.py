@@ -0,0 +1,629 @@
+"""
+卡片生成测试
+"""
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.application.card.chunking import split_text
+from app.application.card.generator import CardGenerator
+from app.application.card.jobs import GenerationWorkerPool
+from app.application.card.parser import IncrementalCardParser, salvage_cards
+from app.application.card.prompts import PROMPT_TEMPLATES
+from app.domain.card.entity import Card
+from app.domain.card.value_objects import CardContent, CardType, ClozeContent, ConceptContent
+from app.infrastructure.database.models import Card as CardModel
+from app.infrastructure.jobs.store import GenerationJobStore
+from app.infrastructure.repositories.card_repository import SQLAlchemyCardRepository
+from app.shared.database import Base
+from app.infrastructure.llm import LLMStreamChunk
+from app.infrastructure.llm.tokens import estimate_tokens
+
+
+SAMPLE_RESPONSE = """好的，以下是生成的卡片：
+```json
+{
+    "cards": [
+        {"title": "卡片1", "content": {"front": "问题{1}", "back": "答案\\"1\\""}, "tags": ["a"]},
+        {"title": "卡片2", "content": {"front": "问题2", "back": "答案2"}, "tags": ["b", "c"]}
+    ]
+}
+```
+"""
+
+
+class FakeStreamingProvider:
+    """按固定大小分片输出响应的假LLM提供商"""
+
+    def __init__(self, response: str, chunk_size: int = 7):
+        self.response = response
+        self.chunk_size = chunk_size
+        self.model = "fake-model"
+        self.sent = 0
+        self.closed = False
+
+    async def generate_stream(self, prompt: str, **kwargs):
+        try:
+            for i in range(0, len(self.response), self.chunk_size):
+                self.sent = i + self.chunk_size
+                yield LLMStreamChunk(content=self.response[i:i + self.chunk_size])
+            yield LLMStreamChunk(done=True, finish_reason="stop")
+        finally:
+            self.closed = True
+
+
+class FakeChunkProvider:
+    """按提示词中的文本块返回卡片的假LLM提供商"""
+
+    def __init__(self):
+        self.prompts = []
+
+    async def generate_text(self, prompt: str, **kwargs) -> str:
+        self.prompts.append(prompt)
+        self.max_tokens = kwargs.get("max_tokens")
+        self.kwargs = kwargs
+        if "坏块" in prompt:
+            raise ValueError("LLM 调用失败")
+        index = len(self.prompts)
+        cards = [
+            {"title": "公共", "content": {"front": "共同的问题？", "back": "答案"}},
+            {"title": f"块{index}", "content": {"front": f"问题{index}", "back": "答案"}},
+        ]
+        return json.dumps({"cards": cards}, ensure_ascii=False)
+
+
+class TestChunking:
+    """测试长文本分块"""
+
+    def test_short_text_is_one_chunk(self):
+        """测试未超出预算的文本不切分"""
+        assert split_text("  短文本。  ", max_tokens=100) == ["短文本。"]
+        assert split_text("", max_tokens=100) == []
+
+    def test_splits_on_paragraphs_and_sentences(self):
+        """测试优先按段落切分，超长段落按句子切分"""
+        text = "第一段内容。\n\n" + "这是一个句子。" * 30 + "\n\nThe value is 3.14 exactly. Done."
+        chunks = split_text(text, max_tokens=40)
+
+        assert all(estimate_tokens(chunk) <= 40 for chunk in chunks)
+        assert chunks[0].startswith("第一段内容。")
+        assert all(chunk.endswith(("。", ".")) for chunk in chunks)
+        assert "3.14" in chunks[-1]
+
+    def test_hard_splits_text_without_boundaries(self):
+        """测试没有标点的超长文本按字符切分"""
+        chunks = split_text("长" * 250, max_tokens=100)
+
+        assert [len(chunk) for chunk in chunks] == [100, 100, 50]
+
+
+class TestPromptTemplates:
+    """测试前缀缓存友好的提示词模板"""
+
+    def test_static_prefix_and_user_text_last(self):
+        """测试不同文本和数量共享相同前缀，用户文本位于末尾"""
+        generator = CardGenerator()
+
+        for card_type, template in PROMPT_TEMPLATES.items():
+            first = generator._build_generation_prompt("第一段文本", card_type, 3)
+            second = generator._build_generation_prompt("另一段{文本}", card_type, 10)
+
+            assert first.startswith(template.prefix)
+            assert second.startswith(template.prefix)
+            assert second.rstrip().endswith("另一段{文本}")
+            assert template.prefix_tokens > 0
+
+
+MIXED_RESPONSE = json.dumps({"cards": [
+    {"title": "基础", "card_type": "basic", "content": {"front": "问题", "back": "答案"}},
+    {"title": "填空", "card_type": "cloze", "content": {
+        "front": "填空题", "back": "答案", "cloze_text": "{空格}是答案", "cloze_answer": "答案"}},
+    {"title": "概念", "card_type": "concept", "content": {
+        "front": "概念", "back": "概念", "concept": "熵", "definition": "无序程度", "examples": ["气体"]}},
+    {"title": "未请求", "card_type": "qna", "content": {
+        "front": "问答对", "back": "问答对", "question": "问题", "answer": "答案"}},
+]}, ensure_ascii=False)
+
+
+class FakeTextProvider:
+    """返回固定响应并记录调用的假LLM提供商"""
+
+    def __init__(self, response: str):
+        self.response = response
+        self.prompts = []
+
+    async def generate_text(self, prompt: str, **kwargs) -> str:
+        self.prompts.append(prompt)
+        return self.response
+
+
+class TestMixedGeneration:
+    """测试一次调用混合生成多种卡片类型"""
+
+    async def test_cards_are_routed_to_their_content_class(self):
+        """测试按 card_type 选择内容类，未请求的类型被跳过"""
+        generator = CardGenerator()
+        provider = FakeTextProvider(MIXED_RESPONSE)
+
+        with patch.object(CardGenerator, "_get_llm_provider", return_value=provider):
+            cards = await generator.generate_cards_from_text(
+                text="测试文本",
+                user_id="test_user",
+                card_types=[CardType.BASIC, CardType.cloze, CardType.CONCEPT]
+            )
+
+        assert len(provider.prompts) == 1
+        assert '"card_type": "cloze"' in provider.prompts[0]
+        assert [card.title for card in cards] == ["基础", "填空", "概念"]
+        assert isinstance(cards[1].content, ClozeContent)
+        assert isinstance(cards[2].content, ConceptContent)
+        assert generator.count_by_type(cards) == {"basic": 1, "cloze": 1, "concept": 1}
+
+    def test_mixed_prompt_prefix_is_order_independent(self):
+        """测试类型顺序不同时使用同一个前缀"""
+        generator = CardGenerator()
+        _, first = generator._resolve_card_types(CardType.BASIC, [CardType.CONCEPT, CardType.BASIC])
+        _, second = generator._resolve_card_types(CardType.BASIC, [CardType.BASIC, CardType.CONCEPT])
+
+        assert generator._build_generation_prompt("文本", CardType.BASIC, 4, first) == \
+            generator._build_generation_prompt("文本", CardType.BASIC, 4, second)
+        assert generator._max_tokens_for(CardType.BASIC, 4, first) > generator._max_tokens_for(CardType.BASIC, 4)
+
+    def test_generate_endpoint_reports_type_counts(self, client):
+        """测试生成接口返回按类型统计的数量"""
+        provider = FakeTextProvider(MIXED_RESPONSE)
+
+        with patch.object(CardGenerator, "_get_llm_provider", return_value=provider):
+            response = client.post(
+                "/api/v1/cards/generate?user_id=test_user",
+                json={"text": "测试文本", "card_types": ["basic", "concept"], "auto_save": False}
+            )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["type_counts"] == {"basic": 1, "concept": 1}
+        assert data["total_generated"] == 2
+
+
+class TestTokenBudgets:
+    """测试基于token估算的预算"""
+
+    def test_max_tokens_scales_with_cards_and_type(self):
+        """测试max_tokens随卡片数量和字段数增长，并受上限约束"""
+        generator = CardGenerator()
+
+        basic = generator._max_tokens_for(CardType.BASIC, 5)
+        assert generator._max_tokens_for(CardType.BASIC, 10) > basic
+        assert generator._max_tokens_for(CardType.CONCEPT, 5) > basic
+        assert generator._max_tokens_for(CardType.CONCEPT, 1000) == generator.settings.LLM_MAX_OUTPUT_TOKENS
+
+    async def test_over_budget_input_is_rejected_before_calling_llm(self):
+        """测试超出预算的输入不会调用LLM"""
+        generator = CardGenerator()
+        generator.settings = generator.settings.model_copy(update={"CARD_GENERATION_MAX_INPUT_TOKENS": 10})
+        provider = FakeChunkProvider()
+
+        with patch.object(CardGenerator, "_get_llm_provider", return_value=provider):
+            with pytest.raises(ValueError, match="输入文本过长"):
+                await generator.generate_cards_from_text(text="超" * 50, user_id="test_user")
+
+        assert provider.prompts == []
+
+    async def test_card_schema_is_requested(self):
+        """测试生成请求携带由卡片内容类生成的JSON Schema"""
+        generator = CardGenerator()
+        provider = FakeChunkProvider()
+
+        with patch.object(CardGenerator, "_get_llm_provider", return_value=provider):
+            await generator.generate_cards_from_text(text="测试文本", user_id="test_user", card_type=CardType.CONCEPT)
+
+        schema = provider.kwargs["json_schema"]["schema"]
+        card = schema["properties"]["cards"]["items"]
+        assert set(card["properties"]["content"]["required"]) == {"front", "back", "concept", "definition"}
+
+    async def test_max_tokens_is_passed_to_provider(self):
+        """测试生成请求携带按卡片数量计算的max_tokens"""
+        generator = CardGenerator()
+        provider = FakeChunkProvider()
+
+        with patch.object(CardGenerator, "_get_llm_provider", return_value=provider):
+            await generator.generate_cards_from_text(text="测试文本", user_id="test_user", max_cards=3)
+
+        assert provider.max_tokens == generator._max_tokens_for(CardType.BASIC, 3)
+
+
+class TestIncrementalCardParser:
+    """测试增量卡片解析器"""
+
+    def test_emits_cards_as_objects_close(self):
+        """测试每个卡片对象闭合时立即返回"""
+        parser = IncrementalCardParser()
+        emitted = []
+        for char in SAMPLE_RESPONSE:
+            emitted.extend(parser.feed(char))
+            if '"卡片2"' in parser.text and len(emitted) == 1:
+                # 第二张卡片未完成时第一张已经返回
+                assert emitted[0]["title"] == "卡片1"
+
+        assert [card["title"] for card in emitted] == ["卡片1", "卡片2"]
+        assert emitted[0]["content"]["front"] == "问题{1}"
+        assert emitted[0]["content"]["back"] == '答案"1"'
+        assert parser.finished
+
+    def test_skips_invalid_objects(self):
+        """测试无效对象被计数并跳过"""
+        parser = IncrementalCardParser()
+        cards = parser.feed('{"cards": [{"title": 1 2}, {"title": "ok"}]}')
+
+        assert cards == [{"title": "ok"}]
+        assert parser.invalid_count == 1
+
+
+class TestCardSalvage:
+    """测试截断或格式有误输出的修复与部分保留"""
+
+    def test_valid_output_is_not_repaired(self):
+        """测试格式正确的输出直接解析"""
+        salvage = salvage_cards(SAMPLE_RESPONSE)
+
+        assert salvage.found and not salvage.repaired
+        assert [card["title"] for card in salvage.cards] == ["卡片1", "卡片2"]
+        assert salvage.dropped == 0
+
+    def test_trailing_commas_are_repaired(self):
+        """测试去掉多余逗号，字符串内的逗号保持不变"""
+        salvage = salvage_cards('```json\n{"cards": [{"title": "a,]", "tags": ["x",],},],}\n```')
+
+        assert salvage.repaired
+        assert salvage.cards == [{"title": "a,]", "tags": ["x"]}]
+
+    def test_truncated_output_keeps_complete_cards(self):
+        """测试截断的输出保留已完整的卡片，未闭合的卡片计为丢弃"""
+        truncated = SAMPLE_RESPONSE[:SAMPLE_RESPONSE.index('"卡片2"') + 10]
+        salvage = salvage_cards(truncated)
+
+        assert salvage.found and salvage.repaired
+        assert [card["title"] for card in salvage.cards] == ["卡片1"]
+        assert salvage.dropped == 1
+
+    async def test_generator_reports_salvaged_and_dropped(self):
+        """测试生成器统计修复保留和丢弃的卡片数，无卡片数据时报错"""
+        generator = CardGenerator()
+        truncated = SAMPLE_RESPONSE[:SAMPLE_RESPONSE.index('"卡片2"') + 10]
+
+        with patch.object(CardGenerator, "_get_llm_provider", return_value=FakeTextProvider(truncated)):
+            cards = await generator.generate_cards_from_text(text="测试文本", user_id="test_user")
+
+        assert [card.title for card in cards] == ["卡片1"]
+        assert generator.parse_stats == {"salvaged": 1, "dropped": 1, "failed_chunks": 0}
+
+        with patch.object(CardGenerator, "_get_llm_provider", return_value=FakeTextProvider("抱歉，无法生成")):
+            with pytest.raises(ValueError, match="未找到卡片数据"):
+                await generator.generate_cards_from_text(text="测试文本", user_id="test_user")
+
+
+class TestStreamingGeneration:
+    """测试流式卡片生成"""
+
+    async def test_generate_cards_stream(self):
+        """测试流式生成逐张返回有效卡片"""
+        generator = CardGenerator()
+        provider = FakeStreamingProvider(SAMPLE_RESPONSE)
+
+        with patch.object(CardGenerator, "_get_llm_provider", return_value=provider):
+            cards = [
+                card async for card in generator.generate_cards_stream(
+                    text="测试文本",
+                    user_id="test_user",
+                    card_type=CardType.BASIC
+                )
+            ]
+
+        assert [card.title for card in cards] == ["卡片1", "卡片2"]
+        assert cards[1].tags == ["b", "c"]
+
+    def test_generate_cards_stream_endpoint(self, client):
+        """测试流式生成接口推送卡片事件"""
+        provider = FakeStreamingProvider(SAMPLE_RESPONSE)
+
+        with patch.object(CardGenerator, "_get_llm_provider", return_value=provider):
+            response = client.post(
+                "/api/v1/cards/generate/stream?user_id=test_user",
+                json={"text": "测试文本", "auto_save": False}
+            )
+
+        assert response.status_code == 200
+        events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+        names = [lines[0][len("event: "):] for lines in events]
+        assert names == ["card", "card", "done"]
+
+        first = json.loads(events[0][1][len("data: "):])
+        assert first["card"]["title"] == "卡片1"
+        assert first["saved"] is False
+        summary = json.loads(events[-1][1][len("data: "):])
+        assert summary["stopped_early"] == "array_closed"
+        assert summary["tokens_saved"] > 0
+        del summary["tokens_saved"], summary["seconds_saved"], summary["stopped_early"]
+        assert summary == {"total_generated": 2, "total_saved": 0, "type_counts": {"basic": 2}, "dropped_count": 0}
+
+    async def test_stream_closes_once_max_cards_are_parsed(self):
+        """测试得到 max_cards 张卡片后立即关闭上游流并记录节省量"""
+        cards = [{"title": f"卡片{i}", "content": {"front": f"问题{i}", "back": "答案"}} for i in range(5)]
+        response = json.dumps({"cards": cards}, ensure_ascii=False) + "\n以上卡片覆盖了全部要点。"
+        generator = CardGenerator()
+        provider = FakeStreamingProvider(response)
+
+        with patch.object(CardGenerator, "_get_llm_provider", return_value=provider):
+            titles = [
+                card.title async for card in generator.generate_cards_stream(
+                    text="测试文本", user_id="test_user", max_cards=2
+                )
+            ]
+
+        assert titles == ["卡片0", "卡片1"]
+        assert provider.closed
+        assert provider.sent < len(response) // 2
+        assert generator.stream_savings["reason"] == "max_cards"
+        assert generator.stream_savings["tokens_saved"] > 0
+        # 被截停的第三张卡片不计为丢弃
+        assert generator.parse_stats["dropped"] == 0
+
+    async def test_trailing_prose_after_array_is_not_awaited(self):
+        """测试卡片数组闭合后不再等待结尾的说明文字"""
+        generator = CardGenerator()
+        provider = FakeStreamingProvider(SAMPLE_RESPONSE + "希望这些卡片对你有帮助！" * 20)
+
+        with patch.object(CardGenerator, "_get_llm_provider", return_value=provider):
+            cards = [
+                card async for card in generator.generate_cards_stream(text="测试文本", user_id="test_user")
+            ]
+
+        assert len(cards) == 2
+        assert provider.closed
+        assert provider.sent < len(SAMPLE_RESPONSE) + provider.chunk_size
+        assert generator.stream_savings["reason"] == "array_closed"
+
+
+class TestMapReduceGeneration:
+    """测试长文本的分块并发生成"""
+
+    async def test_long_text_is_generated_per_chunk_and_merged(self):
+        """测试各块结果去重合并，重复卡片优先且不超过 max_cards"""
+        generator = CardGenerator()
+        generator.settings = generator.settings.model_copy(update={"CARD_GENERATION_CHUNK_TOKENS": 20})
+        provider = FakeChunkProvider()
+        text = "\n\n".join(["第一部分的内容" * 2, "第二部分的内容" * 2, "第三部分的内容" * 2])
+
+        with patch.object(CardGenerator, "_get_llm_provider", return_value=provider):
+            cards = await generator.generate_cards_from_text(
+                text=text, user_id="test_user", max_cards=3
+            )
+
+        assert len(provider.prompts) == 3
+        assert [card.title for card in cards][0] == "公共"
+        assert len(cards) == 3
+        assert len({card.content.front for card in cards}) == 3
+
+    async def test_failed_chunks_are_skipped(self):
+        """测试部分文本块失败时保留其余结果"""
+        generator = CardGenerator()
+        generator.settings = generator.settings.model_copy(update={"CARD_GENERATION_CHUNK_TOKENS": 20})
+        provider = FakeChunkProvider()
+        text = "坏块" * 10 + "\n\n" + "好的内容" * 4
+
+        with patch.object(CardGenerator, "_get_llm_provider", return_value=provider):
+            cards = await generator.generate_cards_from_text(
+                text=text, user_id="test_user", max_cards=5
+            )
+
+        assert len(provider.prompts) == 2
+        assert [card.title for card in cards] == ["公共", "块2"]
+        assert generator.parse_stats["failed_chunks"] == 1
+
+
+class TestBatchGeneration:
+    """测试批量生成"""
+
+    def test_generate_cards_batch_endpoint(self, client):
+        """测试批量接口逐项返回结果，失败项只返回错误"""
+        provider = FakeChunkProvider()
+
+        with patch.object(CardGenerator, "_get_llm_provider", return_value=provider):
+            response = client.post(
+                "/api/v1/cards/generate/batch?user_id=test_user",
+                json={
+                    "items": [
+                        {"text": "第一段文本", "max_cards": 2},
+                        {"text": "坏块", "card_type": "basic"},
+                        {"text": "第三段文本", "max_cards": 1},
+                    ],
+                    "auto_save": False
+                }
+            )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [item["index"] for item in data["results"]] == [0, 1, 2]
+        assert data["results"][0]["total_generated"] == 2
+        assert data["results"][1]["error"].startswith("生成卡片失败")
+        assert data["results"][1]["cards"] == []
+        assert data["total_generated"] == 4
+        assert data["total_failed"] == 1
+        assert data["total_saved"] == 0
+
+    async def test_create_many_saves_in_one_transaction(self):
+        """测试批量保存写入全部卡片"""
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine, tables=[CardModel.__table__])
+        db = sessionmaker(bind=engine)()
+        repository = SQLAlchemyCardRepository(db)
+        cards = [
+            Card(user_id="test_user", title=f"卡片{i}", card_type=CardType.BASIC,
+                 content=CardContent(front=f"问题{i}", back="答案"))
+            for i in range(3)
+        ]
+
+        saved = await repository.create_many(cards)
+
+        assert [card.id for card in saved] == [card.id for card in cards]
+        assert await repository.count_by_user("test_user") == 3
+        db.close()
+
+
+class TestStageTimings:
+    """测试生成阶段耗时与卡片检索"""
+
+    def test_generate_endpoint_reports_server_timing(self, client):
+        """测试生成接口通过 Server-Timing 返回各阶段耗时"""
+        with patch.object(CardGenerator, "_get_llm_provider", return_value=FakeChunkProvider()):
+            response = client.post(
+                "/api/v1/cards/generate?user_id=test_user",
+                json={"text": "测试文本", "auto_save": False}
+            )
+
+        assert response.status_code == 200
+        stages = [metric.split(";")[0] for metric in response.headers["server-timing"].split(", ")]
+        assert stages == ["prompt", "llm", "parse", "persist"]
+
+    async def test_concurrent_chunks_report_wall_clock_stage_timings(self):
+        """测试并发文本块的阶段耗时取墙钟跨度，不超过整体耗时"""
+        generator = CardGenerator()
+        generator.settings = generator.settings.model_copy(update={"CARD_GENERATION_CHUNK_TOKENS": 20})
+        provider = FakeChunkProvider()
+        text = "\n\n".join(["第一部分的内容" * 2, "第二部分的内容" * 2, "第三部分的内容" * 2])
+
+        async def slow_generate(prompt: str, **kwargs) -> str:
+            await asyncio.sleep(0.1)
+            return await FakeChunkProvider.generate_text(provider, prompt, **kwargs)
+
+        provider.generate_text = slow_generate
+        started = time.perf_counter()
+        with patch.object(CardGenerator, "_get_llm_provider", return_value=provider):
+            await generator.generate_cards_from_text(text=text, user_id="test_user", max_cards=3)
+        elapsed = time.perf_counter() - started
+
+        assert len(provider.prompts) == 3
+        assert 0.1 <= generator.stage_timings["llm"] < 0.2
+        assert max(generator.stage_timings.values()) <= elapsed
+
+    async def test_search_matches_content_on_sqlite(self):
+        """测试搜索按标题和正反面内容匹配（SQLite 下同样可用）"""
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine, tables=[CardModel.__table__])
+        db = sessionmaker(bind=engine)()
+        repository = SQLAlchemyCardRepository(db)
+        await repository.create_many([
+            Card(user_id="test_user", title="生物", card_type=CardType.BASIC,
+                 content=CardContent(front="什么是光合作用？", back="植物利用光能的过程")),
+            Card(user_id="test_user", title="化学", card_type=CardType.BASIC,
+                 content=CardContent(front="什么是氧化？", back="失去电子")),
+        ])
+
+        assert [card.title for card in await repository.search("test_user", "光合")] == ["生物"]
+        assert [card.title for card in await repository.search("test_user", "电子")] == ["化学"]
+        db.close()
+
+    def test_search_route_is_not_shadowed_by_card_id(self, client):
+        """测试 /cards/search 不会被 /cards/{card_id} 匹配"""
+        from app.application.card.dto import CardListResponse
+        from app.interfaces.api.v1.endpoints.card import get_card_service
+
+        class SearchOnlyService:
+            async def search_cards(self, user_id, query, skip, limit):
+                return CardListResponse(cards=[], total=0, skip=skip, limit=limit)
+
+        client.app.dependency_overrides[get_card_service] = SearchOnlyService
+        try:
+            response = client.get("/api/v1/cards/search?user_id=test_user&q=光合")
+        finally:
+            client.app.dependency_overrides.clear()
+
+        assert response.status_code == 200
+        assert response.json()["total"] == 0
+
+
+class TestGenerationJobs:
+    """测试异步生成任务"""
+
+    async def test_job_runs_off_request_path_and_reports_events(self):
+        """测试提交后立即返回，工作协程完成任务并推送事件"""
+        store = GenerationJobStore(":memory:")
+        pool = GenerationWorkerPool(store, workers=1, poll_interval=0.05)
+        provider = FakeChunkProvider()
+
+        with patch.object(CardGenerator, "_get_llm_provider", return_value=provider):
+            job = await pool.submit("test_user", {"text": "测试文本", "max_cards": 2, "auto_save": False})
+            assert job["status"] == "pending"
+
+            events = []
+
+            async def collect():
+                async for event in pool.subscribe(job["id"]):
+                    events.append(event)
+
+            subscriber = asyncio.create_task(collect())
+            await asyncio.sleep(0)
+            await pool.start()
+            await asyncio.wait_for(subscriber, timeout=2)
+            await pool.stop()
+
+        names = [event["event"] for event in events]
+        assert names[0] == "status" and names[-1] == "completed"
+        assert "progress" in names
+
+        finished = await store.get(job["id"], "test_user")
+        assert finished["status"] == "completed"
+        assert finished["progress"] == {"chunks_completed": 1, "chunks_total": 1}
+        assert finished["result"]["total_generated"] == 2
+        assert finished["result"]["failed_chunk_count"] == 0
+        assert await store.get(job["id"], "other_user") is None
+        store.close()
+
+    async def test_failed_job_and_restart_requeue(self):
+        """测试失败任务记录错误，中断的任务在重启后重新排队"""
+        store = GenerationJobStore(":memory:")
+        interrupted = await store.create("test_user", {"text": "文本"})
+        assert (await store.claim_next())["id"] == interrupted["id"]
+        failing = await store.create("test_user", {"text": "坏块", "auto_save": False})
+
+        pool = GenerationWorkerPool(store, workers=1, poll_interval=0.05)
+        with patch.object(CardGenerator, "_get_llm_provider", return_value=FakeChunkProvider()):
+            with patch.object(CardGenerator, "generate_cards_from_text", side_effect=ValueError("LLM 调用失败")):
+                await pool.start()
+                events = [event async for event in pool.subscribe(failing["id"])]
+                await pool.stop()
+
+        assert events[-1]["event"] == "failed"
+        assert (await store.get(failing["id"]))["error"] == "生成卡片失败: LLM 调用失败"
+        assert (await store.get(interrupted["id"]))["status"] == "failed"
+        store.close()
+
+    async def test_worker_survives_store_fail_error(self):
+        """测试记录失败状态出错时工作协程继续处理后续任务"""
+        store = GenerationJobStore(":memory:")
+        failing = await store.create("test_user", {"text": "坏块", "auto_save": False})
+        following = await store.create("test_user", {"text": "测试文本", "max_cards": 2, "auto_save": False})
+
+        pool = GenerationWorkerPool(store, workers=1, poll_interval=0.05)
+        generate = AsyncMock(side_effect=[ValueError("LLM 调用失败"), []])
+        with patch.object(CardGenerator, "generate_cards_from_text", generate):
+            with patch.object(store, "fail", AsyncMock(side_effect=RuntimeError("database is locked"))):
+                await pool.start()
+                try:
+                    await asyncio.wait_for(self._wait_until_finished(store, following["id"]), timeout=2)
+                finally:
+                    await pool.stop()
+
+        assert (await store.get(following["id"]))["status"] == "completed"
+        assert (await store.get(failing["id"]))["status"] == "running"
+        store.close()
+
+    @staticmethod
+    async def _wait_until_finished(store, job_id):
+        while (await store.get(job_id))["status"] not in ("completed", "failed"):
+            await asyncio.sleep(0.01)
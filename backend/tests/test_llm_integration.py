@@ -1,10 +1,16 @@
 """
 Test LLM API endpoints integration.
 """
+import json
+
 import pytest
 from unittest.mock import patch, AsyncMock
 from fastapi.testclient import TestClient
 
+from app.application.card.generator import CardGenerator
+from app.infrastructure.llm import LLMStreamChunk, LLMUsage
+from app.shared.config import get_settings
+
 
 class TestLLMAPIEndpoints:
     """Test LLM API endpoints."""
@@ -92,6 +98,21 @@ class TestLLMAPIEndpoints:
         assert data["parameters"]["max_tokens"] == 100
         assert data["parameters"]["temperature"] == 0.7
 
+    @patch('app.infrastructure.llm.openai.OpenAIProvider.generate_with_retry', autospec=True)
+    async def test_generate_text_uses_configured_provider_instance(self, mock_generate, client: TestClient):
+        """Test the endpoint uses the configured base URL and the card generator's registry instance."""
+        mock_generate.return_value = "Generated text."
+
+        response = client.post(
+            "/api/v1/llm/generate",
+            json={"provider": "openai", "prompt": "Test prompt"}
+        )
+
+        assert response.status_code == 200
+        provider = mock_generate.call_args.args[0]
+        assert provider.base_url == get_settings().OPENAI_BASE_URL
+        assert provider is CardGenerator()._get_llm_provider("openai")
+
     def test_generate_text_missing_prompt(self, client: TestClient):
         """Test text generation with missing prompt."""
         response = client.post(
@@ -134,4 +155,42 @@ class TestLLMAPIEndpoints:
         )
 
         assert response.status_code == 400
-        assert "Unknown LLM provider" in response.json()["detail"]
\ No newline at end of file
+        assert "Unknown LLM provider" in response.json()["detail"]
+
+    def test_generate_text_stream(self, client: TestClient):
+        """Test streaming text generation returns SSE frames."""
+        async def fake_stream(self, prompt, **kwargs):
+            yield LLMStreamChunk(content="Hello")
+            yield LLMStreamChunk(content=" world")
+            yield LLMStreamChunk(
+                done=True,
+                finish_reason="stop",
+                usage=LLMUsage(prompt_tokens=3, completion_tokens=2, total_tokens=5),
+                time_to_first_token=0.1,
+                latency=0.2
+            )
+
+        with patch('app.infrastructure.llm.openai.OpenAIProvider.generate_stream', fake_stream):
+            response = client.post(
+                "/api/v1/llm/generate",
+                json={
+                    "provider": "openai",
+                    "prompt": "Test prompt",
+                    "max_tokens": 50,
+                    "stream": True
+                }
+            )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        frames = [
+            (block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+            for block in response.text.strip().split("\n\n")
+        ]
+        assert frames[0] == ("token", {"text": "Hello"})
+        assert frames[1] == ("token", {"text": " world"})
+        event, summary = frames[-1]
+        assert event == "done"
+        assert summary["provider"] == "openai"
+        assert summary["parameters"] == {"max_tokens": 50}
+        assert summary["usage"]["total_tokens"] == 5
@@ -1,12 +1,49 @@
 """
 Test LLM provider functionality.
 """
+import asyncio
+import json
+
+import httpx
 import pytest
 from unittest.mock import patch, AsyncMock
 
-from app.infrastructure.llm import LLMFactory, LLMConfigurationError
+from app.infrastructure.llm import (
+    LLMFactory,
+    LLMConfigurationError,
+    LLMConnectionError,
+    LLMError,
+    LLMOverloadedError,
+    LLMRateLimitError,
+    LLMStreamChunk,
+)
 from app.infrastructure.llm.openai import OpenAIProvider
 from app.infrastructure.llm.deepseek import DeepSeekProvider
+from app.infrastructure.llm.bulkhead import Bulkhead, BulkheadFullError, llm_bulkheads
+from app.infrastructure.llm.cache import LLMResponseCache, llm_response_cache
+from app.infrastructure.llm.hedging import LLMHedger, llm_hedger
+from app.infrastructure.llm.http_client import LLMHTTPClientPool, llm_client_pool
+from app.infrastructure.llm.ratelimit import (
+    RateLimiter,
+    TokenBucket,
+    llm_rate_limiters,
+    parse_duration,
+    parse_retry_after,
+)
+from app.infrastructure.llm.router import CircuitBreaker, LLMRouter, RoutedLLMProvider
+from app.infrastructure.llm.singleflight import SingleFlight
+from scripts.llm_standin import (
+    FaultProfile,
+    LatencyProfile,
+    StandInServer,
+    create_standin_app,
+    request_key,
+)
+from app.infrastructure.llm.telemetry import Histogram, llm_telemetry
+from app.infrastructure.llm.timeouts import AdaptiveTimeouts, TotalTimeout, llm_timeouts
+from app.infrastructure.llm.tokens import estimate_messages_tokens, estimate_tokens
+from app.infrastructure.llm.usage import llm_usage
+from app.infrastructure.llm.warmup import LLMConnectionWarmer, llm_warmer
 
 
 class TestLLMFactory:
@@ -52,6 +89,30 @@ class TestLLMFactory:
         assert provider.provider_name == "deepseek"
         assert provider.model == "deepseek-chat"
 
+    def test_get_provider_reuses_instances(self):
+        """Test registry returns the same warm instance for the same config."""
+        LLMFactory.invalidate()
+        first = LLMFactory.get_provider("openai", api_key="test-key")
+        second = LLMFactory.get_provider("openai", api_key="test-key", model="gpt-3.5-turbo")
+        other_key = LLMFactory.get_provider("openai", api_key="rotated-key")
+
+        assert first is second
+        assert first is not other_key
+        assert first.model == "gpt-3.5-turbo"
+
+        assert LLMFactory.invalidate("openai", api_key="test-key") == 1
+        assert LLMFactory.get_provider("openai", api_key="test-key") is not first
+
+    def test_provider_registry_is_bounded(self):
+        """Test registry evicts least recently used instances."""
+        LLMFactory.set_registry_size(2)
+        first = LLMFactory.get_provider("deepseek", api_key="key-1")
+        LLMFactory.get_provider("deepseek", api_key="key-2")
+        LLMFactory.get_provider("deepseek", api_key="key-3")
+
+        assert LLMFactory.get_registry_size() == 2
+        assert LLMFactory.get_provider("deepseek", api_key="key-1") is not first
+
     def test_create_unknown_provider(self):
         """Test creating unknown provider raises error."""
         with pytest.raises(LLMConfigurationError):
@@ -166,4 +227,833 @@ class TestDeepSeekProvider:
         assert result["status"] == "success"
         assert result["provider"] == "deepseek"
         assert result["model"] == "deepseek-chat"
-        assert "test_response" in result
\ No newline at end of file
+        assert "test_response" in result
+
+
+class TestLLMHTTPClientPool:
+    """Test shared HTTP client pool."""
+
+    async def test_client_reused_per_base_url(self):
+        """Test clients are shared per base URL."""
+        pool = LLMHTTPClientPool(max_connections=5, max_keepalive_connections=2)
+
+        first = pool.get_client("https://api.example.com/v1")
+        second = pool.get_client("https://api.example.com/v1")
+        other = pool.get_client("https://api.other.com/v1")
+
+        assert first is second
+        assert first is not other
+        assert len(pool.base_urls) == 2
+
+        await pool.aclose()
+        assert first.is_closed
+        assert pool.base_urls == []
+
+    async def test_providers_share_pooled_client(self):
+        """Test provider instances with the same base URL share one client."""
+        first = OpenAIProvider(api_key="key-1", model="gpt-3.5-turbo")
+        second = OpenAIProvider(api_key="key-2", model="gpt-4")
+
+        assert first._get_client() is second._get_client()
+
+    async def test_install_transport_replaces_client(self):
+        """Test a custom transport serves a base URL and the old client is closed."""
+        pool = LLMHTTPClientPool()
+        original = pool.get_client("https://api.example.com/v1")
+        client = await pool.install_transport(
+            "https://api.example.com/v1", httpx.MockTransport(lambda request: httpx.Response(204))
+        )
+
+        assert original.is_closed
+        assert pool.get_client("https://api.example.com/v1") is client
+        assert (await client.get("https://api.example.com/v1/models")).status_code == 204
+        await pool.aclose()
+
+
+class TestGenerateStream:
+    """Test token streaming."""
+
+    @staticmethod
+    def _sse(*events: str) -> bytes:
+        return "".join(f"data: {event}\n\n" for event in events).encode("utf-8")
+
+    async def test_generate_stream_yields_tokens_and_usage(self):
+        """Test SSE chunks are parsed into content and a final usage chunk."""
+        body = self._sse(
+            '{"choices":[{"delta":{"role":"assistant"}}]}',
+            '{"choices":[{"delta":{"content":"Hello"}}]}',
+            '{"choices":[{"delta":{"content":", world"},"finish_reason":"stop"}]}',
+            '{"choices":[],"usage":{"prompt_tokens":5,"completion_tokens":3,"total_tokens":8,'
+            '"prompt_tokens_details":{"cached_tokens":2}}}',
+            "[DONE]",
+        )
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(json.loads(request.content))
+            return httpx.Response(200, content=body, headers={"content-type": "text/event-stream"})
+
+        base_url = "https://stream.test/v1"
+        await llm_client_pool.install_transport(base_url, httpx.MockTransport(handler))
+        provider = OpenAIProvider(api_key="test-key", model="gpt-3.5-turbo", base_url=base_url)
+        chunks = [chunk async for chunk in provider.generate_stream("Test prompt")]
+
+        assert "".join(chunk.content for chunk in chunks) == "Hello, world"
+        final = chunks[-1]
+        assert final.done
+        assert final.finish_reason == "stop"
+        assert final.usage.total_tokens == 8
+        assert final.usage.cached_tokens == 2
+        assert final.time_to_first_token is not None
+        assert requests[0]["stream"] is True
+        assert requests[0]["stream_options"] == {"include_usage": True}
+
+    async def test_generate_stream_maps_http_errors(self):
+        """Test streaming errors are translated into LLM errors."""
+        base_url = "https://stream-error.test/v1"
+        await llm_client_pool.install_transport(
+            base_url, httpx.MockTransport(lambda request: httpx.Response(401, json={"error": "bad key"}))
+        )
+        provider = DeepSeekProvider(api_key="bad-key", base_url=base_url)
+        with pytest.raises(LLMConnectionError):
+            async for _ in provider.generate_stream("Test prompt"):
+                pass
+
+
+class TestLLMResponseCache:
+    """Test LLM response cache."""
+
+    async def test_memory_tier_lru_and_ttl(self):
+        """Test memory tier hits, evicts and expires entries."""
+        cache = LLMResponseCache(enabled=True, ttl=60, max_entries=2)
+        await cache.set("a", {"value": 1})
+        await cache.set("b", {"value": 2})
+        assert await cache.get("a") == {"value": 1}
+
+        await cache.set("c", {"value": 3})
+        assert await cache.get("b") is None
+        assert cache.stats["evictions"] == 1
+
+        cache.ttl = -1
+        await cache.set("d", {"value": 4})
+        assert await cache.get("d") is None
+        assert cache.stats["expired"] == 1
+        assert cache.stats["memory_hits"] == 1
+
+    async def test_disk_tier_survives_restart(self, tmp_path):
+        """Test responses are served from SQLite after a restart."""
+        path = str(tmp_path / "llm_cache.db")
+        cache = LLMResponseCache(enabled=True, path=path)
+        await cache.set("key", {"choices": []})
+        cache.close()
+
+        restarted = LLMResponseCache(enabled=True, path=path)
+        assert await restarted.get("key") == {"choices": []}
+        assert restarted.stats["disk_hits"] == 1
+        restarted.close()
+
+    def test_key_ignores_stream_flags(self):
+        """Test streaming and blocking requests share a cache key."""
+        payload = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 0.7}
+        streamed = {**payload, "stream": True, "stream_options": {"include_usage": True}}
+
+        assert LLMResponseCache.make_key("openai", "u", "k", payload) == LLMResponseCache.make_key("openai", "u", "k", streamed)
+        assert LLMResponseCache.make_key("openai", "u", "k", payload) != LLMResponseCache.make_key("openai", "u", "k", {**payload, "temperature": 0})
+
+    async def test_identical_requests_hit_cache(self):
+        """Test a repeated generation does not call the provider again."""
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            return httpx.Response(200, json={"choices": [{"message": {"content": "cached answer"}}]})
+
+        base_url = "https://cache.test/v1"
+        await llm_client_pool.install_transport(base_url, httpx.MockTransport(handler))
+        llm_response_cache.configure(enabled=True)
+        provider = OpenAIProvider(api_key="test-key", base_url=base_url)
+
+        assert await provider.generate_text("Same prompt") == "cached answer"
+        assert await provider.generate_text("Same prompt") == "cached answer"
+        assert await provider.generate_text("Same prompt", use_cache=False) == "cached answer"
+        assert len(calls) == 2
+
+    async def test_cache_is_partitioned_by_api_key(self):
+        """Test two API keys sending the same request on one endpoint both miss the cache."""
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request.headers["authorization"])
+            return httpx.Response(200, json={"choices": [{"message": {"content": "answer"}}]})
+
+        base_url = "https://cache-tenants.test/v1"
+        await llm_client_pool.install_transport(base_url, httpx.MockTransport(handler))
+        llm_response_cache.configure(enabled=True)
+        for api_key in ("tenant-a-key", "tenant-b-key", "tenant-a-key"):
+            provider = OpenAIProvider(api_key=api_key, base_url=base_url)
+            assert await provider.generate_text("Same prompt") == "answer"
+
+        assert calls == ["Bearer tenant-a-key", "Bearer tenant-b-key"]
+
+
+class TestSingleFlight:
+    """Test single-flight coalescing."""
+
+    async def test_concurrent_callers_share_one_call(self):
+        """Test identical concurrent calls run upstream once."""
+        group = SingleFlight()
+        calls = 0
+
+        async def upstream():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"answer": 42}
+
+        results = await asyncio.gather(*(group.do("same", upstream) for _ in range(5)))
+
+        assert calls == 1
+        assert all(result == {"answer": 42} for result in results)
+        assert group.stats["coalesced"] == 4
+        assert group.in_flight == 0
+
+    async def test_cancel_only_when_all_waiters_leave(self):
+        """Test the upstream call survives until its last waiter is cancelled."""
+        group = SingleFlight()
+        started = asyncio.Event()
+        upstream_cancelled = False
+
+        async def upstream():
+            nonlocal upstream_cancelled
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                upstream_cancelled = True
+                raise
+
+        first = asyncio.create_task(group.do("key", upstream))
+        second = asyncio.create_task(group.do("key", upstream))
+        await started.wait()
+
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert not upstream_cancelled
+
+        second.cancel()
+        await asyncio.gather(second, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert upstream_cancelled
+        assert group.stats["cancelled"] == 1
+
+
+class TestRateLimiter:
+    """Test client-side rate limiting."""
+
+    def test_parse_retry_after_and_durations(self):
+        """Test Retry-After and reset duration parsing."""
+        assert parse_retry_after("2") == 2.0
+        assert parse_retry_after(None) is None
+        assert parse_duration("6m0s") == 360.0
+        assert parse_duration("20ms") == pytest.approx(0.02)
+
+    def test_token_bucket_paces_requests(self):
+        """Test a drained bucket reports the wait for the next request."""
+        bucket = TokenBucket(per_minute=60)
+        for _ in range(60):
+            assert bucket.reserve(1) == 0.0
+        assert bucket.reserve(1) == pytest.approx(1.0, abs=0.05)
+
+    def test_limiter_adapts_to_headers(self):
+        """Test x-ratelimit-* and Retry-After headers reshape the limiter."""
+        limiter = RateLimiter()
+        limiter.update_from_headers({
+            "x-ratelimit-limit-requests": "120",
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-reset-requests": "500ms",
+            "x-ratelimit-limit-tokens": "10000",
+        })
+
+        assert limiter.requests.per_minute == 120
+        assert limiter.tokens.per_minute == 10000
+        assert limiter.get_stats()["blocked_for"] > 0
+
+    async def test_429_raises_rate_limit_error_with_retry_after(self):
+        """Test a 429 surfaces Retry-After and blocks the limiter."""
+        base_url = "https://ratelimit.test/v1"
+        await llm_client_pool.install_transport(base_url, httpx.MockTransport(
+            lambda request: httpx.Response(429, headers={"retry-after": "3"}, json={"error": "slow down"})
+        ))
+        provider = OpenAIProvider(api_key="test-key", model="rl-model", base_url=base_url)
+        with pytest.raises(LLMRateLimitError) as exc_info:
+            await provider.generate_text("Test prompt")
+
+        assert exc_info.value.retry_after == 3.0
+        limiter = llm_rate_limiters.get("openai", "rl-model")
+        assert limiter.stats["rate_limited"] == 1
+        assert limiter.get_stats()["blocked_for"] > 2
+
+
+class TestTokenEstimator:
+    """Test local token estimation."""
+
+    def test_estimates_mixed_text(self):
+        """Test CJK characters, words, numbers and symbols are counted."""
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("Hello world") == 2
+        assert estimate_tokens("你好，world!") == 5
+        assert estimate_tokens("internationalization 12345") == 4 + 2
+
+    def test_estimates_chat_messages(self):
+        """Test message framing overhead is included."""
+        messages = [{"role": "user", "content": "Hello world"}]
+        assert estimate_messages_tokens(messages) == 2 + 4 + 3
+
+
+class TestStructuredOutput:
+    """Test response_format selection per provider."""
+
+    SCHEMA = {"name": "cards", "schema": {"type": "object", "properties": {"cards": {"type": "array"}}}}
+
+    def test_json_schema_mode_when_supported(self):
+        """Test OpenAI gets JSON-schema mode and DeepSeek falls back to JSON mode."""
+        openai_payload = OpenAIProvider(api_key="k")._build_payload("Return JSON", json_schema=self.SCHEMA)
+        deepseek_payload = DeepSeekProvider(api_key="k")._build_payload("Return JSON", json_schema=self.SCHEMA)
+
+        assert openai_payload["response_format"]["type"] == "json_schema"
+        assert openai_payload["response_format"]["json_schema"]["schema"] == self.SCHEMA["schema"]
+        assert deepseek_payload["response_format"] == {"type": "json_object"}
+
+    def test_plain_text_without_schema(self):
+        """Test no response_format is sent unless requested."""
+        assert "response_format" not in OpenAIProvider(api_key="k")._build_payload("Hi")
+        explicit = OpenAIProvider(api_key="k")._build_payload("Hi", response_format={"type": "json_object"})
+        assert explicit["response_format"] == {"type": "json_object"}
+
+
+class TestUsageTracking:
+    """Test token usage and prompt cache accounting."""
+
+    async def test_cached_prompt_tokens_are_tracked(self):
+        """Test DeepSeek cache-hit tokens are recorded per provider/model."""
+        base_url = "https://usage.test/v1"
+        await llm_client_pool.install_transport(base_url, httpx.MockTransport(
+            lambda request: httpx.Response(200, json={
+                "choices": [{"message": {"content": "ok"}}],
+                "usage": {"prompt_tokens": 100, "completion_tokens": 10, "total_tokens": 110,
+                          "prompt_cache_hit_tokens": 80},
+            })
+        ))
+        provider = DeepSeekProvider(api_key="test-key", model="usage-model", base_url=base_url)
+        await provider.generate_text("Test prompt", use_cache=False)
+        await provider.generate_text("Test prompt", use_cache=False)
+
+        stats = llm_usage.get_stats()["deepseek:usage-model"]
+        assert stats["requests"] == 2
+        assert stats["prompt_tokens"] == 200
+        assert stats["cached_tokens"] == 160
+        assert stats["cache_hit_requests"] == 2
+        assert stats["cached_ratio"] == 0.8
+
+
+class TestBulkhead:
+    """Test per provider/model concurrency bulkheads."""
+
+    async def test_bounds_concurrency_and_queues(self):
+        """Test calls beyond the limit wait for a free slot."""
+        bulkhead = Bulkhead(max_concurrent=2, max_queue=10, queue_timeout=1.0)
+        peak = 0
+
+        async def call():
+            nonlocal peak
+            await bulkhead.acquire()
+            try:
+                peak = max(peak, bulkhead.in_flight)
+                await asyncio.sleep(0.01)
+            finally:
+                bulkhead.release()
+
+        await asyncio.gather(*(call() for _ in range(6)))
+
+        stats = bulkhead.get_stats()
+        assert peak == 2
+        assert stats["acquired"] == 6
+        assert stats["in_flight"] == 0 and stats["queued"] == 0
+        assert stats["wait_seconds_max"] > 0
+
+    async def test_rejects_when_queue_full_or_timed_out(self):
+        """Test a saturated queue fails fast and a slow slot times out."""
+        bulkhead = Bulkhead(max_concurrent=1, max_queue=0, queue_timeout=0.05)
+        await bulkhead.acquire()
+        with pytest.raises(BulkheadFullError):
+            await bulkhead.acquire()
+
+        bulkhead.max_queue = 1
+        with pytest.raises(BulkheadFullError):
+            await bulkhead.acquire()
+        bulkhead.release()
+
+        stats = bulkhead.get_stats()
+        assert stats["rejected"] == 1 and stats["timed_out"] == 1
+        assert stats["in_flight"] == 0
+
+    async def test_provider_raises_overloaded_error(self):
+        """Test providers surface a full bulkhead as LLMOverloadedError."""
+        llm_bulkheads.configure(limits={"openai:bh-model": {"max_concurrent": 1, "max_queue": 0}})
+        provider = OpenAIProvider(api_key="test-key", model="bh-model")
+        bulkhead = llm_bulkheads.get("openai", "bh-model")
+        await bulkhead.acquire()
+
+        with pytest.raises(LLMOverloadedError):
+            await provider.generate_text("Test prompt", use_cache=False)
+        bulkhead.release()
+
+
+class FakeProvider:
+    """Minimal provider double for routing tests."""
+
+    def __init__(self, name: str, fail: bool = False):
+        self.provider_name = name
+        self.model = f"{name}-model"
+        self.fail = fail
+        self.calls = 0
+
+    async def generate_text(self, prompt: str, **kwargs) -> str:
+        self.calls += 1
+        if self.fail:
+            raise LLMConnectionError(f"{self.provider_name} is down")
+        return f"answer from {self.provider_name}"
+
+    async def generate_stream(self, prompt: str, **kwargs):
+        self.calls += 1
+        if self.fail:
+            raise LLMConnectionError(f"{self.provider_name} is down")
+        yield LLMStreamChunk(content=f"answer from {self.provider_name}")
+        yield LLMStreamChunk(done=True, finish_reason="stop")
+
+
+class TestLLMRouter:
+    """Test health-scored routing and circuit breakers."""
+
+    async def test_failover_to_next_provider(self):
+        """Test a failing provider is skipped for the next one."""
+        router = LLMRouter()
+        primary, secondary = FakeProvider("primary", fail=True), FakeProvider("secondary")
+        routed = RoutedLLMProvider(router, [primary, secondary])
+
+        assert await routed.generate_text("prompt") == "answer from secondary"
+        assert routed.provider_name == "secondary"
+        assert router.health(primary).error_rate == 1.0
+
+    async def test_circuit_breaker_trips_and_recovers(self):
+        """Test the breaker opens after repeated failures and half-opens after cooldown."""
+        router = LLMRouter()
+        router.configure(max_consecutive_failures=2, cooldown=0.05)
+        primary = FakeProvider("primary", fail=True)
+        routed = RoutedLLMProvider(router, [primary])
+
+        for _ in range(2):
+            with pytest.raises(LLMConnectionError):
+                await routed.generate_text("prompt")
+        assert router.health(primary).breaker.state == CircuitBreaker.OPEN
+
+        with pytest.raises(LLMError):
+            await routed.generate_text("prompt")
+        assert primary.calls == 2
+
+        await asyncio.sleep(0.06)
+        primary.fail = False
+        assert await routed.generate_text("prompt") == "answer from primary"
+        assert primary.calls == 3
+        assert router.health(primary).breaker.state == CircuitBreaker.CLOSED
+
+    async def test_all_providers_failing_raises(self):
+        """Test the last error is raised when every provider fails."""
+        routed = RoutedLLMProvider(LLMRouter(), [FakeProvider("a", fail=True), FakeProvider("b", fail=True)])
+
+        with pytest.raises(LLMConnectionError):
+            await routed.generate_text("prompt")
+
+    async def test_hedged_routing_fails_over_on_fast_primary_failure(self):
+        """Test a primary failing before the hedge delay still fails over to the secondary."""
+        llm_hedger.configure(enabled=True, default_delay=1.0)
+        primary = FakeProvider("primary", fail=True)
+        secondary = FakeProvider("secondary")
+        routed = RoutedLLMProvider(LLMRouter(), [primary, secondary])
+
+        assert await routed.generate_text("prompt") == "answer from secondary"
+        assert (primary.calls, secondary.calls) == (1, 1)
+        assert llm_hedger.stats["failovers"] == 1
+        assert llm_hedger.stats["hedged"] == 0
+
+    def test_auto_routing_requires_targets(self):
+        """Test auto routing without configured providers is a configuration error."""
+        with pytest.raises(LLMConfigurationError):
+            LLMRouter().get_provider()
+
+    def test_targets_use_configured_endpoint_timeout_and_retries(self):
+        """Test routed providers get the configured base URL, timeout and retries."""
+        router = LLMRouter()
+        router.configure(
+            targets=[("deepseek", "test-key", None, "http://deepseek-proxy.test/v1")],
+            timeout=7,
+            max_retries=1,
+        )
+        provider = router.get_provider().providers[0]
+
+        assert provider.base_url == "http://deepseek-proxy.test/v1"
+        assert (provider.timeout, provider.max_retries) == (7, 1)
+
+
+class SlowStreamingProvider:
+    """Streaming provider double that waits before its first token."""
+
+    def __init__(self, name: str, delay: float):
+        self.provider_name = name
+        self.model = f"{name}-model"
+        self.delay = delay
+        self.cancelled = False
+
+    async def generate_stream(self, prompt: str, **kwargs):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        yield LLMStreamChunk(content=f"from {self.provider_name}")
+        yield LLMStreamChunk(done=True, finish_reason="stop", time_to_first_token=self.delay)
+
+
+class TestLLMHedger:
+    """Test hedged requests."""
+
+    async def test_slow_primary_is_hedged_and_cancelled(self):
+        """Test the secondary wins when the primary's first token is late."""
+        hedger = LLMHedger()
+        hedger.configure(enabled=True, default_delay=0.01)
+        primary = SlowStreamingProvider("primary", delay=1.0)
+        secondary = SlowStreamingProvider("secondary", delay=0.01)
+
+        results = [item async for item in hedger.stream(primary, secondary, "prompt")]
+
+        assert results[0][0] is secondary
+        assert results[0][1].content == "from secondary"
+        assert primary.cancelled
+        assert hedger.stats["hedged"] == 1
+        assert hedger.stats["hedge_wins"] == 1
+
+    async def test_fast_primary_is_not_hedged(self):
+        """Test no hedge is sent when the primary answers in time."""
+        hedger = LLMHedger()
+        hedger.configure(enabled=True, default_delay=0.5)
+        primary = SlowStreamingProvider("primary", delay=0.0)
+        secondary = SlowStreamingProvider("secondary", delay=0.0)
+
+        results = [item async for item in hedger.stream(primary, secondary, "prompt")]
+
+        assert all(provider is primary for provider, _ in results)
+        assert hedger.stats["hedged"] == 0
+
+    async def test_failed_primary_fails_over_without_budget(self):
+        """Test a primary failing before the hedge delay starts the secondary at once."""
+        hedger = LLMHedger()
+        hedger.configure(enabled=True, default_delay=1.0, budget_ratio=0.0, budget_burst=0.0)
+        primary = FakeProvider("primary", fail=True)
+        secondary = FakeProvider("secondary")
+        outcomes = []
+
+        results = [item async for item in hedger.stream(
+            primary, secondary, "prompt", on_result=lambda provider, success, _: outcomes.append((provider, success))
+        )]
+
+        assert results[0][0] is secondary
+        assert results[0][1].content == "answer from secondary"
+        assert outcomes == [(primary, False), (secondary, True)]
+        assert hedger.stats["failovers"] == 1
+        assert hedger.stats["hedged"] == 0 and hedger.stats["budget_denied"] == 0
+
+    async def test_budget_caps_hedges(self):
+        """Test hedges stop once the budget is spent."""
+        hedger = LLMHedger()
+        hedger.configure(enabled=True, default_delay=0.0, budget_ratio=0.0, budget_burst=1.0)
+
+        for _ in range(2):
+            async for _ in hedger.stream(
+                SlowStreamingProvider("primary", delay=0.02),
+                SlowStreamingProvider("secondary", delay=0.0),
+                "prompt"
+            ):
+                pass
+
+        assert hedger.stats["hedged"] == 1
+        assert hedger.stats["budget_denied"] == 1
+
+
+async def attach_standin(server: StandInServer, base_url: str) -> None:
+    """Serve ``base_url`` from an in-process stand-in server."""
+    await llm_client_pool.install_transport(base_url, httpx.ASGITransport(app=create_standin_app(server)))
+
+
+class TestStandInServer:
+    """Test the offline OpenAI-compatible stand-in server."""
+
+    async def test_replays_recordings_blocking_and_streamed(self):
+        """Test providers get recorded completions with usage, streamed or not."""
+        base_url = "http://standin-replay.test/v1"
+        provider = OpenAIProvider(api_key="test-key", model="standin-replay", base_url=base_url)
+        server = StandInServer(fallback="fallback answer")
+        server.recordings[request_key(provider._build_payload("Recorded prompt"))] = {
+            "content": "recorded answer",
+            "finish_reason": "stop",
+        }
+        await attach_standin(server, base_url)
+        text = await provider.generate_text("Recorded prompt", use_cache=False)
+        chunks = [chunk async for chunk in provider.generate_stream("Other prompt", use_cache=False)]
+
+        assert text == "recorded answer"
+        assert "".join(chunk.content for chunk in chunks) == "fallback answer"
+        assert len(chunks) > 2
+        assert chunks[-1].finish_reason == "stop"
+        assert chunks[-1].usage.completion_tokens == estimate_tokens("fallback answer")
+        stats = server.get_stats()
+        assert stats["replayed"] == 1 and stats["fallback"] == 1 and stats["streamed"] == 1
+        assert stats["in_flight"] == 0
+
+    async def test_injects_rate_limits_errors_and_truncation(self):
+        """Test injected 429s, 5xx errors and truncated completions."""
+        base_url = "http://standin-faults.test/v1"
+        provider = OpenAIProvider(api_key="test-key", model="standin-faults", base_url=base_url)
+        await attach_standin(StandInServer(fallback="x", faults=FaultProfile(rate_limit_rate=1.0, retry_after=0.01)), base_url)
+        with pytest.raises(LLMRateLimitError) as error:
+            await provider.generate_text("Test prompt", use_cache=False)
+        assert error.value.retry_after == 0.01
+
+        await attach_standin(StandInServer(fallback="x", faults=FaultProfile(server_error_rate=1.0)), base_url)
+        with pytest.raises(LLMError):
+            await provider.generate_text("Test prompt", use_cache=False)
+
+        content = "The quick brown fox jumps over the lazy dog. " * 10
+        await attach_standin(StandInServer(fallback=content, faults=FaultProfile(truncate_rate=1.0), seed=1), base_url)
+        chunks = [chunk async for chunk in provider.generate_stream("Test prompt", use_cache=False)]
+
+        truncated = "".join(chunk.content for chunk in chunks)
+        assert content.startswith(truncated) and len(truncated) < len(content)
+        assert chunks[-1].finish_reason == "length"
+
+    async def test_unsent_stream_body_does_not_stay_in_flight(self):
+        """Test a streamed response whose body is never iterated leaves in_flight at zero."""
+        server = StandInServer(fallback="never sent")
+        response = await server.handle({"model": "m", "messages": [{"role": "user", "content": "hi"}], "stream": True})
+
+        assert response.media_type == "text/event-stream"
+        assert server.get_stats()["in_flight"] == 0
+        assert server.get_stats()["max_in_flight"] == 1
+
+    async def test_record_then_replay(self, tmp_path):
+        """Test record mode stores upstream completions that replay mode serves."""
+        recordings = str(tmp_path / "recordings.jsonl")
+        upstream_calls = []
+
+        def upstream(request: httpx.Request) -> httpx.Response:
+            upstream_calls.append(json.loads(request.content))
+            return httpx.Response(200, json={
+                "choices": [{"message": {"content": "from upstream"}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5},
+            })
+
+        payload = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "stream": True}
+        recorder = StandInServer(recordings_path=recordings, mode="record", upstream_url="http://upstream.test/v1")
+        recorder._upstream = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+        await recorder.handle(payload)
+        await recorder.aclose()
+
+        replayer = StandInServer(recordings_path=recordings)
+        response = await replayer.handle({**payload, "stream": False})
+
+        assert "stream" not in upstream_calls[0]
+        assert json.loads(response.body)["choices"][0]["message"]["content"] == "from upstream"
+        assert replayer.get_stats()["replayed"] == 1
+
+
+class TestLLMTelemetry:
+    """Test per-call telemetry and the Prometheus export."""
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test bucket counts accumulate up to +Inf."""
+        histogram = Histogram((0.5, 1.0))
+        for value in (0.2, 0.7, 3.0):
+            histogram.observe(value)
+
+        assert histogram.cumulative() == [("0.5", 1), ("1", 2), ("+Inf", 3)]
+        assert histogram.count == 3
+
+    async def test_calls_record_outcome_latency_ttft_tokens_and_cost(self):
+        """Test successful, streamed, rate-limited and retried calls are instrumented."""
+        llm_telemetry.configure(prices={"openai:telemetry-model": {"prompt": 1.0, "completion": 2.0}})
+        base_url = "http://standin-telemetry.test/v1"
+        provider = OpenAIProvider(api_key="test-key", model="telemetry-model", base_url=base_url, max_retries=1)
+        await attach_standin(StandInServer(fallback="hello world"), base_url)
+        await provider.generate_text("Test prompt", use_cache=False)
+        async for _ in provider.generate_stream("Test prompt", use_cache=False):
+            pass
+
+        await attach_standin(
+            StandInServer(fallback="x", faults=FaultProfile(rate_limit_rate=1.0, retry_after=0.01)), base_url
+        )
+        with pytest.raises(LLMRateLimitError):
+            await provider.generate_with_retry("Test prompt", use_cache=False)
+
+        metrics = llm_telemetry.render()
+        labels = 'provider="openai",model="telemetry-model"'
+        assert f'deepcard_llm_requests_total{{{labels},outcome="success"}} 2' in metrics
+        assert f'deepcard_llm_requests_total{{{labels},outcome="rate_limited"}} 2' in metrics
+        assert f'deepcard_llm_retries_total{{{labels}}} 1' in metrics
+        assert f'deepcard_llm_request_duration_seconds_count{{{labels}}} 4' in metrics
+        assert f'deepcard_llm_time_to_first_token_seconds_count{{{labels}}} 1' in metrics
+
+        prompt_tokens = estimate_messages_tokens([{"role": "user", "content": "Test prompt"}])
+        completion_tokens = estimate_tokens("hello world")
+        assert f'deepcard_llm_tokens_total{{{labels},kind="completion"}} {2 * completion_tokens}' in metrics
+        expected_cost = 2 * (prompt_tokens * 1.0 + completion_tokens * 2.0) / 1_000_000
+        assert f'deepcard_llm_cost_usd_total{{{labels}}} {expected_cost!r}' in metrics
+
+    def test_metrics_endpoint(self, client):
+        """Test /metrics serves the Prometheus text format."""
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "# TYPE deepcard_llm_requests_total counter" in response.text
+
+    async def test_closing_a_stream_early_cancels_the_upstream_call(self):
+        """Test closing generate_stream closes the HTTP stream and counts the call as cancelled."""
+        base_url = "http://standin-cancel.test/v1"
+        provider = OpenAIProvider(api_key="test-key", model="cancel-model", base_url=base_url)
+        await attach_standin(StandInServer(fallback="word " * 200, stream_chunk_chars=5), base_url)
+        stream = provider.generate_stream("Test prompt", use_cache=False)
+        first = await stream.__anext__()
+        await stream.aclose()
+
+        assert first.content
+        metrics = llm_telemetry.render()
+        assert 'deepcard_llm_requests_total{provider="openai",model="cancel-model",outcome="cancelled"} 1' in metrics
+
+
+class TestAdaptiveTimeouts:
+    """Test timeouts derived from observed latency."""
+
+    def test_size_buckets(self):
+        """Test requests are keyed by the smallest bucket holding their size."""
+        timeouts = AdaptiveTimeouts()
+        timeouts.configure(size_buckets=[100, 1000])
+
+        assert timeouts.size_bucket(50) == "le100"
+        assert timeouts.size_bucket(1000) == "le1000"
+        assert timeouts.size_bucket(5000) == "gt1000"
+
+    def test_cold_start_then_percentile_with_clamping(self):
+        """Test defaults are used until enough samples exist, then p99 x multiplier within bounds."""
+        timeouts = AdaptiveTimeouts()
+        timeouts.configure(
+            enabled=True, percentile=0.5, multiplier=2.0, min_samples=3,
+            connect_bounds=(1.0, 10.0), first_byte_bounds=(2.0, 60.0), total_bounds=(5.0, 120.0),
+        )
+        cold = timeouts.decide("openai", "m", 10, stream=False, default=30)
+        assert (cold.connect, cold.first_byte, cold.total, cold.adaptive) == (10.0, 30, 120.0, False)
+
+        for total in (4.0, 5.0, 6.0):
+            timeouts.record(cold, connect=0.01, first_byte=total - 1, total=total)
+        decision = timeouts.decide("openai", "m", 10, stream=False, default=30)
+
+        assert decision.adaptive
+        assert decision.connect == 1.0
+        assert decision.first_byte == 8.0
+        assert decision.total == 10.0
+        # Other sizes and modes keep their own windows
+        assert not timeouts.decide("openai", "m", 10, stream=True, default=30).adaptive
+
+    def test_timeouts_are_recorded_at_their_limit(self):
+        """Test a timed-out call loosens a too-tight timeout."""
+        timeouts = AdaptiveTimeouts()
+        timeouts.configure(enabled=True, percentile=1.0, multiplier=1.5, min_samples=2, total_bounds=(1.0, 100.0))
+        cold = timeouts.decide("openai", "m", 10, stream=False, default=30)
+        timeouts.record(cold, total=2.0)
+        timeouts.record(cold, total=2.0)
+        tight = timeouts.decide("openai", "m", 10, stream=False, default=30)
+        assert tight.total == 3.0
+
+        timeouts.record_timeout(tight, TotalTimeout("too slow"))
+
+        assert timeouts.decide("openai", "m", 10, stream=False, default=30).total == 4.5
+        assert timeouts.get_stats()["keys"]["openai:m:le1000:blocking"]["total"]["samples"] == 3
+
+    async def test_total_timeout_is_enforced_and_exported(self):
+        """Test a call exceeding its total timeout fails and is counted in metrics."""
+        llm_timeouts.configure(enabled=True, total_bounds=(0.1, 0.1))
+        base_url = "http://standin-timeouts.test/v1"
+        provider = OpenAIProvider(api_key="test-key", model="timeout-model", base_url=base_url)
+        await attach_standin(StandInServer(fallback="late", latency=LatencyProfile(ttft_median=1.0)), base_url)
+
+        with pytest.raises(LLMConnectionError):
+            await provider.generate_text("Test prompt", use_cache=False, max_tokens=100)
+
+        metrics = llm_telemetry.render()
+        labels = 'provider="openai",model="timeout-model",size="le1000",mode="blocking"'
+        assert f'deepcard_llm_timeouts_total{{{labels},kind="total"}} 1' in metrics
+        assert f'deepcard_llm_timeout_seconds{{{labels},kind="total"}} 0.1' in metrics
+        assert f'deepcard_llm_timeout_decisions_total{{{labels},source="default"}} 1' in metrics
+        assert 'provider="openai",model="timeout-model",outcome="timeout"' in metrics
+
+
+class TestConnectionWarmup:
+    """Test pre-warming provider connections at startup."""
+
+    async def test_warm_opens_connections_per_base_url(self):
+        """Test warm-up resolves each base URL and sends one request per connection."""
+        requests = []
+        base_url = "http://127.0.0.1:9/v1"
+        llm_client_pool.configure(max_keepalive_connections=2)
+        await llm_client_pool.install_transport(base_url, httpx.MockTransport(
+            lambda request: requests.append(request.url.path) or httpx.Response(401)
+        ))
+        warmer = LLMConnectionWarmer()
+        warmer.configure(enabled=True, connections=3)
+        assert not warmer.ready
+
+        await warmer.warm([base_url])
+
+        assert warmer.ready
+        # Capped by the pool's keep-alive limit
+        assert requests == ["/v1/models", "/v1/models"]
+        target = warmer.get_stats()["targets"][base_url]
+        assert target["connections"] == 2
+        assert target["dns_seconds"] is not None
+        assert target["errors"] == []
+
+    async def test_failures_do_not_block_readiness(self):
+        """Test an unreachable provider is reported but warm-up still completes."""
+        base_url = "http://127.0.0.1:9/v1"
+
+        def refuse(request: httpx.Request) -> httpx.Response:
+            raise httpx.ConnectError("connection refused")
+
+        await llm_client_pool.install_transport(base_url, httpx.MockTransport(refuse))
+        warmer = LLMConnectionWarmer()
+        warmer.configure(enabled=True, connections=1)
+        await warmer.warm([base_url])
+
+        assert warmer.ready
+        assert warmer.get_stats()["targets"][base_url]["errors"] == ["ConnectError: connection refused"]
+
+    def test_ready_endpoint(self, client):
+        """Test /ready returns 503 until warm-up completes."""
+        llm_warmer.configure(enabled=True)
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == "warming"
+
+        llm_warmer.configure()
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json()["warmup"]["state"] == "disabled"